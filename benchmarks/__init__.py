@@ -0,0 +1,16 @@
+"""
+Rendering benchmarks for django-floppyforms.
+
+Usage::
+
+    python -m benchmarks [--loader default|cached] [--json results.json]
+                         [--baseline baseline.json] [--threshold 1.2]
+                         [--number N] [--only PATTERN]
+
+Every benchmark runs with the default template loaders and with Django's
+cached template loader, unless ``--loader`` selects one of them. The results
+are printed and optionally written to a JSON file. When a baseline from an
+earlier ``--json`` run is given, every result is compared to it and the exit
+status is 1 if a benchmark got slower than ``--threshold`` times the
+baseline.
+"""
@@ -0,0 +1,61 @@
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Rendering benchmarks for django-floppyforms.')
+    parser.add_argument('--loader', choices=('default', 'cached'),
+                        action='append',
+                        help='Template loaders to run the benchmarks with. '
+                             'Defaults to both.')
+    parser.add_argument('--compiled', action='store_true',
+                        help='Turn on FLOPPYFORMS_COMPILED_WIDGETS.')
+    parser.add_argument('--only', action='append', metavar='PATTERN',
+                        help='Only run the benchmarks matching the pattern, '
+                             'e.g. "widgets.*".')
+    parser.add_argument('--number', type=int,
+                        help='Calls per timing, overriding the defaults.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Timings per benchmark, the fastest is used.')
+    parser.add_argument('--json', metavar='FILE',
+                        help='Write the results to FILE.')
+    parser.add_argument('--baseline', metavar='FILE',
+                        help='Compare the results to an earlier --json run.')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Ratio to the baseline above which a benchmark '
+                             'counts as regression (default: 1.2).')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    from django.conf import settings
+    if hasattr(django, 'setup'):
+        django.setup()
+    if args.compiled:
+        settings.FLOPPYFORMS_COMPILED_WIDGETS = True
+
+    from . import runner
+
+    results = runner.run(loaders=args.loader or runner.LOADERS,
+                         only=args.only, number=args.number,
+                         repeat=args.repeat)
+    if args.json:
+        runner.dump(results, args.json)
+    if args.baseline:
+        print()
+        regressions = runner.compare(results, runner.load(args.baseline),
+                                     threshold=args.threshold)
+        if regressions:
+            print('\n%d benchmark(s) slower than %.2fx the baseline.' %
+                  (len(regressions), args.threshold))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,325 @@
+"""
+The benchmark cases. A case is a setup function that returns the callable
+to be timed, registered under a dotted name with ``@case()``.
+"""
+import datetime
+import os
+import subprocess
+import sys
+from collections import OrderedDict
+
+from django import forms as django_forms
+from django.forms.formsets import formset_factory
+from django.forms.models import modelform_factory
+from django.template import Context, Template, loader
+
+import floppyforms as forms
+from floppyforms import widgets
+from floppyforms.loader import template_cache
+from floppyforms.precompiled import warm_templates
+
+from .models import Book
+
+
+cases = OrderedDict()
+
+
+def case(name, number=100):
+    """
+    Registers the decorated setup function as benchmark ``name``. Each timing
+    calls the returned function ``number`` times.
+    """
+    def decorator(setup):
+        cases[name] = (setup, number)
+        return setup
+    return decorator
+
+
+class Skip(Exception):
+    """
+    Raised by a setup function if the benchmark cannot run here.
+    """
+
+
+# Widgets
+
+CHOICES = [(str(i), 'Choice %s' % i) for i in range(10)]
+
+WIDGET_VALUES = {
+    'TextInput': 'Some text',
+    'PasswordInput': 'secret',
+    'HiddenInput': 'hidden',
+    'MultipleHiddenInput': ['1', '2', '3'],
+    'ClearableFileInput': None,
+    'FileInput': None,
+    'DateInput': datetime.date(2014, 6, 5),
+    'DateTimeInput': datetime.datetime(2014, 6, 5, 12, 30),
+    'TimeInput': datetime.time(12, 30),
+    'Textarea': 'Some\ntext',
+    'CheckboxInput': True,
+    'Select': '3',
+    'NullBooleanSelect': True,
+    'SelectMultiple': ['1', '3'],
+    'RadioSelect': '3',
+    'CheckboxSelectMultiple': ['1', '3'],
+    'SearchInput': 'query',
+    'RangeInput': 5,
+    'ColorInput': '#ff0000',
+    'EmailInput': 'jane@example.com',
+    'URLInput': 'http://example.com/',
+    'PhoneNumberInput': '+1 555 1234',
+    'NumberInput': 42,
+    'IPAddressInput': '127.0.0.1',
+    'SplitDateTimeWidget': datetime.datetime(2014, 6, 5, 12, 30),
+    'SplitHiddenDateTimeWidget': datetime.datetime(2014, 6, 5, 12, 30),
+    'SelectDateWidget': datetime.date(2014, 6, 5),
+    'SlugInput': 'some-slug',
+}
+
+CHOICE_WIDGETS = ('Select', 'SelectMultiple', 'RadioSelect',
+                  'CheckboxSelectMultiple', 'MultipleHiddenInput')
+
+
+def widget_case(widget_name):
+    def setup():
+        widget_class = getattr(widgets, widget_name)
+        if widget_name in CHOICE_WIDGETS:
+            widget = widget_class(choices=CHOICES)
+        else:
+            widget = widget_class()
+        value = WIDGET_VALUES[widget_name]
+        # some widgets modify the attrs
+        return lambda: widget.render('field', value,
+                                     attrs={'id': 'id_field'})
+    return setup
+
+
+for widget_name in widgets.__all__:
+    if widget_name in WIDGET_VALUES:
+        case('widgets.%s' % widget_name, number=500)(widget_case(widget_name))
+
+
+def large_select_case(size, multiple=False):
+    def setup():
+        choices = [(i, 'Choice %s' % i) for i in range(size)]
+        if multiple:
+            widget = widgets.SelectMultiple(choices=choices)
+            value = list(range(0, size, 3))
+        else:
+            widget = widgets.Select(choices=choices)
+            value = size // 2
+        return lambda: widget.render('field', value)
+    return setup
+
+
+for size in (100, 1000):
+    case('select.choices_%s' % size, number=20)(large_select_case(size))
+    case('select.multiple_%s' % size, number=20)(
+        large_select_case(size, multiple=True))
+
+
+# Layouts
+
+class RegistrationForm(forms.Form):
+    firstname = forms.CharField()
+    lastname = forms.CharField()
+    username = forms.SlugField()
+    email = forms.EmailField()
+    password = forms.CharField(widget=forms.PasswordInput)
+    birthday = forms.DateField(required=False)
+    homepage = forms.URLField(required=False)
+    age = forms.IntegerField(required=False)
+    country = forms.ChoiceField(choices=CHOICES)
+    agree_to_terms = forms.BooleanField()
+    comment = forms.CharField(widget=forms.Textarea, required=False)
+    token = forms.CharField(widget=forms.HiddenInput, required=False)
+
+
+class DjangoRegistrationForm(django_forms.Form):
+    firstname = django_forms.CharField()
+    lastname = django_forms.CharField()
+    username = django_forms.SlugField()
+    email = django_forms.EmailField()
+    password = django_forms.CharField(widget=django_forms.PasswordInput)
+    birthday = django_forms.DateField(required=False)
+    homepage = django_forms.URLField(required=False)
+    age = django_forms.IntegerField(required=False)
+    country = django_forms.ChoiceField(choices=CHOICES)
+    agree_to_terms = django_forms.BooleanField()
+    comment = django_forms.CharField(widget=django_forms.Textarea,
+                                     required=False)
+    token = django_forms.CharField(widget=django_forms.HiddenInput,
+                                   required=False)
+
+
+REGISTRATION_DATA = {
+    'firstname': 'Jane',
+    'lastname': 'Doe',
+    'username': 'jane',
+    'email': 'not an email',
+    'password': 'secret',
+    'country': '3',
+}
+
+
+def layout_case(method, bound=False):
+    def setup():
+        if bound:
+            form = RegistrationForm(REGISTRATION_DATA)
+            form.is_valid()
+        else:
+            form = RegistrationForm()
+        return getattr(form, method)
+    return setup
+
+
+for layout in ('p', 'ul', 'table'):
+    case('layouts.%s' % layout, number=20)(layout_case('as_%s' % layout))
+    case('layouts.%s_errors' % layout, number=20)(
+        layout_case('as_%s' % layout, bound=True))
+case('layouts.default', number=20)(layout_case('__str__'))
+
+
+@case('layouts.p_errors_skeleton', number=20)
+def skeleton_layout():
+    form = RegistrationForm(REGISTRATION_DATA)
+    form.is_valid()
+    return lambda: form._render_as('floppyforms/layouts/p.html',
+                                   skeleton=True)
+
+
+@case('layouts.p_errors_one_row', number=20)
+def partial_layout():
+    form = RegistrationForm(REGISTRATION_DATA)
+    form.is_valid()
+    name = list(form.fields)[0]
+    return lambda: form.render_fields([name], 'floppyforms/layouts/p.html')
+
+
+@case('layouts.django_p', number=20)
+def django_layout():
+    return DjangoRegistrationForm().as_p
+
+
+@case('layouts.formconfig', number=20)
+def formconfig_layout():
+    template = loader.get_template('benchmarks/formconfig.html')
+    form = BookForm()
+    return lambda: template.render(Context({'form': form}))
+
+
+# Formsets
+
+def formset_case(size, bulk=False):
+    def setup():
+        RegistrationFormSet = formset_factory(RegistrationForm, extra=size)
+        formset = RegistrationFormSet()
+        template = Template('{%% load floppyforms %%}{%% form formset using '
+                            '"floppyforms/layouts/table.html"%s %%}' %
+                            (' bulk' if bulk else ''))
+        return lambda: template.render(Context({'formset': formset}))
+    return setup
+
+
+for size, number in ((10, 5), (100, 1), (1000, 1)):
+    case('formsets.table_%s' % size, number=number)(formset_case(size))
+    case('formsets.table_%s_bulk' % size,
+         number=number)(formset_case(size, bulk=True))
+
+
+def formset_media_case(size):
+    def setup():
+        RegistrationFormSet = formset_factory(RegistrationForm, extra=size)
+        formset = RegistrationFormSet()
+        return lambda: forms.collect_media(formset).render()
+    return setup
+
+
+for size, number in ((10, 100), (100, 20)):
+    case('formsets.media_%s' % size, number=number)(formset_media_case(size))
+
+
+# Model forms
+
+class BookForm(forms.ModelForm):
+    class Meta:
+        model = Book
+        fields = ('title', 'slug', 'isbn', 'pages', 'price', 'published',
+                  'in_stock', 'summary', 'website', 'contact')
+
+
+@case('modelforms.construct', number=500)
+def modelform_construct():
+    return BookForm
+
+
+@case('modelforms.modelform_factory', number=50)
+def modelform_factory_case():
+    return lambda: modelform_factory(Book, form=forms.ModelForm,
+                                     fields='__all__')
+
+
+@case('modelforms.as_p', number=20)
+def modelform_render():
+    return lambda: BookForm().as_p()
+
+
+# GIS widgets
+
+def gis_case(widget_name):
+    def setup():
+        try:
+            from django.contrib.gis.geos import GEOSGeometry
+            from floppyforms import gis
+            widget_class = type(str('Osm%s' % widget_name),
+                                (getattr(gis, widget_name), gis.BaseOsmWidget),
+                                {})
+            value = GEOSGeometry(GIS_VALUES[widget_name], srid=4326)
+        except Exception as e:
+            raise Skip('GIS is not available: %s' % e)
+        widget = widget_class()
+        return lambda: widget.render('geom', value, attrs={'id': 'id_geom'})
+    return setup
+
+
+GIS_VALUES = {
+    'PointWidget': 'POINT(5 23)',
+    'LineStringWidget': 'LINESTRING(0 0, 10 10, 20 0, 30 10)',
+    'PolygonWidget': 'POLYGON((0 0, 10 0, 10 10, 0 10, 0 0))',
+    'MultiPointWidget': 'MULTIPOINT(0 0, 10 10)',
+}
+
+for widget_name in sorted(GIS_VALUES):
+    case('gis.%s' % widget_name, number=100)(gis_case(widget_name))
+
+
+# Startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@case('startup.import', number=5)
+def import_case():
+    """
+    A fresh interpreter importing floppyforms, including the startup of the
+    interpreter itself.
+    """
+    command = [sys.executable, '-c', 'import floppyforms']
+    environ = dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings')
+    return lambda: subprocess.check_call(command, cwd=ROOT, env=environ)
+
+
+@case('startup.first_render', number=5)
+def first_render():
+    def render():
+        template_cache.clear()
+        return RegistrationForm().as_p()
+    return render
+
+
+@case('startup.warm_templates', number=5)
+def warm_templates_case():
+    def warm():
+        template_cache.clear()
+        return warm_templates()
+    return warm
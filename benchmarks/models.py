@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class Book(models.Model):
+    title = models.CharField(max_length=200)
+    slug = models.SlugField()
+    isbn = models.CharField(max_length=13, unique=True)
+    pages = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    published = models.DateField()
+    in_stock = models.BooleanField(default=True)
+    summary = models.TextField(blank=True)
+    website = models.URLField(blank=True)
+    contact = models.EmailField(blank=True)
+
+    class Meta:
+        app_label = 'benchmarks'
@@ -0,0 +1,109 @@
+"""
+Runs the benchmark cases, stores the results as JSON and compares them to a
+baseline.
+"""
+from __future__ import print_function
+
+import fnmatch
+import json
+import platform
+import sys
+import timeit
+
+import django
+from django.conf import settings
+from django.test.utils import override_settings
+
+import floppyforms
+
+from .cases import Skip, cases
+
+
+LOADERS = ('default', 'cached')
+
+
+def loader_settings(loader):
+    if loader == 'cached':
+        return {'TEMPLATE_LOADERS': settings.CACHED_TEMPLATE_LOADERS}
+    return {'TEMPLATE_LOADERS': settings.TEMPLATE_LOADERS}
+
+
+def time_case(setup, number, repeat=3):
+    """
+    Returns the fastest time in seconds that one call of the benchmark took,
+    out of ``repeat`` timings of ``number`` calls each.
+    """
+    func = setup()
+    # warm up caches, like a long running process would have them
+    func()
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(loaders=LOADERS, only=None, number=None, repeat=3, out=sys.stdout):
+    """
+    Runs the benchmarks and returns the results dictionary, with one entry
+    ``<loader>/<case name>`` per benchmark.
+    """
+    results = {}
+    for loader in loaders:
+        with override_settings(**loader_settings(loader)):
+            for name, (setup, default_number) in cases.items():
+                if only and not any(fnmatch.fnmatch(name, pattern)
+                                    for pattern in only):
+                    continue
+                key = '%s/%s' % (loader, name)
+                try:
+                    seconds = time_case(setup, number or default_number,
+                                        repeat=repeat)
+                except Skip as e:
+                    print('%-45s skipped: %s' % (key, e), file=out)
+                    continue
+                except Exception as e:
+                    print('%-45s failed: %r' % (key, e), file=out)
+                    continue
+                results[key] = seconds
+                print('%-45s %12.3f us' % (key, seconds * 1e6), file=out)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'django': django.get_version(),
+            'floppyforms': floppyforms.__version__,
+            'compiled_widgets': getattr(
+                settings, 'FLOPPYFORMS_COMPILED_WIDGETS', False),
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline, threshold=1.2, out=sys.stdout):
+    """
+    Prints the ratio of every result to the baseline and returns the names
+    of the benchmarks that are slower than ``threshold`` times the baseline.
+    """
+    regressions = []
+    baseline = baseline['results']
+    for key in sorted(results['results']):
+        if key not in baseline:
+            continue
+        ratio = results['results'][key] / baseline[key]
+        flag = ''
+        if ratio > threshold:
+            flag = '  SLOWER'
+            regressions.append(key)
+        elif ratio < 1 / threshold:
+            flag = '  faster'
+        print('%-45s %7.2fx%s' % (key, ratio, flag), file=out)
+    return regressions
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def dump(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,37 @@
+"""
+Settings for running the benchmarks.
+"""
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+
+USE_I18N = True
+USE_L10N = True
+
+INSTALLED_APPS = [
+    'floppyforms',
+    'benchmarks',
+]
+
+try:
+    from django.contrib.gis import gdal
+    if gdal.HAS_GDAL:
+        INSTALLED_APPS.insert(0, 'django.contrib.gis')
+except Exception:
+    pass
+
+STATIC_URL = '/static/'
+
+SECRET_KEY = '0'
+
+TEMPLATE_LOADERS = (
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+)
+
+CACHED_TEMPLATE_LOADERS = (
+    ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+)
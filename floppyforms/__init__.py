@@ -1,4 +1,7 @@
 # flake8: noqa
+import sys
+from importlib import import_module
+
 from django.forms import (BaseModelForm, model_to_dict, fields_for_model,
                           ValidationError, Media, MediaDefiningClass)
 
@@ -7,11 +10,48 @@ from .forms import *
 from .models import *
 from .widgets import *
 
-try:
-    from . import gis
-except Exception:
-    import warnings
-    warnings.warn(
-        "Unable to import floppyforms.gis, geometry widgets not available")
-
 __version__ = '1.5.0-mc-5'
+
+default_app_config = 'floppyforms.apps.FloppyFormsConfig'
+
+# Attributes imported on first access, mapped to their modules.
+_lazy_attributes = {
+    'choice_cache': 'floppyforms.choices',
+    'shared_datalists': 'floppyforms.datalists',
+    'collect_media': 'floppyforms.media',
+    'profile_render': 'floppyforms.profiling',
+}
+
+
+def _import_gis():
+    try:
+        return import_module('floppyforms.gis')
+    except Exception:
+        import warnings
+        warnings.warn(
+            "Unable to import floppyforms.gis, geometry widgets not available")
+        return None
+
+
+def __getattr__(name):
+    """
+    Imports the ``gis`` subpackage, and with it GDAL and GEOS, and the
+    rendering helpers only once they are accessed.
+    """
+    if name in _lazy_attributes:
+        value = getattr(import_module(_lazy_attributes[name]), name)
+        globals()[name] = value
+        return value
+    if name == 'gis':
+        gis = _import_gis()
+        if gis is not None:
+            return gis
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+if sys.version_info < (3, 7):
+    # Module __getattr__ needs Python 3.7, import everything upfront.
+    for _name in _lazy_attributes:
+        __getattr__(_name)
+    _import_gis()
+    del _name
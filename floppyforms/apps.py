@@ -0,0 +1,23 @@
+import threading
+
+from django.conf import settings
+
+try:
+    from django.apps import AppConfig
+except ImportError:
+    # Django < 1.7 has no app registry and ignores default_app_config.
+    AppConfig = None
+
+
+if AppConfig is not None:
+    class FloppyFormsConfig(AppConfig):
+        name = 'floppyforms'
+        verbose_name = 'Floppyforms'
+
+        def ready(self):
+            if getattr(settings, 'FLOPPYFORMS_PRELOAD_TEMPLATES', False):
+                from .precompiled import warm_templates
+                thread = threading.Thread(target=warm_templates,
+                                          name='floppyforms-preload')
+                thread.daemon = True
+                thread.start()
@@ -0,0 +1,312 @@
+"""
+Autocompletion for model choice fields.
+
+A ``ModelChoiceField`` with ``autocomplete='<name>'`` renders only the
+selected options and a search input. The browser looks up the other options
+with the ``lookup`` view, which searches the queryset of the ``Lookup``
+registered as ``<name>``::
+
+    from floppyforms import autocomplete
+
+    autocomplete.register('authors', Author.objects.all(),
+                          search_fields=('last_name', 'first_name'))
+
+Lookups only filter with ``startswith`` by default, which databases can
+answer from an index, and return one page of results at a time. Results
+are cached per queryset, and a longer search term is answered from the
+cached results of a shorter one when those were complete. Only
+authenticated users can use lookups by default.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.exceptions import (FieldDoesNotExist, ImproperlyConfigured,
+                                    PermissionDenied, ValidationError)
+from django.core.signals import setting_changed
+from django.db.models import CharField, Q, TextField
+from django.http import Http404, JsonResponse
+from django.utils.encoding import force_text
+
+from .choices import ChoiceCache
+
+
+__all__ = ('Lookup', 'register', 'unregister', 'get_lookup', 'lookup')
+
+
+class Lookup(object):
+    """
+    Searches a queryset for the options of autocomplete widgets.
+
+    ``search_fields`` are model fields or lookups, a field without lookup is
+    searched with ``startswith``. Add ``istartswith`` to search case
+    insensitively, but make sure the database has a matching index.
+    """
+    queryset = None
+    search_fields = ()
+    to_field_name = None
+    page_size = 20
+    min_length = 1
+    #: Seconds the results of a search are reused, for requests whose
+    #: ``get_queryset()`` has the same SQL.
+    cache_timeout = 60
+    #: Whether anonymous users are denied, see ``has_permission()``.
+    login_required = True
+
+    def __init__(self, queryset=None, search_fields=None, **kwargs):
+        if queryset is not None:
+            self.queryset = queryset
+        if search_fields is not None:
+            self.search_fields = search_fields
+        for key, value in kwargs.items():
+            if not hasattr(self, key):
+                raise TypeError('Lookup() got an unexpected keyword '
+                                'argument %r' % key)
+            setattr(self, key, value)
+        self.search_fields = tuple(
+            field if '__' in field else '%s__startswith' % field
+            for field in self.search_fields)
+        if not self.search_fields:
+            raise ImproperlyConfigured('Lookups need search_fields.')
+
+    def has_permission(self, request):
+        """
+        Whether the user of ``request`` may search the queryset. Only
+        authenticated users may, unless ``login_required`` is ``False``.
+        """
+        if not self.login_required:
+            return True
+        user = getattr(request, 'user', None)
+        if user is None:
+            return False
+        is_authenticated = user.is_authenticated
+        if callable(is_authenticated):
+            # a method before Django 1.10
+            is_authenticated = is_authenticated()
+        return bool(is_authenticated)
+
+    def get_queryset(self, request):
+        return self.queryset.all()
+
+    def get_value(self, obj):
+        if self.to_field_name:
+            return force_text(obj.serializable_value(self.to_field_name))
+        return force_text(obj.pk)
+
+    def get_label(self, obj):
+        return force_text(obj)
+
+    def get_ordering(self):
+        return [self.search_fields[0].rsplit('__', 1)[0], 'pk']
+
+    def search(self, queryset, term):
+        condition = Q()
+        for field in self.search_fields:
+            condition |= Q(**{field: term})
+        return queryset.filter(condition).order_by(*self.get_ordering())
+
+    def matches(self, keys, term):
+        """
+        Whether an object with the values ``keys`` of the search fields is a
+        result for ``term``, to filter cached results.
+        """
+        for field, key in zip(self.search_fields, keys):
+            if field.endswith('__istartswith'):
+                if key.lower().startswith(term.lower()):
+                    return True
+            elif field.endswith('__startswith'):
+                if key.startswith(term):
+                    return True
+        return False
+
+    def normalize(self, term):
+        """
+        Returns the key of ``term`` in the result cache, the same for all the
+        terms that have the same results.
+        """
+        if all(field.endswith('__istartswith')
+               for field in self.search_fields):
+            return term.lower()
+        return term
+
+    def can_filter_cached(self, model):
+        """
+        Whether cached results can be filtered with ``matches()``, i.e. all
+        search fields are prefix lookups on text fields of ``model`` itself.
+        Other fields, like foreign keys, aren't compared by their text.
+        """
+        for field in self.search_fields:
+            name, lookup = field.split('__', 1)
+            if lookup not in ('startswith', 'istartswith'):
+                return False
+            try:
+                model_field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return False
+            if not isinstance(model_field, (CharField, TextField)):
+                return False
+        return True
+
+    def get_results(self, request, term, page=1):
+        """
+        Returns the ``(value, label)`` pairs of the page ``page`` of the
+        results and whether there are more pages.
+        """
+        if len(term) < self.min_length:
+            return [], False
+        queryset = self.get_queryset(request)
+        if self.cache_timeout:
+            # get_queryset() may depend on the request, e.g. on its user.
+            query = ChoiceCache.query_key(queryset)
+            cached = result_cache.get(self, query, term)
+            if cached is not None:
+                start = (page - 1) * self.page_size
+                results = [(value, label) for value, label, keys in cached]
+                return (results[start:start + self.page_size],
+                        len(results) > start + self.page_size)
+
+        start = (page - 1) * self.page_size
+        queryset = self.search(queryset, term)
+        objects = list(queryset[start:start + self.page_size + 1])
+        more = len(objects) > self.page_size
+        objects = objects[:self.page_size]
+        if self.cache_timeout and page == 1 and not more:
+            fields = []
+            if self.can_filter_cached(queryset.model):
+                fields = [field.split('__')[0] for field in self.search_fields]
+            result_cache.set(self, query, term, [
+                (self.get_value(obj), self.get_label(obj),
+                 tuple(force_text(getattr(obj, field) or '')
+                       for field in fields))
+                for obj in objects])
+        return ([(self.get_value(obj), self.get_label(obj))
+                 for obj in objects], more)
+
+
+class ResultCache(object):
+    """
+    Keeps the complete results of searches, i.e. those with a single page,
+    per lookup and query of the searched queryset. A search for a term is
+    answered from the results of any cached prefix of the term, filtered
+    with ``Lookup.matches()``.
+    """
+    maxsize = 1000
+
+    def __init__(self):
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, lookup, query, term):
+        term = lookup.normalize(term)
+        now = time.time()
+        model = query[0]
+        for length in range(len(term), lookup.min_length - 1, -1):
+            if length < len(term) and not lookup.can_filter_cached(model):
+                break
+            entry = self.results.get((id(lookup), query, term[:length]))
+            if entry is None or entry[0] is not lookup:
+                continue
+            if entry[1] + lookup.cache_timeout < now:
+                continue
+            if length == len(term):
+                return entry[2]
+            return [result for result in entry[2]
+                    if lookup.matches(result[2], term)]
+        return None
+
+    def set(self, lookup, query, term, results):
+        term = lookup.normalize(term)
+        with self.lock:
+            self.results[(id(lookup), query, term)] = (lookup, time.time(),
+                                                       results)
+            while len(self.results) > self.maxsize:
+                self.results.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+
+
+result_cache = ResultCache()
+
+
+def reset_result_cache(**kwargs):
+    result_cache.clear()
+
+
+setting_changed.connect(reset_result_cache)
+
+
+_registry = {}
+
+
+def register(name, queryset=None, search_fields=None, lookup_class=Lookup,
+             **kwargs):
+    """
+    Registers a ``Lookup`` under ``name``, the name that autocomplete fields
+    and the ``lookup`` view use. Pass an instance of a ``Lookup`` subclass as
+    ``queryset`` or the class as ``lookup_class`` to customize it.
+    """
+    if isinstance(queryset, Lookup):
+        instance = queryset
+    else:
+        instance = lookup_class(queryset, search_fields, **kwargs)
+    _registry[name] = instance
+    return instance
+
+
+def unregister(name):
+    _registry.pop(name, None)
+
+
+def get_lookup(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise ImproperlyConfigured('No autocomplete lookup is registered as '
+                                   '%r.' % name)
+
+
+def lookup(request, name):
+    """
+    Returns the results of the lookup ``name`` for the ``term`` parameter as
+    JSON: ``{"results": [{"value": ..., "label": ...}], "more": false}``.
+    ``page`` selects a page of the results, starting at 1.
+    """
+    try:
+        instance = _registry[name]
+    except KeyError:
+        raise Http404('No autocomplete lookup %r.' % name)
+    if not instance.has_permission(request):
+        raise PermissionDenied
+    term = request.GET.get('term', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    results, more = instance.get_results(request, term, page)
+    return JsonResponse({
+        'results': [{'value': value, 'label': label}
+                    for value, label in results],
+        'more': more,
+    })
+
+
+def get_selected(choices, values):
+    """
+    Returns the ``(value, label)`` pairs of the objects of the model choice
+    iterator ``choices`` whose value is in ``values``, with one query.
+    """
+    field = choices.field
+    key = field.to_field_name or 'pk'
+    values = [force_text(value) for value in values
+              if value not in (None, '')]
+    if not values:
+        return []
+    try:
+        objects = list(choices.queryset.filter(**{'%s__in' % key: values}))
+    except (ValueError, TypeError, ValidationError):
+        # e.g. invalid submitted values
+        return []
+    return [(force_text(field.prepare_value(obj)),
+             field.label_from_instance(obj)) for obj in objects]
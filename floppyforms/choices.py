@@ -0,0 +1,148 @@
+"""
+A cache for the choices of model choice fields.
+
+Every form instance has its own copy of a ``ModelChoiceField`` and evaluates
+its queryset when the widget is rendered. In a formset, the same queryset is
+therefore queried once per form. Inside a ``choice_cache()`` block, each
+distinct queryset is evaluated only once and all widgets that use it share
+the choices and the grouped options.
+
+The ``{% form %}`` tag opens a ``choice_cache()`` block when it renders more
+than one form, ``ChoiceCacheMiddleware`` opens one for the whole request.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.core.signals import request_finished
+
+try:
+    from django.core.exceptions import EmptyResultSet
+except ImportError:
+    # Django < 1.11
+    from django.db.models.sql.datastructures import EmptyResultSet
+
+
+__all__ = ('ChoiceCache', 'choice_cache', 'get_choice_cache',
+           'ChoiceCacheMiddleware')
+
+
+_local = threading.local()
+
+
+class ChoiceCache(object):
+    """
+    Maps a queryset and the field settings that change the choices to the
+    evaluated choices.
+    """
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def query_key(queryset):
+        """
+        Returns the model, database and SQL of ``queryset``: copies of a
+        queryset, like those of the fields of a formset, have the same key.
+        """
+        try:
+            sql = str(queryset.query)
+        except EmptyResultSet:
+            # e.g. none(), which has no SQL
+            sql = None
+        return (queryset.model, queryset.db, sql)
+
+    def key(self, iterator):
+        field = iterator.field
+        label_from_instance = field.label_from_instance
+        return (
+            self.query_key(iterator.queryset),
+            field.empty_label,
+            getattr(field, 'to_field_name', None),
+            getattr(label_from_instance, '__func__', label_from_instance),
+        )
+
+    def get(self, iterator, name, compute):
+        """
+        Returns the value cached as ``name`` for the queryset of
+        ``iterator``, calling ``compute()`` to get it the first time.
+        """
+        key = self.key(iterator)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = {}
+        if name in entry:
+            self.hits += 1
+            return entry[name]
+        self.misses += 1
+        value = entry[name] = compute()
+        return value
+
+    def clear(self):
+        self.entries.clear()
+
+
+def get_choice_cache():
+    """
+    Returns the ``ChoiceCache`` of the innermost ``choice_cache()`` block of
+    the current thread, or ``None``.
+    """
+    return getattr(_local, 'cache', None)
+
+
+@contextmanager
+def choice_cache(cache=None):
+    """
+    Caches the choices of model choice fields while the block is executed.
+    Nested blocks use the cache of the outermost one. A ``ChoiceCache`` can
+    be passed in to use it for several blocks.
+    """
+    if get_choice_cache() is not None:
+        yield get_choice_cache()
+        return
+    if cache is None:
+        cache = ChoiceCache()
+    _local.cache = cache
+    try:
+        yield cache
+    finally:
+        _local.cache = None
+
+
+class ChoiceCacheMiddleware(object):
+    """
+    Caches the choices of model choice fields for the duration of a request.
+    Works with ``MIDDLEWARE`` and ``MIDDLEWARE_CLASSES``. The cache is also
+    cleared when the request is finished, in case ``process_response()`` is
+    skipped.
+    """
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        self.process_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            clear_request_cache()
+
+    def process_request(self, request):
+        if get_choice_cache() is None:
+            _local.cache = ChoiceCache()
+            _local.request_cache = True
+
+    def process_response(self, request, response):
+        clear_request_cache()
+        return response
+
+
+def clear_request_cache(**kwargs):
+    """
+    Closes the cache opened by ``ChoiceCacheMiddleware``, if any.
+    """
+    if getattr(_local, 'request_cache', False):
+        _local.cache = None
+        _local.request_cache = False
+
+
+request_finished.connect(clear_request_cache)
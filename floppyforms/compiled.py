@@ -0,0 +1,383 @@
+"""
+Python implementations of the stock widget templates.
+
+When ``FLOPPYFORMS_COMPILED_WIDGETS`` is set to ``True``, widgets that are
+rendered with one of the templates shipped with floppyforms skip the template
+engine and build their HTML directly from the widget context. The output is
+identical to what the templates produce.
+
+A template only gets compiled rendering if the template engines would load it
+from floppyforms itself. As soon as a project overrides the template (e.g. by
+providing its own ``floppyforms/input.html``), rendering falls back to the
+template engine.
+"""
+import os
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.template import TemplateDoesNotExist
+from django.utils.encoding import force_text
+from django.utils.formats import localize
+from django.utils.html import escape
+from django.utils.safestring import SafeData, mark_safe
+from django.utils.timezone import (get_current_timezone_name,
+                                   template_localtime)
+from django.utils.translation import get_language
+
+from .loader import find_widget_template
+
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'templates')
+
+renderers = {}
+
+_stock_templates = {}
+
+
+def compiled(template_name):
+    """
+    Registers the decorated function as compiled renderer for the stock
+    template ``template_name``. The function gets the widget context and
+    returns the rendered HTML.
+    """
+    def decorator(func):
+        renderers[template_name] = func
+        return func
+    return decorator
+
+
+def is_stock_template(template_name):
+    """
+    Returns ``True`` if the template engines load ``template_name`` from the
+    templates that come with floppyforms and render it with the default
+    template settings.
+    """
+    try:
+        return _stock_templates[template_name]
+    except KeyError:
+        pass
+    stock_path = os.path.normcase(os.path.join(TEMPLATES_DIR, template_name))
+    try:
+        engine, path = find_widget_template(template_name)
+    except TemplateDoesNotExist:
+        path = None
+    is_stock = False
+    if path is not None:
+        path = os.path.normcase(os.path.abspath(path))
+        # A TEMPLATE_STRING_IF_INVALID shows up in the output of the
+        # templates, the compiled renderers cannot reproduce it. Note that it
+        # may be a string subclass that evaluates to False.
+        is_stock = (path == stock_path and
+                    engine.engine.string_if_invalid == '')
+    _stock_templates[template_name] = is_stock
+    return is_stock
+
+
+def get_renderer(template_name):
+    """
+    Returns the compiled renderer for ``template_name`` or ``None`` if the
+    template needs to be rendered by the template engine.
+    """
+    if not getattr(settings, 'FLOPPYFORMS_COMPILED_WIDGETS', False):
+        return None
+    renderer = renderers.get(template_name)
+    if renderer is None or not is_stock_template(template_name):
+        return None
+    return renderer
+
+
+def reset(**kwargs):
+    setting = kwargs.get('setting')
+    if setting is None or setting.startswith('TEMPLATE') or setting in (
+            'DEBUG', 'INSTALLED_APPS', 'FLOPPYFORMS_TEMPLATE_ENGINE'):
+        _stock_templates.clear()
+
+
+setting_changed.connect(reset)
+
+
+def _text(value):
+    """
+    Equivalent of ``{{ value }}`` in a template with autoescaping turned on.
+    """
+    value = force_text(localize(template_localtime(value)))
+    if isinstance(value, SafeData):
+        return value
+    return escape(value)
+
+
+def _contains(container, item):
+    """
+    Equivalent of ``{% if item in container %}``.
+    """
+    try:
+        return item in container
+    except Exception:
+        return False
+
+
+def _stringformat(value):
+    try:
+        return '%s' % (value,)
+    except (ValueError, TypeError):
+        return ''
+
+
+def render_attrs(attrs):
+    """
+    Renders the ``attrs`` dictionary as HTML attributes, each one preceded by
+    a space. Values are escaped, an attribute whose value is ``True`` is
+    rendered without a value (e.g. `` required``).
+
+    This is what the ``render_attrs`` template filter and
+    ``floppyforms/attrs.html`` do.
+    """
+    if not hasattr(attrs, 'items'):
+        return ''
+    bits = []
+    for name, value in attrs.items():
+        bits.append(' ')
+        bits.append(_text(name))
+        # The stringformat comparison keeps 1 from being treated like True.
+        if _stringformat(value) != 'True' or value != 1:
+            bits.append('="')
+            bits.append(_text(value))
+            bits.append('"')
+    return mark_safe(''.join(bits))
+
+
+@compiled('floppyforms/input.html')
+def render_input(context):
+    attrs = context.get('attrs', {})
+    datalist = context.get('datalist')
+    bits = [
+        '<input type="', _text(context.get('type', '')),
+        '" name="', _text(context.get('name', '')), '"',
+    ]
+    if context.get('value'):
+        bits.extend((' value="', _text(context['value']), '"'))
+    if context.get('required'):
+        bits.append(' required')
+    bits.append(render_attrs(attrs))
+    datalist_id = context.get('datalist_id')
+    if datalist_id:
+        bits.extend((' list="', _text(datalist_id), '"'))
+    bits.append('>')
+    if datalist:
+        bits.extend(('\n<datalist id="', _text(datalist_id), '">'))
+        for item in datalist:
+            bits.extend(('\n\t<option value="', _text(item), '">'))
+        bits.append('\n</datalist>')
+    bits.append('\n')
+    return mark_safe(''.join(bits))
+
+
+@compiled('floppyforms/textarea.html')
+def render_textarea(context):
+    bits = ['<textarea name="', _text(context.get('name', '')), '"']
+    if context.get('required'):
+        bits.append(' required')
+    bits.append(render_attrs(context.get('attrs', {})))
+    bits.append('>')
+    if context.get('value'):
+        bits.append(_text(context['value']))
+    bits.append('</textarea>\n')
+    return mark_safe(''.join(bits))
+
+
+def _format_key():
+    """
+    The settings that change how ``_text()`` formats a value.
+    """
+    return (get_language(), settings.USE_L10N,
+            settings.USE_THOUSAND_SEPARATOR, settings.USE_TZ,
+            get_current_timezone_name() if settings.USE_TZ else None)
+
+
+def _select_options(optgroups):
+    """
+    Returns ``(label, options)`` for every group of ``optgroups``, where
+    ``label`` is the escaped group name or ``None`` and ``options`` a list of
+    ``(value, start, end)`` tuples with the HTML before and after the
+    ``selected`` attribute of every option.
+
+    The result is stored in the cache of the widget's optgroups, so the
+    choices of a select box are only formatted once per language.
+    """
+    cache = getattr(optgroups, 'cache', None)
+    if cache is not None:
+        key = ('select', _format_key())
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+    groups = []
+    for group_name, group_choices in optgroups:
+        options = []
+        for option in group_choices:
+            options.append((
+                option[0],
+                '\n\t<option value="%s"' % _text(option[0]),
+                '>%s</option>' % _text(option[1]),
+            ))
+        groups.append((_text(group_name) if group_name else None, options))
+    if cache is not None:
+        cache[key] = groups
+    return groups
+
+
+@compiled('floppyforms/select.html')
+def render_select(context):
+    value = context.get('value')
+    bits = ['<select name="', _text(context.get('name', '')), '"']
+    if context.get('multiple'):
+        bits.append(' multiple="multiple"')
+    if context.get('required'):
+        bits.append(' required')
+    bits.append(render_attrs(context.get('attrs', {})))
+    bits.append('>')
+    append = bits.append
+    for label, options in _select_options(context.get('optgroups', ())):
+        if label is not None:
+            bits.extend(('\n\t<optgroup label="', label, '">'))
+        for option_value, start, end in options:
+            append(start)
+            if _contains(value, option_value):
+                append(' selected="selected"')
+            append(end)
+        if label is not None:
+            bits.append('\n\t</optgroup>')
+    bits.append('\n</select>\n')
+    return mark_safe(''.join(bits))
+
+
+@compiled('floppyforms/radio.html')
+def render_radio(context):
+    value = context.get('value')
+    name = _text(context.get('name', ''))
+    id_ = _text(context.get('attrs', {}).get('id', ''))
+    required = context.get('required')
+    bits = ['<ul>']
+    for group_name, choices in context.get('optgroups', ()):
+        for counter, choice in enumerate(choices, 1):
+            choice_id = '%s_%s' % (id_, _text(counter))
+            bits.extend((
+                '\n\t<li><label for="', choice_id,
+                '"><input type="radio" id="', choice_id,
+                '" value="', _text(choice[0]), '" name="', name, '"',
+            ))
+            if required:
+                bits.append(' required')
+            if _contains(value, choice[0]):
+                bits.append(' checked')
+            bits.extend(('> ', _text(choice[1]), '</label></li>\n'))
+    bits.append('</ul>\n')
+    return mark_safe(''.join(bits))
+
+
+@compiled('floppyforms/checkbox_select.html')
+def render_checkbox_select(context):
+    value = context.get('value')
+    name = _text(context.get('name', ''))
+    id_ = _text(context.get('attrs', {}).get('id', ''))
+    bits = ['<ul>']
+    for group_name, choices in context.get('optgroups', ()):
+        for counter, choice in enumerate(choices, 1):
+            choice_id = '%s_%s' % (id_, _text(counter))
+            bits.extend(('\n\t<li><label for="', choice_id, '"><input '))
+            if _contains(value, choice[0]):
+                bits.append('checked="checked" ')
+            bits.extend((
+                'type="checkbox" id="', choice_id, '" name="', name,
+                '" value="', _text(choice[0]), '"> ', _text(choice[1]),
+                '</label></li>\n',
+            ))
+    bits.append('</ul>\n')
+    return mark_safe(''.join(bits))
+
+
+def _choice_options(choices):
+    """
+    Returns ``(value, start, end)`` for every ``(value, label)`` choice, like
+    ``_select_options()`` does for optgroups.
+    """
+    cache = getattr(choices, 'cache', None)
+    if cache is not None:
+        key = ('options', _format_key())
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+    options = [(value,
+                '\n\t<option value="%s"' % _text(value),
+                '>%s</option>' % _text(label))
+               for value, label in choices]
+    if cache is not None:
+        cache[key] = options
+    return options
+
+
+@compiled('floppyforms/select_date.html')
+def render_select_date(context):
+    attrs = render_attrs(context.get('attrs', {}))
+    bits = []
+    append = bits.append
+    for part in ('year', 'month', 'day'):
+        if bits:
+            append('\n\n')
+        bits.extend((
+            '<select name="', _text(context.get(part + '_field', '')),
+            '" id="', _text(context.get(part + '_id', '')), '"', attrs, '>',
+        ))
+        selected = context.get(part + '_val')
+        for option_value, start, end in _choice_options(
+                context.get(part + '_choices', ())):
+            append(start)
+            if option_value == selected:
+                append(' selected="selected"')
+            append(end)
+        append('\n</select>')
+    append('\n')
+    return mark_safe(''.join(bits))
+
+
+def render_hidden_inputs(name, values, attrs, required=False):
+    """
+    Renders a hidden input with ``floppyforms/input.html`` for every item of
+    ``values`` in one pass, as ``MultipleHiddenInput`` does. The ``id`` in
+    ``attrs`` gets the index of the value appended (``id_0``, ``id_1``, ...).
+    The markup that is the same for all the inputs is only built once.
+    """
+    id_ = attrs.get('id')
+    # the attributes before and after the id
+    before = []
+    after = []
+    current = before
+    for key, value in attrs.items():
+        if key == 'id' and id_:
+            current = after
+            continue
+        if value == 1 and not isinstance(value, bool):
+            # Like Input.get_context, see #25.
+            value = str(value)
+        current.append((key, value))
+    prefix = '<input type="hidden" name="%s"' % _text(name)
+    middle = '%s%s' % (' required' if required else '',
+                       render_attrs(OrderedDict(before)))
+    suffix = '%s>\n' % render_attrs(OrderedDict(after))
+    if id_:
+        id_prefix = ' id="%s' % _text('%s_' % (id_,))
+    inputs = []
+    for i, value in enumerate(values):
+        bits = [prefix]
+        if value:
+            bits.extend((' value="', _text(value), '"'))
+        bits.append(middle)
+        if id_:
+            bits.extend((id_prefix, str(i), '"'))
+        bits.append(suffix)
+        inputs.append(''.join(bits))
+    # Not marked safe, like the joined output of the template.
+    return '\n'.join(inputs)
@@ -0,0 +1,87 @@
+"""
+Shared datalists for inputs.
+
+An input with a ``datalist`` renders its own ``<datalist>`` element. In a
+formset, every form repeats the same list of suggestions. Inside a
+``shared_datalists()`` block, each distinct datalist is rendered only once,
+by the first input that uses it, with an id derived from its items. The
+other inputs refer to it with their ``list`` attribute.
+
+The ``{% form %}`` tag opens a ``shared_datalists()`` block when it renders
+more than one form.
+"""
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from django.utils.encoding import force_text
+
+
+__all__ = ('DatalistRegistry', 'shared_datalists', 'get_datalist_registry')
+
+
+_local = threading.local()
+
+
+class DatalistRegistry(object):
+    """
+    Maps the items of the datalists rendered so far to their ids.
+    """
+    def __init__(self):
+        self.ids = {}
+        self.lists = {}
+
+    def make_id(self, items):
+        digest = hashlib.sha1(u'\n'.join(items).encode('utf-8')).hexdigest()
+        return 'datalist_%s' % digest[:12]
+
+    def get(self, datalist):
+        """
+        Returns the id of ``datalist`` and whether it is the first time it
+        is used, i.e. whether the ``<datalist>`` element still has to be
+        rendered.
+        """
+        # The widgets of the forms of a formset share their datalist.
+        entry = self.lists.get(id(datalist))
+        if entry is not None and entry[0] is datalist:
+            return entry[1], False
+        items = tuple(force_text(item) for item in datalist)
+        datalist_id = self.ids.get(items)
+        new = datalist_id is None
+        if new:
+            datalist_id = self.ids[items] = self.make_id(items)
+        # The datalist is kept in the entry, its id cannot be reused.
+        self.lists[id(datalist)] = (datalist, datalist_id)
+        return datalist_id, new
+
+    def clear(self):
+        self.ids.clear()
+        self.lists.clear()
+
+
+def get_datalist_registry():
+    """
+    Returns the ``DatalistRegistry`` of the innermost ``shared_datalists()``
+    block of the current thread, or ``None``.
+    """
+    return getattr(_local, 'registry', None)
+
+
+@contextmanager
+def shared_datalists(registry=None):
+    """
+    Renders identical datalists only once while the block is executed.
+    Nested blocks use the registry of the outermost one. A
+    ``DatalistRegistry`` can be passed in to use it for several blocks whose
+    output ends up in the same page.
+    """
+    if get_datalist_registry() is not None:
+        yield get_datalist_registry()
+        return
+    if registry is None:
+        registry = DatalistRegistry()
+    _local.registry = registry
+    try:
+        yield registry
+    finally:
+        _local.registry = None
@@ -0,0 +1,190 @@
+"""
+Caches the HTML of unbound forms.
+
+A search form in the page header or the static forms of a checkout page
+render the same HTML on every request. ``{% form form cache 600 %}`` and
+``form._render_as(layout, cache=600)`` store that HTML in Django's cache
+and skip the layout, row and widget templates the next time.
+
+The cache key is made of the form classes, their fields with their widget
+attrs, choices and querysets, prefixes and initial data, the layout, the active language, the ``{% formconfig %}``
+state and any additional vary-on values. Bound forms are always rendered,
+since they show submitted data and errors. The CSRF token is rendered as a
+placeholder and replaced after the HTML is taken from the cache, it never
+ends up in the cache.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import Model
+from django.utils.encoding import force_text
+from django.utils.functional import Promise
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from .choices import ChoiceCache
+
+
+__all__ = ('form_cache_key', 'render_cached')
+
+
+CSRF_PLACEHOLDER = 'floppyformscsrftokenplaceholder'
+
+KEY_PREFIX = 'floppyforms.form'
+
+
+def get_cache():
+    from django.core.cache import caches
+
+    return caches[getattr(settings, 'FLOPPYFORMS_FORM_CACHE', 'default')]
+
+
+def _class_name(obj):
+    cls = type(obj)
+    return '%s.%s' % (cls.__module__, cls.__name__)
+
+
+def _stable_repr(value):
+    """
+    Returns a representation of ``value`` that is the same in every process,
+    or ``None`` if there is none: callables, e.g. ``initial=timezone.now``,
+    have a new value every time and objects with the default ``repr()``
+    show their address.
+    """
+    if isinstance(value, Promise):
+        return repr(force_text(value))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_stable_repr(item) for item in value]
+        if None in items:
+            return None
+        if isinstance(value, (set, frozenset)):
+            items.sort()
+        return '%s(%s)' % (type(value).__name__, ', '.join(items))
+    if isinstance(value, dict):
+        items = [(_stable_repr(key), _stable_repr(item))
+                 for key, item in value.items()]
+        if any(None in pair for pair in items):
+            return None
+        return '{%s}' % ', '.join('%s: %s' % pair for pair in sorted(items))
+    if callable(value):
+        return None
+    if isinstance(value, Model):
+        return repr((value._meta.app_label, value._meta.model_name,
+                     value.pk))
+    if type(value).__repr__ is object.__repr__:
+        return None
+    return repr(value)
+
+
+def _form_class_bits(form):
+    """
+    Returns the class of ``form`` and its attributes that change the HTML of
+    all its rows.
+    """
+    return (_class_name(form), getattr(form, 'label_suffix', None),
+            getattr(form, 'error_css_class', None),
+            getattr(form, 'required_css_class', None))
+
+
+def _form_bits(form):
+    """
+    Returns what the HTML of the unbound ``form`` depends on, or ``None`` if
+    the form is bound, not a form or has values that can't be part of a key.
+    """
+    fields = getattr(form, 'fields', None)
+    if fields is None or getattr(form, 'is_bound', True):
+        return None
+    if getattr(form, '_errors', None):
+        # errors were added to the unbound form
+        return None
+    field_bits = tuple(_field_bits(name, field)
+                       for name, field in fields.items())
+    initial = _stable_repr(form.initial)
+    if None in field_bits or initial is None:
+        return None
+    return (_form_class_bits(form), form.prefix, form.auto_id, field_bits,
+            initial)
+
+
+def _choices_bits(choices):
+    if not isinstance(choices, (list, tuple)):
+        # e.g. the choices of model choice fields, which would be queried
+        return ''
+    return _stable_repr(choices)
+
+
+#: Widget attributes that floppyforms lets you set per instance.
+WIDGET_ATTRIBUTES = ('template_name', 'input_type', 'datalist')
+
+
+def _field_bits(name, field, initial=True):
+    """
+    Returns what the HTML of ``field`` depends on, or ``None`` if some of it
+    can't be part of a key. Forms may change their fields per instance,
+    e.g. the queryset of a model choice field per user or the attrs of a
+    widget, so these are part of it.
+    """
+    widget = field.widget
+    queryset = getattr(field, 'queryset', None)
+    if queryset is not None:
+        queryset = (ChoiceCache.query_key(queryset),
+                    force_text(getattr(field, 'empty_label', None) or ''),
+                    getattr(field, 'to_field_name', None))
+    values = [
+        _stable_repr(field.initial) if initial else '',
+        _choices_bits(getattr(field, 'choices', None)),
+        _choices_bits(getattr(widget, 'choices', None)),
+        _stable_repr(widget.attrs),
+    ]
+    values.extend(_stable_repr(getattr(widget, attribute, None))
+                  for attribute in WIDGET_ATTRIBUTES)
+    if None in values:
+        return None
+    return (name, _class_name(field), _class_name(widget), field.required,
+            force_text(field.label or ''), force_text(field.help_text or ''),
+            repr(queryset), tuple(values))
+
+
+def form_cache_key(forms, layout, config=None, extra_context=None,
+                   vary_on=()):
+    """
+    Returns the cache key for rendering ``forms`` with the template named
+    ``layout`` and the ``FormConfig`` ``config``, or ``None`` if they cannot
+    be cached.
+    """
+    config_key = config.cache_key() if config is not None else ''
+    if not forms or layout is None or config_key is None:
+        return None
+    bits = [get_language(), layout, config_key]
+    for form in forms:
+        form_bits = _form_bits(form)
+        if form_bits is None:
+            return None
+        bits.append(form_bits)
+    bits.append(repr(sorted((extra_context or {}).items())))
+    bits.extend(force_text(value) for value in vary_on)
+    digest = hashlib.sha1(force_text(repr(bits)).encode('utf-8'))
+    return '%s.%s' % (KEY_PREFIX, digest.hexdigest())
+
+
+def render_cached(key, timeout, render, csrf_token=None):
+    """
+    Returns the HTML cached under ``key``, or renders it with
+    ``render(placeholder)`` and caches it for ``timeout`` seconds.
+
+    ``render`` gets the placeholder to render instead of the CSRF token, or
+    ``None`` if the page has no CSRF token. The placeholder is replaced with
+    ``csrf_token`` in the returned HTML.
+    """
+    cache = get_cache()
+    has_token = csrf_token is not None and csrf_token != 'NOTPROVIDED'
+    key = '%s.%d' % (key, has_token)
+    output = cache.get(key)
+    if output is None:
+        output = force_text(render(CSRF_PLACEHOLDER if has_token else None))
+        cache.set(key, output, timeout)
+    if has_token and CSRF_PLACEHOLDER in output:
+        output = output.replace(CSRF_PLACEHOLDER,
+                                conditional_escape(force_text(csrf_token)))
+    return mark_safe(output)
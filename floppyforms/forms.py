@@ -1,32 +1,147 @@
 from django import forms, template
 from django.utils.encoding import python_2_unicode_compatible
+from django.utils.html import conditional_escape
 
+from .choices import choice_cache
+from .datalists import shared_datalists
+from .formcache import form_cache_key, render_cached
+from .loader import get_jinja2_environment
+from .media import form_media_cache
+from .partial import partial_render
+from .skeleton import render_forms, render_skeleton
 from .templatetags.floppyforms import FormNode
 
 
-__all__ = ('BaseForm', 'Form',)
+__all__ = ('BaseForm', 'Form', 'iter_render', 'render_formset')
+
+
+DEFAULT_LAYOUT = 'floppyforms/layouts/default.html'
+
+_template_node = FormNode(
+    'form',
+    [template.Variable('form')],
+    {
+        'using': template.Variable('layout'),
+        'only': False,
+        'with': None,
+    })
+
+_bulk_template_node = FormNode(
+    'form',
+    [template.Variable('form')],
+    {
+        'using': template.Variable('layout'),
+        'only': False,
+        'with': None,
+        'bulk': True,
+    })
+
+
+def iter_render(forms, layout=DEFAULT_LAYOUT):
+    """
+    Renders a form, a formset or a list of forms with ``layout`` and yields
+    the HTML of every form as soon as it is rendered, e.g. to pass it to a
+    ``StreamingHttpResponse``.
+    """
+    context = template.Context({
+        'form': forms,
+        'layout': layout,
+    })
+    return _template_node.iter_render(context)
+
+
+def render_formset(forms, layout=DEFAULT_LAYOUT):
+    """
+    Renders a formset or a list of forms with ``layout`` once for every
+    form, like ``{% form formset using layout bulk %}``: the layout and rows
+    are rendered for the first form only, the other forms fill in their
+    prefix, values and errors. See ``floppyforms.skeleton.render_forms``.
+    """
+    environment = get_jinja2_environment()
+    if environment is None:
+        context = template.Context({
+            'form': forms,
+            'layout': layout,
+        })
+        return _bulk_template_node.render(context)
+    from markupsafe import Markup, escape
+    from .jinja import render_form
+
+    with choice_cache(), shared_datalists():
+        return Markup(u''.join(render_forms(
+            list(forms), 'jinja2:%s' % layout,
+            lambda form: render_form(environment, form, layout), escape)))
 
 
 @python_2_unicode_compatible
 class LayoutRenderer(object):
-    _template_node = FormNode(
-        'form',
-        [template.Variable('form')],
-        {
-            'using': template.Variable('layout'),
-            'only': False,
-            'with': None,
-        })
+    _template_node = _template_node
+
+    def _render_as(self, layout, cache=None, vary_on=(), skeleton=False):
+        """
+        Renders the form with ``layout``. With ``cache``, the HTML of an
+        unbound form is kept in Django's cache for that many seconds, for
+        every distinct value of ``vary_on``. See ``floppyforms.formcache``.
 
-    def _render_as(self, layout):
+        With ``skeleton``, the form is rendered from the skeleton of its
+        class and ``layout``, see ``floppyforms.skeleton``.
+        """
+        environment = get_jinja2_environment()
+        if skeleton:
+            if environment is None:
+                engine, escape = 'django', conditional_escape
+            else:
+                from markupsafe import escape
+                engine = 'jinja2'
+            return render_skeleton(self, '%s:%s' % (engine, layout),
+                                   lambda: self._render_as(layout), escape)
+        if cache is not None:
+            engine = 'django' if environment is None else 'jinja2'
+            key = form_cache_key([self], '%s:%s' % (engine, layout),
+                                 vary_on=vary_on)
+            if key is not None:
+                return render_cached(
+                    key, cache, lambda placeholder: self._render_as(layout))
+        if environment is not None:
+            from .jinja import render_form
+            return render_form(environment, self, layout)
         context = template.Context({
             'form': self,
             'layout': layout,
         })
         return self._template_node.render(context)
 
+    @property
+    def media(self):
+        """
+        The media of the widgets, collected once per form class and widget
+        classes, see ``floppyforms.media.FormMediaCache``.
+        """
+        return form_media_cache.get(self)
+
+    def iter_render(self, layout=DEFAULT_LAYOUT):
+        """
+        Like rendering the form with ``layout``, but returns an iterator over
+        the rendered HTML. See ``floppyforms.iter_render``.
+        """
+        context = template.Context({
+            'form': self,
+            'layout': layout,
+        })
+        return self._template_node.iter_render(context)
+
+    def render_fields(self, names, layout=DEFAULT_LAYOUT, widgets=False):
+        """
+        Returns an ``OrderedDict`` of the field names ``names`` and the HTML
+        of their rows in ``layout``, or with ``widgets`` of their widgets.
+        The other rows are not rendered, see ``floppyforms.partial``.
+        """
+        with partial_render(self, names, widgets) as partial:
+            self._render_as(layout)
+        return partial.fragments
+
     def __str__(self):
-        return self._render_as('floppyforms/layouts/default.html')
+        return self._render_as(DEFAULT_LAYOUT)
 
     def as_p(self):
         return self._render_as('floppyforms/layouts/p.html')
@@ -3,6 +3,9 @@ try:
 except ImportError:
     from floppyforms.fields import CharField as BaseGeometryField  # noqa
 
+from django.core.exceptions import ValidationError
+from django.utils.translation import ugettext_lazy as _
+
 from . import widgets
 
 __all__ = ('GeometryField', 'GeometryCollectionField',
@@ -17,10 +20,21 @@ class GeometryWidget(widgets.BaseMetacartaWidget, widgets.GeometryWidget):
 
 class GeometryField(BaseGeometryField):
     widget = GeometryWidget
+    default_error_messages = {
+        'reduced': _('The full geometry could not be loaded, please try '
+                     'again.'),
+    }
 
     def __init__(self, *args, **kwargs):
         super(GeometryField, self).__init__(*args, **kwargs)
         self.widget.is_required = self.required  # Django < 1.3 support
+        self.widget.rejects_reduced = True
+
+    def clean(self, value):
+        if isinstance(value, widgets.ReducedGeometry):
+            raise ValidationError(self.error_messages['reduced'],
+                                  code='reduced')
+        return super(GeometryField, self).clean(value)
 
 
 class GeometryCollectionWidget(widgets.BaseMetacartaWidget,
@@ -0,0 +1,38 @@
+from django.http import HttpResponse
+from django.views.generic import View
+from django.views.generic.detail import SingleObjectMixin
+
+from .widgets import GeometryWidget
+
+__all__ = ('GeometryView',)
+
+
+class GeometryView(SingleObjectMixin, View):
+    """
+    Returns the full geometry stored in ``geometry_field`` of an object, for
+    the ``geometry_url`` of widgets that display a simplified geometry.
+
+    The object is looked up like in a ``DetailView``. Set ``map_srid`` and
+    ``as_geojson`` to the values of the widget that loads the geometry.
+    """
+    geometry_field = None
+    map_srid = 4326
+    as_geojson = False
+
+    def get_widget(self):
+        return GeometryWidget(attrs={
+            'map_srid': self.map_srid,
+            'as_geojson': self.as_geojson,
+        })
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        value = getattr(self.object, self.geometry_field)
+        serialized = ''
+        if value:
+            serialized = self.get_widget().serialize(value)
+        if self.as_geojson:
+            content_type = 'application/json'
+        else:
+            content_type = 'text/plain'
+        return HttpResponse(serialized, content_type=content_type)
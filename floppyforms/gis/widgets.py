@@ -1,4 +1,12 @@
+import copy
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
 from django.conf import settings
+from django.core.signals import setting_changed
 from django.utils import translation, six
 
 try:
@@ -14,7 +22,32 @@ __all__ = ('GeometryWidget', 'GeometryCollectionWidget',
            'PolygonWidget', 'MultiPolygonWidget',
            'BaseGeometryWidget', 'BaseMetacartaWidget',
            'BaseOsmWidget', 'BaseGMapWidget',
-           'BaseLeafletWidget',)
+           'BaseLeafletWidget', 'REDUCED_SUFFIX')
+
+
+#: Suffix of the hidden input that marks a value as reduced for display.
+REDUCED_SUFFIX = '_reduced'
+
+# The JSON options are embedded in inline scripts as well.
+_json_script_escapes = {
+    ord('<'): u'\\u003C',
+    ord('>'): u'\\u003E',
+    ord('&'): u'\\u0026',
+}
+
+decimal_re = re.compile(r'-?\d+\.\d+(?:[eE][-+]?\d+)?')
+
+
+def round_coordinates(text, precision):
+    """
+    Rounds all decimal numbers in a WKT or GeoJSON string to ``precision``
+    decimal places.
+    """
+    def round_number(match):
+        number = ('%.*f' % (precision, float(match.group()))).rstrip('0')
+        number = number.rstrip('.')
+        return '0' if number == '-0' else number
+    return decimal_re.sub(round_number, text)
 
 
 def _google_api_args():
@@ -36,16 +69,84 @@ def _google_api_args():
     return m
 
 
+class GeometryCache(object):
+    """
+    A bounded cache for the serialized values of geometry widgets. Geometries
+    are keyed on a hash of their WKB and their SRID, strings (from forms with
+    errors) on their text, together with the SRID, geometry type and format
+    of the widget. Repeated renderings of the same geometry thus skip parsing,
+    transforming and serializing it.
+    """
+    maxsize = 100
+
+    def __init__(self):
+        self.values = OrderedDict()
+        self.lock = threading.Lock()
+
+    def key(self, widget, value):
+        if isinstance(value, six.text_type):
+            identity = value
+        else:
+            identity = (hashlib.sha1(bytes(value.wkb)).digest(), value.srid)
+        reduction = None
+        if widget.is_reduced:
+            reduction = (widget.coordinate_precision,
+                         widget.simplify_tolerance)
+        return (identity, widget.map_srid, widget.geom_type,
+                widget.serialization_format, reduction)
+
+    def get(self, widget, value):
+        key = self.key(widget, value)
+        with self.lock:
+            try:
+                serialized = self.values.pop(key)
+            except KeyError:
+                pass
+            else:
+                self.values[key] = serialized
+                return serialized
+        serialized = widget.serialize(value)
+        with self.lock:
+            self.values[key] = serialized
+            while len(self.values) > self.maxsize:
+                self.values.popitem(last=False)
+        return serialized
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+
+geometry_cache = GeometryCache()
+
+
+def reset_geometry_cache(**kwargs):
+    geometry_cache.clear()
+
+
+setting_changed.connect(reset_geometry_cache)
+
+
 class BaseGeometryWidget(forms.Textarea):
     """
     The base class for rich geometry widgets. Custom widgets may be
     obtained by subclassing this base widget.
     """
     display_wkt = False
+    # the value is serialized and used by the map as well
+    value_hole = False
     map_width = 600
     map_height = 400
     map_srid = 4326
     template_name = 'floppyforms/gis/openlayers.html'
+    coordinate_precision = None
+    simplify_tolerance = None
+    geometry_url = None
+    lazy_map = False
+
+    #: Options of the javascript map widget, on top of the ones that
+    #: ``get_map_options()`` derives from the widget.
+    map_widget_options = {}
 
     # Internal API #
     is_point = False
@@ -53,10 +154,13 @@ class BaseGeometryWidget(forms.Textarea):
     is_polygon = False
     is_collection = False
     geom_type = 'GEOMETRY'
+    # set by the fields that reject ReducedGeometry values
+    rejects_reduced = False
 
     map_attrs = (
         'map_width', 'map_height', 'map_srid', 'display_wkt', 'as_geojson',
-        'mapquest_token', 'map_ids', 'primary_map',
+        'mapquest_token', 'map_ids', 'primary_map', 'coordinate_precision',
+        'simplify_tolerance', 'geometry_url', 'lazy_map',
     )
 
     def __init__(self, *args, **kwargs):
@@ -80,54 +184,90 @@ class BaseGeometryWidget(forms.Textarea):
             ctx['geom_type'] = 'Collection'
         return ctx
 
-    def get_context(self, name, value, attrs=None, extra_context={}):
+    @property
+    def serialization_format(self):
+        if getattr(self, 'as_geojson', False):
+            return 'geojson'
+        return 'wkt'
+
+    @property
+    def is_reduced(self):
+        """
+        Whether the displayed geometries are simplified or have their
+        coordinates rounded. With a ``geometry_url``, geometries are only
+        reduced for fields that reject the reduced value if the full one
+        wasn't loaded, like the geometry fields of floppyforms. Other fields
+        would save it.
+        """
+        if self.geometry_url and not self.rejects_reduced:
+            return False
+        return (self.coordinate_precision is not None or
+                bool(self.simplify_tolerance))
+
+    def serialize(self, value):
+        """
+        Returns ``value``, a geometry or its text representation, in the
+        ``serialization_format`` of the widget and transformed to its
+        ``map_srid``, simplified with ``simplify_tolerance`` and rounded to
+        ``coordinate_precision`` decimal places. Returns an empty string if
+        the value is invalid or of the wrong geometry type.
+        """
         # If a string reaches here (via a validation error on another
         # field) then just reconstruct the Geometry.
         if isinstance(value, six.text_type):
             try:
                 value = geos.GEOSGeometry(value)
             except (geos.GEOSException, ValueError):
-                value = None
-
-        if (
-            value and value.geom_type.upper() != self.geom_type and
-            self.geom_type != 'GEOMETRY'
-        ):
-            value = None
+                return ''
+
+        if (value.geom_type.upper() != self.geom_type and
+                self.geom_type != 'GEOMETRY'):
+            return ''
+
+        srid = self.map_srid
+        if not value.srid:
+            # If we're processing a form with errors, for some reason the
+            # SRID doesn't get set on the value, and the below
+            # ogr.transform always throws an exception (presumably because
+            # you can't transform from no SRID to self.map_srid). This just
+            # assumes it /should/ have been set the same as self.map_srid
+            # and proceeds appropriately.
+            value = value.ogr
+        elif value.srid != srid:
+            try:
+                value = value.ogr
+                value.transform(srid)
+            except gdal.OGRException:
+                return ''
+
+        if not self.is_reduced:
+            return getattr(value, self.serialization_format)
+        if self.simplify_tolerance:
+            if isinstance(value, gdal.OGRGeometry):
+                value = value.geos
+            value = value.simplify(self.simplify_tolerance,
+                                   preserve_topology=True)
+        serialized = getattr(value, self.serialization_format)
+        if self.coordinate_precision is not None:
+            serialized = round_coordinates(serialized,
+                                           self.coordinate_precision)
+        return serialized
 
+    def get_context(self, name, value, attrs=None, extra_context={}):
         # Defaulting the WKT value to a blank string
-        wkt = ''
-        geojson = ''
+        serialized = ''
         if value:
-            srid = self.map_srid
-            if not value.srid:
-                # If we're processing a form with errors, for some reason the
-                # SRID doesn't get set on the value, and the below
-                # ogr.transform always throws an exception (presumably because
-                # you can't transform from no SRID to self.map_srid). This just
-                # assumes it /should/ have been set the same as self.map_srid
-                # and proceeds appropriately.
-                ogr = value.ogr
-                value.srid = srid
-                wkt = ogr.wkt
-                geojson = ogr.geojson
-            elif value.srid != srid:
-                try:
-                    ogr = value.ogr
-                    ogr.transform(srid)
-                    wkt = ogr.wkt
-                    geojson = ogr.geojson
-                except gdal.OGRException:
-                    pass  # wkt left as an empty string
-            else:
-                wkt = value.wkt
-                geojson = value.geojson
-        if hasattr(self, 'as_geojson') and self.as_geojson:
-            context = super(BaseGeometryWidget, self).get_context(
-                name, geojson, attrs)
-        else:
-            context = super(BaseGeometryWidget, self).get_context(
-                name, wkt, attrs)
+            serialized = geometry_cache.get(self, value)
+            if not isinstance(value, six.text_type) and not value.srid:
+                value.srid = self.map_srid
+        context = super(BaseGeometryWidget, self).get_context(
+            name, serialized, attrs)
+        # The full geometry is loaded from geometry_url before it is edited
+        # or submitted, the hidden input tells value_from_datadict() that
+        # this didn't happen.
+        context['reduced'] = bool(
+            serialized and self.geometry_url and self.is_reduced)
+        context['reduced_name'] = name + REDUCED_SUFFIX
         context['module'] = 'map_%s' % name.replace('-', '_')
         context['name'] = name
         # Django >= 1.4 doesn't have ADMIN_MEDIA_PREFIX anymore, we must
@@ -137,13 +277,60 @@ class BaseGeometryWidget(forms.Textarea):
         else:
             context['ADMIN_MEDIA_PREFIX'] = settings.STATIC_URL + 'admin/'
         context['LANGUAGE_BIDI'] = translation.get_language_bidi()
+        map_options = json.dumps(self.get_map_options(context),
+                                 sort_keys=True)
+        context['map_options_json'] = six.text_type(map_options).translate(
+            _json_script_escapes)
         return context
 
+    def get_map_options(self, context):
+        """
+        Returns the options of the javascript map widget. Inline scripts
+        create eager maps from them, lazy maps once their container scrolls
+        into view or is clicked. Everything but JSON has to be resolved by
+        name in the javascript code, for instance ``base_layer`` in
+        ``MapWidget.baseLayers``.
+        """
+        map_id = '%s_map' % context['attrs'].get('id', '')
+        options = {
+            'geom_type': six.text_type(context['geom_type']),
+            'geometry_url': (context['geometry_url'] if context['reduced']
+                             else None),
+            'id': context['attrs'].get('id'),
+            'is_collection': self.is_collection,
+            'is_linestring': self.is_linestring,
+            'is_point': self.is_point,
+            'is_polygon': self.is_polygon,
+            'map_id': map_id,
+            'map_options': {},
+            'map_srid': self.map_srid,
+            'module': context['module'],
+            'name': context['name'],
+        }
+        options.update(copy.deepcopy(self.map_widget_options))
+        return options
+
+    def value_from_datadict(self, data, files, name):
+        value = super(BaseGeometryWidget, self).value_from_datadict(
+            data, files, name)
+        if value and data.get(name + REDUCED_SUFFIX):
+            return ReducedGeometry(value)
+        return value
+
     def render(self, name, value, attrs=None):
         _value = value
         return super(BaseGeometryWidget, self).render(name, _value, attrs)
 
 
+class ReducedGeometry(six.text_type):
+    """
+    A submitted value that is still the simplified or rounded geometry that
+    was rendered, because the full geometry wasn't loaded from the
+    ``geometry_url`` of the widget. The geometry fields of floppyforms reject
+    it, widgets only reduce geometries with a ``geometry_url`` for them.
+    """
+
+
 class GeometryWidget(BaseGeometryWidget):
     pass
 
@@ -189,8 +376,16 @@ class BaseLeafletWidget(BaseGeometryWidget):
     template_name = 'floppyforms/gis/leaflet.html'
     as_geojson = True
 
+    def get_map_options(self, context):
+        options = super(BaseLeafletWidget, self).get_map_options(context)
+        for key in ('mapquest_token', 'sat_id', 'street_id', 'primary_map'):
+            options[key] = context.get(key) or ''
+        options['map_ids'] = self.map_ids
+        return options
+
     class Media:
         js = (
+            'floppyforms/js/LazyMaps.js',
             'floppyforms/js/LeafletWidget.js',
             'https://unpkg.com/leaflet@1.2.0/dist/leaflet-src.js',
             'https://api.mqcdn.com/sdk/mapquest-js/v1.2.0/mapquest-core.js',
@@ -208,6 +403,7 @@ class BaseMetacartaWidget(BaseGeometryWidget):
     class Media:
         js = (
             'https://openlayers.org/api/OpenLayers.js',
+            'floppyforms/js/LazyMaps.js',
             'floppyforms/js/MapWidget.js',
         )
 
@@ -216,11 +412,25 @@ class BaseOsmWidget(BaseGeometryWidget):
     """An OpenStreetMap base widget"""
     map_srid = 900913
     template_name = 'floppyforms/gis/osm.html'
+    map_widget_options = {
+        'base_layer': 'osm',
+        'default_lat': 47,
+        'default_lon': 5,
+        'map_options': {
+            'maxExtent': [-20037508, -20037508, 20037508, 20037508],
+            'maxResolution': 156543.0339,
+            'numZoomLevels': 20,
+            'units': 'm',
+        },
+        'mouse_position': True,
+        'scale_text': True,
+    }
 
     class Media:
         js = (
             'https://openlayers.org/api/OpenLayers.js',
             'https://www.openstreetmap.org/openlayers/OpenStreetMap.js',
+            'floppyforms/js/LazyMaps.js',
             'floppyforms/js/MapWidget.js',
         )
 
@@ -229,10 +439,15 @@ class BaseGMapWidget(BaseGeometryWidget):
     """A Google Maps base widget"""
     map_srid = 900913
     template_name = 'floppyforms/gis/google.html'
+    map_widget_options = {
+        'base_layer': 'google',
+        'point_zoom': 14,
+    }
 
     class Media:
         js = (
             'https://openlayers.org/api/OpenLayers.js',
+            'floppyforms/js/LazyMaps.js',
             'floppyforms/js/MapWidget.js',
             'https://maps.google.com/maps/api/js?sensor=false',
         )
@@ -0,0 +1,466 @@
+"""
+Jinja2 support for floppyforms.
+
+``FormExtension`` implements the ``form``, ``formrow``, ``formfield``,
+``formconfig`` and ``widget`` tags for Jinja2 templates, with the same
+arguments and the same ``FormConfig`` semantics as the Django template tags.
+The Jinja2 versions of the widget, row and layout templates are in the
+``jinja2`` directory of the app, where Django's ``Jinja2`` template backend
+finds them if ``APP_DIRS`` is turned on::
+
+    TEMPLATES = [
+        {
+            'BACKEND': 'django.template.backends.jinja2.Jinja2',
+            'APP_DIRS': True,
+            'OPTIONS': {
+                'environment': 'floppyforms.jinja.environment',
+            },
+        },
+        {
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'APP_DIRS': True,
+        },
+    ]
+
+    FLOPPYFORMS_TEMPLATE_ENGINE = 'jinja2'
+
+Unlike ``{% include %}``, the tags only pass the variables of the template
+context on to the templates they render, not loop variables or variables
+set with ``{% set %}``. Use ``with`` to pass those.
+"""
+import weakref
+
+from django.utils.translation import ugettext, ungettext
+from jinja2 import Environment, nodes
+from jinja2.exceptions import TemplateRuntimeError
+from jinja2.ext import Extension
+from jinja2.runtime import Undefined
+from markupsafe import Markup
+
+from .choices import choice_cache
+from .compiled import render_attrs
+from .datalists import shared_datalists
+from .loader import _environment_autoescapes
+from .partial import get_partial_render
+from .profiling import record
+from .skeleton import widget_hole
+from .templatetags.floppyforms import (ConfigFilter, FormConfig, attributes,
+                                       hidden_field_errors, id as field_id,
+                                       is_field_list, is_form_list)
+
+
+__all__ = ('FormExtension', 'environment', 'render_form')
+
+
+CONFIG_CONTEXT_VAR = '_form_config'
+IN_FORM_CONTEXT_VAR = '_form_render'
+
+MODIFIERS = {
+    'row': ('row_template', 'row_context'),
+    'field': ('widget_template', 'widget_context'),
+}
+
+
+def _markup(environment, output, template_name):
+    """
+    Marks ``output`` of the template ``template_name`` as safe if
+    ``environment`` autoescapes it. Without autoescaping, the template didn't
+    escape its values.
+    """
+    if _environment_autoescapes(environment, template_name):
+        return Markup(output)
+    return output
+
+
+def _html(output):
+    """
+    Keeps the HTML of Django's rendering safe in Jinja2 templates.
+    """
+    if hasattr(output, '__html__'):
+        return Markup(output)
+    return output
+
+
+def _defined(value):
+    return value is not None and not isinstance(value, Undefined)
+
+
+def _flatten(variables, is_list):
+    values = []
+    for value in variables:
+        if _defined(value):
+            if is_list(value):
+                values.extend(value)
+            else:
+                values.append(value)
+    return values
+
+
+class FormExtension(Extension):
+    """
+    Adds the floppyforms template tags and the ``render_attrs``,
+    ``hidden_field_errors`` and ``id`` filters to a Jinja2 environment.
+    """
+    tags = set(['form', 'formrow', 'formfield', 'formconfig', 'widget'])
+
+    form_config = FormConfig
+
+    def __init__(self, environment):
+        super(FormExtension, self).__init__(environment)
+        environment.filters.setdefault('render_attrs', render_attrs)
+        environment.filters.setdefault('hidden_field_errors',
+                                       hidden_field_errors)
+        environment.filters.setdefault('id', field_id)
+        environment.globals.setdefault('_', ugettext)
+        environment.globals.setdefault('gettext', ugettext)
+        environment.globals.setdefault('ngettext', ungettext)
+
+    # Parsing
+
+    def parse(self, parser):
+        token = next(parser.stream)
+        return getattr(self, 'parse_%s' % token.value)(parser, token)
+
+    def _state(self):
+        """
+        The form configuration and the flag set by the ``form`` tag are
+        looked up by name, so that the values passed to the body of a
+        ``{% form ... using %}`` block are found as well.
+        """
+        return [nodes.Name(CONFIG_CONTEXT_VAR, 'load'),
+                nodes.Name(IN_FORM_CONTEXT_VAR, 'load')]
+
+    def _parse_variables(self, parser, tagname):
+        variables = []
+        while (parser.stream.current.type != 'block_end' and
+               not parser.stream.current.test_any(
+                   'name:using', 'name:with', 'name:only', 'name:for')):
+            variables.append(parser.parse_expression())
+        if not variables:
+            parser.fail('%s tag expectes at least one template variable as '
+                        'argument.' % tagname, parser.stream.current.lineno)
+        return variables
+
+    def _parse_using(self, parser, tagname, block=False):
+        if not parser.stream.skip_if('name:using'):
+            return None
+        if parser.stream.current.test_any('name:with', 'name:only'):
+            parser.fail('%s: you must provide one template after "using" and '
+                        'before "with" or "only".' % tagname,
+                        parser.stream.current.lineno)
+        if parser.stream.current.type == 'block_end':
+            if block:
+                return 'block'
+            parser.fail('%s: expected a template name after "using".' %
+                        tagname, parser.stream.current.lineno)
+        return parser.parse_expression()
+
+    def _parse_with(self, parser, tagname):
+        if not parser.stream.skip_if('name:with'):
+            return []
+        items = []
+        while (parser.stream.current.type == 'name' and
+               parser.stream.look().type == 'assign'):
+            key = next(parser.stream).value
+            parser.stream.expect('assign')
+            items.append((key, parser.parse_expression()))
+        if not items:
+            parser.fail('"with" in %s tag needs at least one keyword '
+                        'argument.' % tagname, parser.stream.current.lineno)
+        return items
+
+    def _parse_only(self, parser):
+        return nodes.Const(bool(parser.stream.skip_if('name:only')))
+
+    def _parse_end(self, parser, tagname):
+        if parser.stream.current.type != 'block_end':
+            parser.fail('Unknown argument for %s tag: %r.' %
+                        (tagname, parser.stream.current.value),
+                        parser.stream.current.lineno)
+
+    def _dict(self, items, lineno):
+        return nodes.Dict([nodes.Pair(nodes.Const(key), value, lineno=lineno)
+                           for key, value in items], lineno=lineno)
+
+    def _output(self, method, args, lineno):
+        call = self.call_method(method, args, lineno=lineno)
+        return nodes.Output([call], lineno=lineno)
+
+    def parse_form(self, parser, token):
+        tagname = token.value
+        variables = self._parse_variables(parser, tagname)
+        if parser.stream.current.type == 'block_end':
+            using = nodes.Const(None)
+        elif parser.stream.current.test('name:using'):
+            using = self._parse_using(parser, tagname, block=True)
+        else:
+            parser.fail('Unknown argument for %s tag: %r.' %
+                        (tagname, parser.stream.current.value), token.lineno)
+        extra = self._parse_with(parser, tagname)
+        only = self._parse_only(parser)
+        self._parse_end(parser, tagname)
+
+        args = [nodes.ContextReference()] + self._state() + [
+            nodes.List(variables), self._dict(extra, token.lineno), only]
+        if isinstance(using, nodes.Node):
+            return self._output('_render_form', args + [using], token.lineno)
+
+        body = parser.parse_statements(('name:end%s' % tagname,),
+                                       drop_needle=True)
+        params = ['form', 'forms', CONFIG_CONTEXT_VAR, IN_FORM_CONTEXT_VAR]
+        params.extend(key for key, value in extra if key not in params)
+        return nodes.CallBlock(
+            self.call_method('_render_form', args + [nodes.Const(None)]),
+            [nodes.Name(param, 'param') for param in params], [],
+            body).set_lineno(token.lineno)
+
+    def parse_formrow(self, parser, token):
+        tagname = token.value
+        variables = self._parse_variables(parser, tagname)
+        using = self._parse_using(parser, tagname) or nodes.Const(None)
+        extra = self._parse_with(parser, tagname)
+        only = self._parse_only(parser)
+        self._parse_end(parser, tagname)
+        args = [nodes.ContextReference()] + self._state() + [
+            nodes.List(variables), using, self._dict(extra, token.lineno),
+            only]
+        return self._output('_render_formrow', args, token.lineno)
+
+    def parse_formfield(self, parser, token):
+        tagname = token.value
+        variables = self._parse_variables(parser, tagname)
+        if len(variables) != 1:
+            parser.fail('%s tag expectes exactly one template variable as '
+                        'argument.' % tagname, token.lineno)
+        using = self._parse_using(parser, tagname) or nodes.Const(None)
+        extra = self._parse_with(parser, tagname)
+        only = self._parse_only(parser)
+        self._parse_end(parser, tagname)
+        args = [nodes.ContextReference()] + self._state() + [
+            variables[0], using, self._dict(extra, token.lineno), only]
+        return self._output('_render_formfield', args, token.lineno)
+
+    def parse_formconfig(self, parser, token):
+        tagname = token.value
+        modifier = parser.stream.current.value
+        if (parser.stream.current.type != 'name' or
+                modifier not in MODIFIERS):
+            parser.fail('%s needs one of the following keywords as first '
+                        'argument: %s' % (tagname, ', '.join(MODIFIERS)),
+                        token.lineno)
+        next(parser.stream)
+        if parser.stream.current.type == 'block_end':
+            parser.fail('%s %s: at least one argument is required.' %
+                        (tagname, modifier), token.lineno)
+        using = self._parse_using(parser, tagname) or nodes.Const(None)
+        extra = self._parse_with(parser, tagname)
+        for_ = nodes.Const(None)
+        if modifier == 'field' and parser.stream.skip_if('name:for'):
+            for_ = parser.parse_expression()
+        if parser.stream.current.type != 'block_end':
+            parser.fail('Unknown argument for %s %s tag: %r.' %
+                        (tagname, modifier, parser.stream.current.value),
+                        parser.stream.current.lineno)
+        args = self._state() + [
+            nodes.Const(modifier), using,
+            self._dict(extra, token.lineno) if extra else nodes.Const(None),
+            for_]
+        return self._output('_configure', args, token.lineno)
+
+    def parse_widget(self, parser, token):
+        field = parser.parse_expression()
+        if parser.stream.current.type != 'block_end':
+            parser.fail('{% widget %} takes one and only one argument',
+                        token.lineno)
+        return self._output('_render_widget',
+                            [nodes.ContextReference(), field], token.lineno)
+
+    # Rendering
+
+    def get_config(self, config):
+        if isinstance(config, FormConfig):
+            return config
+        return self.form_config()
+
+    def _template_context(self, context, config, in_form, extra_context,
+                          only):
+        if only:
+            template_context = {}
+        else:
+            template_context = dict(context.get_all())
+        if in_form:
+            template_context[IN_FORM_CONTEXT_VAR] = True
+        template_context.update(extra_context)
+        template_context[CONFIG_CONTEXT_VAR] = config
+        return template_context
+
+    def _render_template(self, entry, template_name, template_context):
+        template = self.environment.get_template(template_name)
+        entry.template_name = template.name
+        return _markup(self.environment, template.render(template_context),
+                       template.name)
+
+    def _render_form(self, context, config, in_form, variables, extra, only,
+                     using, caller=None):
+        config = self.get_config(config)
+        forms = _flatten(variables, is_form_list)
+        extra_context = {
+            'form': forms[0] if forms else None,
+            'forms': forms,
+            IN_FORM_CONTEXT_VAR: True,
+        }
+        extra_context.update(extra)
+        # The forms of a formset share the choices of their model choice
+        # fields and the datalists of their inputs.
+        if len(forms) > 1:
+            with choice_cache(), shared_datalists():
+                return self._render_form_template(
+                    context, config, extra_context, only, using, caller)
+        return self._render_form_template(context, config, extra_context,
+                                          only, using, caller)
+
+    def _render_form_template(self, context, config, extra_context, only,
+                              using, caller):
+        with record('form') as entry:
+            config.push()
+            try:
+                if caller is not None:
+                    # Markup if the calling template autoescapes.
+                    extra_context[CONFIG_CONTEXT_VAR] = config
+                    return caller(**extra_context)
+                template_name = using or config.retrieve('layout')
+                return self._render_template(
+                    entry, template_name, self._template_context(
+                        context, config, True, extra_context, only))
+            finally:
+                config.pop()
+
+    def _render_formrow(self, context, config, in_form, variables, using,
+                        extra, only):
+        config = self.get_config(config)
+        fields = _flatten(variables, is_field_list)
+        extra_context = {}
+        # most recently used values should overwrite older ones
+        for row_context in reversed(config.retrieve_all('row_context')):
+            extra_context.update(row_context)
+        extra_context['field'] = fields[0] if fields else None
+        extra_context['fields'] = fields
+        extra_context.update(extra)
+        partial = get_partial_render()
+        if partial is not None:
+            return partial.row(fields, lambda: self._render_row(
+                context, config, in_form, using, extra_context, only))
+        return self._render_row(context, config, in_form, using,
+                                extra_context, only)
+
+    def _render_row(self, context, config, in_form, using, extra_context,
+                    only):
+        with record('formrow') as entry:
+            config.push()
+            try:
+                template_name = using or config.retrieve('row_template')
+                return self._render_template(
+                    entry, template_name, self._template_context(
+                        context, config, in_form, extra_context, only))
+            finally:
+                config.pop()
+
+    def _render_formfield(self, context, config, in_form, bound_field, using,
+                          extra, only):
+        if not _defined(bound_field):
+            return u''
+        config = self.get_config(config)
+        partial = get_partial_render()
+        if partial is not None:
+            return partial.field(bound_field, lambda: self._render_field(
+                config, bound_field, using))
+        return self._render_field(config, bound_field, using)
+
+    def _render_field(self, config, bound_field, using):
+        with record('formfield', name=bound_field.name) as entry:
+            widget = config.retrieve('widget', bound_field=bound_field)
+            template_name = using or config.retrieve('widget_template',
+                                                     bound_field=bound_field)
+            entry.template_name = template_name
+
+            hole = widget_hole(bound_field, widget, template_name)
+            if hole is not None:
+                return Markup(hole)
+
+            config.push()
+            try:
+                with attributes(widget,
+                                template_name=template_name) as widget:
+                    output = bound_field.as_widget(widget=widget)
+            finally:
+                config.pop()
+
+            if bound_field.field.show_hidden_initial:
+                output = output + bound_field.as_hidden(only_initial=True)
+            return _html(output)
+
+    def _configure(self, config, in_form, modifier, using, extra, for_):
+        if not in_form or not isinstance(config, FormConfig):
+            raise TemplateRuntimeError('formconfig must be used inside a '
+                                       'form tag.')
+        template_config_name, context_config_name = MODIFIERS[modifier]
+        with record('formconfig', name=modifier):
+            filter = None
+            if for_ is not None:
+                if not _defined(for_):
+                    return u''
+                filter = ConfigFilter(for_)
+            if using is not None:
+                config.configure(template_config_name, using, filter=filter)
+            if extra is not None:
+                config.configure(context_config_name, extra, filter=filter)
+            return u''
+
+    def _render_widget(self, context, field):
+        widget = field.field.widget
+        if callable(getattr(widget, 'get_context', None)):
+            attrs = {'id': field.auto_id}
+            widget_context = widget.get_context(field.html_name,
+                                                field.value(), attrs)
+            template_name = widget.template_name
+        else:
+            widget_context = {'field': field}
+            template_name = 'floppyforms/dummy.html'
+
+        with record('widget', name=field.name, template_name=template_name):
+            template_context = dict(context.get_all())
+            template_context.update(widget_context)
+            template = self.environment.get_template(template_name)
+            return _markup(self.environment,
+                           template.render(template_context), template.name)
+
+
+def environment(**options):
+    """
+    Creates a Jinja2 environment with the ``FormExtension``. Can be used as
+    ``environment`` option of Django's ``Jinja2`` template backend.
+    """
+    extensions = list(options.pop('extensions', ()))
+    if FormExtension not in extensions and \
+            'floppyforms.jinja.FormExtension' not in extensions:
+        extensions.append(FormExtension)
+    return Environment(extensions=extensions, **options)
+
+
+_form_templates = weakref.WeakKeyDictionary()
+
+
+def render_form(environment, form, layout):
+    """
+    Renders a form, a formset or a list of forms with ``layout`` using the
+    given Jinja2 environment, like ``{% form form using layout %}``.
+    """
+    try:
+        template = _form_templates[environment]
+    except KeyError:
+        if FormExtension.identifier not in environment.extensions:
+            environment.add_extension(FormExtension)
+        template = environment.from_string('{% form form using layout %}')
+        _form_templates[environment] = template
+    return _markup(environment, template.render(form=form, layout=layout),
+                   template.name)
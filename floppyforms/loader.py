@@ -0,0 +1,329 @@
+"""
+Template loading for widgets and form layouts.
+
+Widgets look up their template every time they are rendered. Unless the
+cached template loader is enabled, this means searching the template
+directories and parsing the template again for every single widget. The
+functions in this module keep the compiled templates in a bounded in-process
+cache instead, independently of the configured template loaders.
+"""
+import os
+import sys
+import threading
+from collections import namedtuple, OrderedDict
+
+import django
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.template import Context, TemplateDoesNotExist, loader
+from django.utils.safestring import mark_safe
+
+try:
+    from django.template import engines
+    from django.template.backends.django import DjangoTemplates
+except ImportError:
+    # Django < 1.8 has no multiple template engines.
+    engines = None
+
+
+__all__ = ('TemplateCache', 'template_cache', 'get_template',
+           'render_to_string', 'render', 'find_template',
+           'find_template_source', 'get_engine_name',
+           'get_widget_template', 'find_widget_template',
+           'get_jinja2_environment', 'is_jinja2_engine')
+
+
+CacheInfo = namedtuple('CacheInfo', ('hits', 'misses', 'maxsize', 'currsize'))
+
+
+def _loaders(loaders):
+    for loader_ in loaders:
+        # The cached loader wraps the loaders that actually find templates.
+        if hasattr(loader_, 'loaders'):
+            for inner in _loaders(loader_.loaders):
+                yield inner
+        else:
+            yield loader_
+
+
+def is_jinja2_engine(engine):
+    """
+    Whether ``engine`` is an engine of Django's Jinja2 backend. Jinja2 is not
+    imported for projects that don't configure such an engine.
+    """
+    backend = sys.modules.get('django.template.backends.jinja2')
+    return backend is not None and isinstance(engine, backend.Jinja2)
+
+
+def _template_source(engine, template_name):
+    if is_jinja2_engine(engine):
+        from jinja2 import TemplateNotFound
+
+        try:
+            source, path, uptodate = engine.env.loader.get_source(
+                engine.env, template_name)
+        except TemplateNotFound:
+            raise TemplateDoesNotExist(template_name)
+        return source, path
+    if not isinstance(engine, DjangoTemplates):
+        engine.get_template(template_name)
+        return None, None
+    for loader_ in _loaders(engine.engine.template_loaders):
+        try:
+            source, display_name = loader_.load_template_source(template_name)
+        except TemplateDoesNotExist:
+            continue
+        except NotImplementedError:
+            return None, None
+        return source, display_name
+    raise TemplateDoesNotExist(template_name)
+
+
+def find_template_source(template_name, using=None):
+    """
+    Like ``find_template`` but returns an ``(engine, path, source)`` tuple.
+    ``source`` is ``None`` if it cannot be determined.
+    """
+    if engines is None:
+        raise TemplateDoesNotExist(template_name)
+    if using is None:
+        candidates = engines.all()
+    else:
+        candidates = [engines[using]]
+    for engine in candidates:
+        try:
+            source, path = _template_source(engine, template_name)
+        except TemplateDoesNotExist:
+            continue
+        return engine, path, source
+    raise TemplateDoesNotExist(template_name)
+
+
+def find_template(template_name, using=None):
+    """
+    Returns a ``(engine, path)`` tuple for the template engine that will load
+    ``template_name`` and the file it will be loaded from. ``path`` is
+    ``None`` if it cannot be determined, e.g. for custom template loaders.
+
+    Raises ``TemplateDoesNotExist`` if none of the engines has the template.
+    """
+    engine, path, source = find_template_source(template_name, using=using)
+    return engine, path
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except (OSError, TypeError):
+        return None
+
+
+class TemplateCache(object):
+    """
+    A least-recently-used cache that maps ``(template_name, engine)`` to the
+    compiled template.
+
+    If ``DEBUG`` is turned on, the modification time of the template file is
+    checked on every lookup and the template is loaded again once it changed.
+    """
+    default_maxsize = 200
+
+    def __init__(self, maxsize=None):
+        self._maxsize = maxsize
+        self.templates = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        if self._maxsize is not None:
+            return self._maxsize
+        return getattr(settings, 'FLOPPYFORMS_TEMPLATE_CACHE_SIZE',
+                       self.default_maxsize)
+
+    def _load(self, template_name, using):
+        if using is None:
+            template = loader.get_template(template_name)
+        else:
+            template = loader.get_template(template_name, using=using)
+        path = None
+        if settings.DEBUG:
+            try:
+                engine, path = find_template(template_name, using=using)
+            except TemplateDoesNotExist:
+                pass
+        return template, path, _mtime(path)
+
+    def get_template(self, template_name, using=None):
+        key = (template_name, using)
+        with self.lock:
+            entry = self.templates.pop(key, None)
+            if entry is not None:
+                template, path, mtime = entry
+                if not (settings.DEBUG and path is not None and
+                        _mtime(path) != mtime):
+                    self.templates[key] = entry
+                    self.hits += 1
+                    return template
+            self.misses += 1
+
+        entry = self._load(template_name, using)
+        maxsize = self.maxsize
+        with self.lock:
+            self.templates[key] = entry
+            while len(self.templates) > maxsize:
+                self.templates.popitem(last=False)
+        return entry[0]
+
+    def set_template(self, template_name, template, using=None, path=None):
+        """
+        Puts a template that was loaded elsewhere into the cache. ``path`` is
+        the file it was loaded from, for the modification time check.
+        """
+        if not settings.DEBUG:
+            path = None
+        entry = (template, path, _mtime(path))
+        maxsize = self.maxsize
+        with self.lock:
+            self.templates.pop((template_name, using), None)
+            self.templates[(template_name, using)] = entry
+            while len(self.templates) > maxsize:
+                self.templates.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.templates.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """
+        Returns a named tuple with the hit and miss counters, the maximum
+        size and the current size of the cache.
+        """
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize,
+                             len(self.templates))
+
+
+template_cache = TemplateCache()
+
+
+def get_template(template_name, using=None):
+    """
+    Like ``django.template.loader.get_template`` but the compiled template is
+    kept in the floppyforms template cache.
+    """
+    return template_cache.get_template(template_name, using=using)
+
+
+def render_to_string(template_name, context=None, using=None):
+    """
+    Renders ``template_name`` with the ``context`` dictionary, using the
+    floppyforms template cache.
+    """
+    return render(get_template(template_name, using=using), context)
+
+
+def render(template, context=None):
+    """
+    Renders a template returned by ``get_template`` with the ``context``
+    dictionary. Use it to render the same template several times without
+    looking it up again.
+    """
+    if django.VERSION < (1, 8) and not isinstance(context, Context):
+        context = Context(context)
+    output = template.render(context)
+    # Templates of the Django template language return safe strings already,
+    # Jinja2 templates only escape the values with autoescaping.
+    if _autoescapes(template):
+        return mark_safe(output)
+    return output
+
+
+def _autoescapes(template):
+    """
+    Whether ``template`` is a Jinja2 template of an environment with
+    autoescaping for it.
+    """
+    jinja_template = getattr(template, 'template', None)
+    environment = getattr(jinja_template, 'environment', None)
+    if environment is None:
+        return False
+    return _environment_autoescapes(environment, jinja_template.name)
+
+
+def _environment_autoescapes(environment, template_name):
+    """
+    Whether the Jinja2 ``environment`` autoescapes the template named
+    ``template_name``.
+    """
+    autoescape = environment.autoescape
+    if callable(autoescape):
+        autoescape = autoescape(template_name)
+    return bool(autoescape)
+
+
+def get_engine_name():
+    """
+    Returns the name of the template engine that renders widgets and form
+    layouts, set with ``FLOPPYFORMS_TEMPLATE_ENGINE``, or ``None`` to use the
+    first engine that has the template.
+    """
+    return getattr(settings, 'FLOPPYFORMS_TEMPLATE_ENGINE', None)
+
+
+def get_widget_template(template_name):
+    """
+    Returns the template for a widget from the ``FLOPPYFORMS_TEMPLATE_ENGINE``
+    engine. Templates that this engine doesn't have are looked up in all the
+    engines, so that e.g. custom widget templates for the Django template
+    language keep working.
+    """
+    using = get_engine_name()
+    if using is not None:
+        try:
+            return get_template(template_name, using=using)
+        except TemplateDoesNotExist:
+            pass
+    return get_template(template_name)
+
+
+def find_widget_template(template_name):
+    """
+    Like ``find_template`` for the engine that ``get_widget_template`` loads
+    ``template_name`` from.
+    """
+    using = get_engine_name()
+    if using is not None:
+        try:
+            return find_template(template_name, using=using)
+        except TemplateDoesNotExist:
+            pass
+    return find_template(template_name)
+
+
+def get_jinja2_environment():
+    """
+    Returns the Jinja2 environment of the ``FLOPPYFORMS_TEMPLATE_ENGINE``
+    engine, or ``None`` if the engine isn't a Jinja2 engine.
+    """
+    using = get_engine_name()
+    if using is None or engines is None:
+        return None
+    engine = engines[using]
+    if not is_jinja2_engine(engine):
+        return None
+    return engine.env
+
+
+def reset(**kwargs):
+    setting = kwargs.get('setting')
+    if setting is None or setting.startswith('TEMPLATE') or setting in (
+            'DEBUG', 'INSTALLED_APPS', 'FILE_CHARSET',
+            'FLOPPYFORMS_TEMPLATE_ENGINE'):
+        template_cache.clear()
+
+
+setting_changed.connect(reset)
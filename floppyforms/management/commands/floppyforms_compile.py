@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from floppyforms.precompiled import (collect_template_names,
+                                     compile_templates, write_module)
+
+
+class Command(BaseCommand):
+    help = ('Compiles the templates of all widgets, rows and layouts into a '
+            'Python module for the FLOPPYFORMS_PRECOMPILED_TEMPLATES '
+            'setting.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output',
+                            help='Path of the Python module to write.')
+        parser.add_argument('--template', action='append', dest='templates',
+                            default=[], metavar='NAME',
+                            help='Compile this template as well, e.g. a '
+                                 'custom layout. Can be given several times.')
+
+    def handle(self, *args, **options):
+        names = collect_template_names(extra=options['templates'])
+        entries = compile_templates(names)
+        found = set(name for name, engine in entries)
+        for name in options['templates']:
+            if name not in found:
+                raise CommandError('Template %s does not exist.' % name)
+        write_module(entries, options['output'])
+        if int(options.get('verbosity', 1)) > 0:
+            self.stdout.write('Compiled %d templates into %s.' %
+                              (len(found), options['output']))
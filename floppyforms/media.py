@@ -0,0 +1,197 @@
+"""
+Collects the media of forms, formsets and widgets.
+
+Django adds up the media of the widgets of a form with ``Media.__add__``,
+which copies the lists collected so far and searches them for every path of
+every widget. With many fields or forms, that's quadratic. Here, the media
+are collected in one pass, paths are deduplicated with dictionaries and the
+result is cached per form class and widget classes, unless a widget
+computes its media per instance. The tags of a cached ``Media`` are only
+rendered once.
+"""
+import threading
+from collections import OrderedDict
+
+from django.core.signals import setting_changed
+from django.forms.widgets import Media, MultiWidget
+
+
+__all__ = ('CollectedMedia', 'MediaCollector', 'collect_media')
+
+
+class CollectedMedia(Media):
+    """
+    A ``Media`` that keeps its rendered tags until more media are added.
+    """
+    def __init__(self, media=None, **kwargs):
+        self._html = None
+        super(CollectedMedia, self).__init__(media, **kwargs)
+
+    def render(self):
+        if self._html is None:
+            self._html = super(CollectedMedia, self).render()
+        return self._html
+
+    def add_js(self, data):
+        self._html = None
+        super(CollectedMedia, self).add_js(data)
+
+    def add_css(self, data):
+        self._html = None
+        super(CollectedMedia, self).add_css(data)
+
+    def copy(self):
+        media = CollectedMedia()
+        media._js = list(self._js)
+        media._css = dict((medium, list(paths))
+                          for medium, paths in self._css.items())
+        media._html = self._html
+        return media
+
+
+class MediaCollector(object):
+    """
+    Gathers the paths of ``Media`` objects in order, without duplicates.
+    """
+    def __init__(self):
+        self.js = OrderedDict()
+        self.css = {}
+
+    def add(self, media):
+        for path in getattr(media, '_js', ()):
+            self.js.setdefault(path, None)
+        for medium, paths in getattr(media, '_css', {}).items():
+            collected = self.css.setdefault(medium, OrderedDict())
+            for path in paths:
+                collected.setdefault(path, None)
+
+    def add_widget(self, widget):
+        self.add(widget.media)
+
+    def add_form(self, form):
+        # The media of floppyforms forms come from form_media_cache.
+        self.add(form.media)
+
+    def add_formset(self, formset):
+        for form in formset:
+            self.add_form(form)
+        if not formset.forms:
+            self.add_form(formset.empty_form)
+
+    def media(self):
+        media = CollectedMedia()
+        media._js = list(self.js)
+        media._css = dict((medium, list(paths))
+                          for medium, paths in self.css.items())
+        return media
+
+
+def _is_class_media(media):
+    """
+    Whether ``media``, the ``media`` attribute in the ``__dict__`` of a
+    widget class, only depends on the classes of the widget. That's the case
+    for ``Media`` instances and for the property that Django creates from a
+    ``Media`` class. ``MultiWidget`` adds up the media of its subwidgets,
+    their classes are part of the key.
+    """
+    if isinstance(media, Media):
+        return True
+    if not isinstance(media, property):
+        return False
+    if media is MultiWidget.__dict__['media']:
+        return True
+    return (media.fget.__name__ == '_media' and
+            media.fget.__module__ == Media.__module__)
+
+
+def widget_key(widget):
+    """
+    The media of a widget are defined by its class, and by the classes of
+    its subwidgets for multi widgets. Returns ``None`` for widgets that
+    compute their media per instance with a ``media`` property, e.g. from
+    their attrs or from a wrapped widget.
+    """
+    for cls in type(widget).__mro__:
+        if 'media' in cls.__dict__ and not _is_class_media(
+                cls.__dict__['media']):
+            return None
+    subwidgets = getattr(widget, 'widgets', None)
+    if subwidgets is None:
+        return type(widget)
+    keys = tuple(widget_key(w) for w in subwidgets)
+    if None in keys:
+        return None
+    return (type(widget), keys)
+
+
+class FormMediaCache(object):
+    """
+    Maps a form class and the widget classes of its fields to the collected
+    media of the widgets. ``get()`` returns a copy of the cached ``Media``.
+    """
+    maxsize = 100
+
+    def __init__(self):
+        self.media = OrderedDict()
+        self.lock = threading.Lock()
+
+    def key(self, form):
+        """
+        Returns ``None`` if the media of a widget can't be cached.
+        """
+        keys = tuple(widget_key(field.widget)
+                     for field in form.fields.values())
+        if None in keys:
+            return None
+        return (type(form), keys)
+
+    def collect(self, form):
+        collector = MediaCollector()
+        for field in form.fields.values():
+            collector.add_widget(field.widget)
+        return collector.media()
+
+    def get(self, form):
+        key = self.key(form)
+        if key is None:
+            return self.collect(form)
+        media = self.media.get(key)
+        if media is None:
+            media = self.collect(form)
+            with self.lock:
+                self.media[key] = media
+                while len(self.media) > self.maxsize:
+                    self.media.popitem(last=False)
+        return media.copy()
+
+    def clear(self):
+        with self.lock:
+            self.media.clear()
+
+
+form_media_cache = FormMediaCache()
+
+
+def reset_media_cache(**kwargs):
+    form_media_cache.clear()
+
+
+setting_changed.connect(reset_media_cache)
+
+
+def collect_media(*objects):
+    """
+    Returns the media of forms, formsets, widgets and ``Media`` objects, in
+    order and without duplicates.
+    """
+    collector = MediaCollector()
+    for obj in objects:
+        if hasattr(obj, 'management_form'):
+            collector.add_formset(obj)
+        elif hasattr(obj, 'fields'):
+            collector.add_form(obj)
+        elif isinstance(obj, Media):
+            collector.add(obj)
+        else:
+            collector.add_widget(obj)
+    return collector.media()
@@ -2,9 +2,11 @@ import warnings
 
 from django.forms import models
 
+from .choices import get_choice_cache
 from .fields import Field
 from .forms import LayoutRenderer
-from .widgets import Select, SelectMultiple
+from .widgets import (AutocompleteSelect, AutocompleteSelectMultiple, Select,
+                      SelectMultiple)
 
 __all__ = ('ModelForm', 'ModelChoiceField', 'ModelMultipleChoiceField')
 
@@ -22,9 +24,58 @@ class ModelForm(LayoutRenderer, models.ModelForm):
         return super(ModelForm, cls).__new__(cls, *args, **kwargs)
 
 
+class ModelChoiceIterator(models.ModelChoiceIterator):
+    """
+    Evaluates the queryset only once per ``choice_cache()`` block.
+    """
+    def __iter__(self):
+        cache = get_choice_cache()
+        if cache is None:
+            return super(ModelChoiceIterator, self).__iter__()
+        return iter(cache.get(self, 'choices', self.evaluate))
+
+    def evaluate(self):
+        return list(super(ModelChoiceIterator, self).__iter__())
+
+    def get_optgroups(self, build_optgroups):
+        """
+        Returns the optgroups that ``build_optgroups(choices)`` creates for
+        the choices, shared by all widgets with the same queryset inside a
+        ``choice_cache()`` block.
+        """
+        cache = get_choice_cache()
+        if cache is None:
+            return build_optgroups(self)
+        return cache.get(self, 'optgroups', lambda: build_optgroups(self))
+
+
 class ModelChoiceField(Field, models.ModelChoiceField):
     widget = Select
+    autocomplete_widget = AutocompleteSelect
+
+    def __init__(self, *args, **kwargs):
+        # The name of a lookup registered with floppyforms.autocomplete.
+        autocomplete = kwargs.pop('autocomplete', None)
+        if autocomplete is not None and kwargs.get('widget') is None:
+            kwargs['widget'] = self.autocomplete_widget(lookup=autocomplete)
+        super(ModelChoiceField, self).__init__(*args, **kwargs)
+
+    def _get_choices(self):
+        if hasattr(self, '_choices'):
+            return self._choices
+        return ModelChoiceIterator(self)
+
+    choices = property(_get_choices, models.ModelChoiceField._set_choices)
 
 
 class ModelMultipleChoiceField(Field, models.ModelMultipleChoiceField):
     widget = SelectMultiple
+    autocomplete_widget = AutocompleteSelectMultiple
+
+    def __init__(self, *args, **kwargs):
+        autocomplete = kwargs.pop('autocomplete', None)
+        if autocomplete is not None and kwargs.get('widget') is None:
+            kwargs['widget'] = self.autocomplete_widget(lookup=autocomplete)
+        super(ModelMultipleChoiceField, self).__init__(*args, **kwargs)
+
+    choices = ModelChoiceField.choices
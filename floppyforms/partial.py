@@ -0,0 +1,161 @@
+"""
+Partial rendering of forms.
+
+Live validation refreshes a single row of a form after the user left one of
+its fields. ``form.render_fields(names, layout)`` renders the form with
+``layout`` inside a ``partial_render()`` block: the ``{% formrow %}`` and
+``{% formfield %}`` tags skip the rows and widgets of the other fields, and
+the rows of the requested fields are collected instead of being added to
+the output. They are rendered with the row templates and the
+``{% formconfig %}`` state of the layout, exactly like in the whole form.
+
+``clean_fields()`` validates some fields of a bound form without calling
+``full_clean()``, and ``floppyforms.views.FieldValidationView`` combines
+both for AJAX requests.
+"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.exceptions import ValidationError
+from django.forms.fields import FileField
+from django.forms.utils import ErrorDict
+from django.utils.safestring import mark_safe
+
+
+__all__ = ('PartialRender', 'partial_render', 'get_partial_render',
+           'clean_fields')
+
+
+_local = threading.local()
+
+
+def get_partial_render():
+    """
+    Returns the ``PartialRender`` of the ``partial_render()`` block of the
+    current thread, or ``None``.
+    """
+    return getattr(_local, 'partial', None)
+
+
+class PartialRender(object):
+    """
+    Collects the HTML of the rows, or with ``widgets`` of the widgets, of the
+    fields ``names`` of ``form`` while the form is rendered.
+    """
+    def __init__(self, form, names, widgets=False):
+        self.form = form
+        self.names = list(names)
+        self.widgets = widgets
+        self.html = {}
+        # number of rows being rendered
+        self.depth = 0
+
+    def requested(self, fields):
+        return [field.name for field in fields
+                if getattr(field, 'form', None) is self.form and
+                field.name in self.names]
+
+    def row(self, fields, render):
+        """
+        Used by ``{% formrow %}``: renders the row with ``render()`` if it
+        shows one of the requested fields. Returns nothing, the row is not
+        part of the output of the layout.
+        """
+        names = self.requested(fields)
+        if not names:
+            return u''
+        self.depth += 1
+        try:
+            output = render()
+        finally:
+            self.depth -= 1
+        if not self.widgets:
+            for name in names:
+                self.html[name] = output
+        return u''
+
+    def field(self, bound_field, render):
+        """
+        Used by ``{% formfield %}``: renders the widget with ``render()`` in
+        the rows that are rendered, and collects the requested widgets.
+        """
+        if self.depth and not self.widgets:
+            return render()
+        if not self.requested([bound_field]):
+            return u''
+        output = render()
+        self.html[bound_field.name] = output
+        return output
+
+    @property
+    def fragments(self):
+        """
+        An ``OrderedDict`` of the requested field names and their HTML.
+        Hidden fields that the layout renders without ``{% formfield %}``,
+        e.g. in the last row, are rendered as hidden inputs.
+        """
+        fragments = OrderedDict()
+        for name in self.names:
+            if name not in self.html:
+                bound_field = self.form[name]
+                output = u''
+                if bound_field.is_hidden:
+                    output = bound_field.as_hidden()
+                self.html[name] = output
+            fragments[name] = mark_safe(self.html[name])
+        return fragments
+
+
+@contextmanager
+def partial_render(form, names, widgets=False):
+    """
+    Collects the rows of the fields ``names`` of ``form`` while the form is
+    rendered in the block. Raises ``KeyError`` for unknown fields.
+    """
+    for name in names:
+        if name not in form.fields:
+            raise KeyError(
+                "Key %r not found in '%s'" % (name, form.__class__.__name__))
+    previous = get_partial_render()
+    partial = PartialRender(form, names, widgets)
+    _local.partial = partial
+    try:
+        yield partial
+    finally:
+        _local.partial = previous
+
+
+def clean_fields(form, names):
+    """
+    Validates the fields ``names`` of the bound ``form`` like
+    ``full_clean()``, with their ``clean_<name>()`` methods, but without the
+    other fields and ``form.clean()``. Returns the errors of the form, which
+    then only has errors and cleaned data for these fields; don't use
+    ``is_valid()`` on it.
+    """
+    form._errors = ErrorDict()
+    form.cleaned_data = {}
+    if not form.is_bound:
+        return form._errors
+    if form.empty_permitted and not form.has_changed():
+        return form._errors
+    for name in names:
+        field = form.fields[name]
+        if getattr(field, 'disabled', False):
+            value = form.initial.get(name, field.initial)
+        else:
+            value = field.widget.value_from_datadict(
+                form.data, form.files, form.add_prefix(name))
+        try:
+            if isinstance(field, FileField):
+                initial = form.initial.get(name, field.initial)
+                value = field.clean(value, initial)
+            else:
+                value = field.clean(value)
+            form.cleaned_data[name] = value
+            if hasattr(form, 'clean_%s' % name):
+                form.cleaned_data[name] = getattr(form, 'clean_%s' % name)()
+        except ValidationError as e:
+            form.add_error(name, e)
+    return form._errors
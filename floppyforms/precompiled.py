@@ -0,0 +1,256 @@
+"""
+Ahead-of-time compilation of the templates that widgets, rows and layouts
+use.
+
+``manage.py floppyforms_compile <path>`` writes these templates into an
+importable Python module, together with a hash of their source. Jinja2
+templates are stored compiled to Python code. ``preload_templates()`` puts
+the templates from that module into the floppyforms template cache, so that
+no template has to be searched for or parsed when the first forms are
+rendered. Templates whose source changed after the module was written are
+skipped and loaded as usual.
+"""
+import hashlib
+import io
+import os
+from importlib import import_module
+
+import django
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.template import Template, TemplateDoesNotExist
+from django.utils import six
+
+from . import widgets
+from .loader import (_loaders, engines, find_template_source,
+                     get_engine_name, get_template, is_jinja2_engine,
+                     template_cache)
+
+try:
+    from django.template.backends.django import (
+        DjangoTemplates, Template as DjangoBackendTemplate)
+except ImportError:
+    DjangoTemplates = None
+
+
+__all__ = ('collect_template_names', 'compile_templates', 'write_module',
+           'preload_templates', 'warm_templates')
+
+
+#: Changes when the layout of the generated module changes.
+VERSION = 1
+
+HEADER = u'''# -*- coding: utf-8 -*-
+# Generated by "manage.py floppyforms_compile", do not edit.
+from __future__ import unicode_literals
+
+VERSION = %d
+
+TEMPLATES = {
+'''
+
+
+def source_hash(source):
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+
+def _subclasses(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        for item in _subclasses(subclass):
+            yield item
+
+
+def widget_template_names():
+    """
+    Returns the ``template_name`` of all widget classes that have been
+    imported so far, including the floppyforms widgets.
+    """
+    names = set()
+    for name in widgets.__all__:
+        template_name = getattr(getattr(widgets, name), 'template_name', None)
+        if isinstance(template_name, six.string_types):
+            names.add(template_name)
+    for widget_class in _subclasses(forms.Widget):
+        template_name = getattr(widget_class, 'template_name', None)
+        if isinstance(template_name, six.string_types):
+            names.add(template_name)
+    return names
+
+
+def _template_dirs(engine, prefix):
+    """
+    Yields the directories in which ``engine`` looks for templates whose name
+    starts with ``prefix``.
+    """
+    if DjangoTemplates is not None and isinstance(engine, DjangoTemplates):
+        for loader_ in _loaders(engine.engine.template_loaders):
+            if not hasattr(loader_, 'get_template_sources'):
+                continue
+            for source in loader_.get_template_sources(prefix):
+                # Django 1.9 yields Origin objects instead of paths.
+                yield getattr(source, 'name', source)
+    else:
+        for directory in getattr(engine, 'template_dirs', ()):
+            yield os.path.join(directory, prefix)
+
+
+def _directory_template_names(engine, prefix):
+    names = set()
+    for root in _template_dirs(engine, prefix):
+        for dirpath, dirnames, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.relpath(os.path.join(dirpath, filename), root)
+                names.add('/'.join([prefix] + path.split(os.sep)))
+    return names
+
+
+def collect_template_names(extra=()):
+    """
+    Returns the names of the templates to compile: the templates of all
+    widgets, every template below ``floppyforms/`` in the template
+    directories of all engines (i.e. the rows and layouts that come with
+    floppyforms and the ones that the project overrides) and ``extra``.
+    """
+    names = widget_template_names()
+    if engines is not None:
+        for engine in engines.all():
+            names.update(_directory_template_names(engine, 'floppyforms'))
+    names.update(extra)
+    return sorted(names)
+
+
+def compile_templates(names):
+    """
+    Returns a dictionary that maps ``(template_name, engine_name)`` to the
+    source hash, the source and, for Jinja2 templates, the generated Python
+    code, for every engine that has one of the templates.
+
+    Raises the engine's ``TemplateSyntaxError`` for invalid templates.
+    """
+    if engines is None:
+        raise ImproperlyConfigured('Compiling templates requires Django 1.8 '
+                                   'or later.')
+    entries = {}
+    for name in names:
+        for engine in engines.all():
+            try:
+                engine, path, source = find_template_source(
+                    name, using=engine.name)
+            except TemplateDoesNotExist:
+                continue
+            if source is None:
+                continue
+            code = None
+            if is_jinja2_engine(engine):
+                code = engine.env.compile(source, name, path, raw=True)
+            else:
+                engine.from_string(source)
+            entries[(name, engine.name)] = {
+                'sha1': source_hash(source),
+                'source': source,
+                'code': code,
+            }
+    return entries
+
+
+def write_module(entries, path):
+    """
+    Writes the result of ``compile_templates()`` to the Python module at
+    ``path``.
+    """
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(HEADER % VERSION)
+        for key in sorted(entries):
+            entry = entries[key]
+            f.write(u'    (%r, %r): {\n' % key)
+            for field in ('sha1', 'source', 'code'):
+                f.write(u'        %r: %r,\n' % (field, entry[field]))
+            f.write(u'    },\n')
+        f.write(u'}\n')
+
+
+def _build_template(engine, name, path, entry):
+    # The template classes of the backends take the backend since Django
+    # 1.9, those of Jinja2 since Django 1.11.
+    if entry['code'] is not None:
+        from django.template.backends.jinja2 import (
+            Template as Jinja2BackendTemplate)
+
+        environment = engine.env
+        code = compile(entry['code'], path or name, 'exec')
+        template = environment.template_class.from_code(
+            environment, code, environment.make_globals(None))
+        if django.VERSION >= (1, 11):
+            return Jinja2BackendTemplate(template, engine)
+        return Jinja2BackendTemplate(template)
+    template = Template(entry['source'], name=name, engine=engine.engine)
+    if django.VERSION >= (1, 9):
+        return DjangoBackendTemplate(template, engine)
+    return DjangoBackendTemplate(template)
+
+
+def preload_templates(module=None):
+    """
+    Puts the templates from a module written by ``floppyforms_compile`` into
+    the template cache and returns how many templates were loaded.
+
+    ``module`` is a module or the dotted path of one and defaults to the
+    ``FLOPPYFORMS_PRECOMPILED_TEMPLATES`` setting.
+    """
+    if module is None:
+        module = getattr(settings, 'FLOPPYFORMS_PRECOMPILED_TEMPLATES', None)
+        if module is None:
+            return 0
+    if isinstance(module, six.string_types):
+        module = import_module(module)
+    if getattr(module, 'VERSION', None) != VERSION:
+        raise ImproperlyConfigured(
+            '%s was written by a different version of floppyforms, run '
+            '"manage.py floppyforms_compile" again.' % module.__name__)
+
+    usings = [None]
+    if get_engine_name() is not None:
+        usings.append(get_engine_name())
+    templates = {}
+    for name in sorted(set(name for name, engine in module.TEMPLATES)):
+        for using in usings:
+            try:
+                engine, path, source = find_template_source(name, using=using)
+            except TemplateDoesNotExist:
+                continue
+            key = (name, engine.name)
+            entry = module.TEMPLATES.get(key)
+            if (entry is None or source is None or
+                    source_hash(source) != entry['sha1']):
+                continue
+            if key not in templates:
+                templates[key] = _build_template(engine, name, path, entry)
+            template_cache.set_template(name, templates[key], using=using,
+                                        path=path)
+    return len(templates)
+
+
+def warm_templates():
+    """
+    Loads all the templates that ``collect_template_names()`` finds into the
+    template cache, from the ``FLOPPYFORMS_PRECOMPILED_TEMPLATES`` module if
+    there is one. Returns the number of templates in the cache.
+
+    Runs in a background thread when the app registry is ready if the
+    ``FLOPPYFORMS_PRELOAD_TEMPLATES`` setting is ``True``.
+    """
+    preload_templates()
+    usings = [None]
+    if get_engine_name() is not None:
+        usings.append(get_engine_name())
+    for name in collect_template_names():
+        for using in usings:
+            if (name, using) in template_cache.templates:
+                continue
+            try:
+                get_template(name, using=using)
+            except TemplateDoesNotExist:
+                pass
+    return template_cache.info().currsize
@@ -0,0 +1,196 @@
+"""
+Instrumentation for the rendering of forms, rows, fields and widgets.
+
+Rendering is only timed while a ``profile_render()`` block is active or
+while a receiver is connected to ``render_finished``. Otherwise recording
+costs a single check per rendered element.
+
+Example::
+
+    import floppyforms as forms
+
+    with forms.profile_render() as profile:
+        html = form.as_table()
+    print(profile.format_stats())
+    print(profile.format_tree())
+"""
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from timeit import default_timer
+
+from django.dispatch import Signal
+
+
+__all__ = ('render_started', 'render_finished', 'RenderRecord',
+           'RenderProfile', 'profile_render', 'record')
+
+
+#: Sent before an element is rendered, with the ``RenderRecord`` as
+#: ``record`` argument.
+render_started = Signal(providing_args=['record'])
+
+#: Sent after an element is rendered, with the ``RenderRecord`` as ``record``
+#: argument. Its ``duration`` is set at this point.
+render_finished = Signal(providing_args=['record'])
+
+
+RenderStat = namedtuple('RenderStat',
+                        ('kind', 'template_name', 'calls', 'total', 'own'))
+
+
+_local = threading.local()
+
+
+class RenderRecord(object):
+    """
+    The rendering of one element of the render tree. ``kind`` is the name of
+    the template tag (``form``, ``formrow``, ``formfield``, ``formconfig``,
+    ``widget``), ``name`` the field name if there is one.
+
+    Records are context managers: the time spent inside the ``with`` block is
+    stored as ``duration`` (in seconds) and the records entered meanwhile are
+    collected as ``children``.
+    """
+    def __init__(self, kind, name=None, template_name=None):
+        self.kind = kind
+        self.name = name
+        self.template_name = template_name
+        self.children = []
+        self.parent = None
+        self.start = None
+        self.duration = None
+
+    def __enter__(self):
+        self.parent = getattr(_local, 'current', None)
+        if self.parent is not None:
+            self.parent.children.append(self)
+        _local.current = self
+        render_started.send(sender=RenderRecord, record=self)
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = default_timer() - self.start
+        _local.current = self.parent
+        render_finished.send(sender=RenderRecord, record=self)
+
+    @property
+    def own_duration(self):
+        """
+        The time spent in this element itself, without its children.
+        """
+        return self.duration - sum(child.duration or 0
+                                   for child in self.children)
+
+    def walk(self, depth=0):
+        """
+        Yields ``(depth, record)`` for this record and all its descendants.
+        """
+        yield depth, self
+        for child in self.children:
+            for item in child.walk(depth + 1):
+                yield item
+
+    def __repr__(self):
+        return '<%s: %s %s %r>' % (self.__class__.__name__, self.kind,
+                                   self.name or '', self.template_name)
+
+
+class RenderProfile(RenderRecord):
+    """
+    The root of the render tree that ``profile_render()`` collects.
+    """
+    def __init__(self):
+        super(RenderProfile, self).__init__('profile')
+
+    def stats(self):
+        """
+        Returns a list of ``RenderStat`` tuples with the number of calls, the
+        total and the own time of every kind of element and template, the
+        slowest first.
+        """
+        stats = {}
+        for depth, record in self.walk():
+            if record is self or record.duration is None:
+                continue
+            key = (record.kind, record.template_name)
+            calls, total, own = stats.get(key, (0, 0.0, 0.0))
+            stats[key] = (calls + 1, total + record.duration,
+                          own + record.own_duration)
+        return sorted(
+            (RenderStat(kind, template_name, calls, total, own)
+             for (kind, template_name), (calls, total, own) in stats.items()),
+            key=lambda stat: stat.total, reverse=True)
+
+    def format_stats(self):
+        """
+        Returns the ``stats()`` as a plain text table.
+        """
+        lines = ['%8s %10s %10s  %s' % ('calls', 'total ms', 'own ms',
+                                        'element')]
+        for stat in self.stats():
+            lines.append('%8d %10.3f %10.3f  %s %s' % (
+                stat.calls, stat.total * 1000, stat.own * 1000, stat.kind,
+                stat.template_name or ''))
+        return '\n'.join(lines)
+
+    def format_tree(self):
+        """
+        Returns the render tree as indented plain text, one element per line.
+        """
+        lines = []
+        for depth, record in self.walk():
+            if record is self or record.duration is None:
+                continue
+            bits = [record.kind]
+            if record.name:
+                bits.append(record.name)
+            if record.template_name:
+                bits.append(record.template_name)
+            lines.append('%s%s (%.3f ms)' % ('  ' * (depth - 1),
+                                             ' '.join(bits),
+                                             record.duration * 1000))
+        return '\n'.join(lines)
+
+
+class NullRecord(object):
+    """
+    Stands in for a ``RenderRecord`` while rendering is not profiled.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_null_record = NullRecord()
+
+
+def record(kind, name=None, template_name=None):
+    """
+    Returns a context manager that records the rendering of an element if
+    profiling is active. ``template_name`` can also be set on the returned
+    object once it is known.
+    """
+    if (getattr(_local, 'current', None) is None and
+            not render_finished.has_listeners() and
+            not render_started.has_listeners()):
+        return _null_record
+    return RenderRecord(kind, name=name, template_name=template_name)
+
+
+@contextmanager
+def profile_render():
+    """
+    Records the rendering of all forms, rows, fields and widgets in the
+    current thread while the block is executed and returns the
+    ``RenderProfile``.
+    """
+    profile = RenderProfile()
+    with profile:
+        yield profile
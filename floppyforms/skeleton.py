@@ -0,0 +1,357 @@
+"""
+Skeleton rendering of forms.
+
+Most of the HTML of a form only depends on its class and its layout: rows,
+labels, help texts, ids and attributes. What depends on the form instance
+are the values of the widgets and the error messages. ``render_skeleton()``
+renders a form once with placeholders, "holes", for those parts and caches
+the result, the skeleton. Rendering another form of the same class only
+fills the holes with the values and errors of that form.
+
+The holes are:
+
+* The values of inputs whose ``value_hole`` is ``True``, e.g. text inputs,
+  textareas and hidden inputs: the value is the only part of their HTML that
+  depends on the instance.
+* Any other widget rendered with ``{% formfield %}``, e.g. selects and
+  checkboxes: the widget is rendered for every form, but the layout and rows
+  are not.
+* Error messages. The number of errors of each field is part of the key of
+  the skeleton, since layouts render error lists differently for fields with
+  and without errors.
+* With ``render_forms()``, the prefix of the form in names and ids. The
+  forms of a formset then share their skeleton, whatever their index.
+
+Widgets that are rendered outside ``{% formfield %}`` and can't use a value
+hole make the form unsuitable for skeletons; such forms are always rendered
+normally. Layouts must not use other data of the form instance, e.g.
+``{{ field.value }}``, since that would end up in the skeleton.
+"""
+import copy
+import re
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from django.core.signals import setting_changed
+from django.utils import six
+from django.utils.encoding import force_text
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from .formcache import _field_bits, _form_class_bits
+
+
+__all__ = ('Skeleton', 'render_skeleton', 'render_forms',
+           'get_skeleton_recorder')
+
+
+_local = threading.local()
+
+# Private use characters, which escaping leaves alone
+HOLE = u'\ue000%d\ue001'
+HOLE_RE = re.compile(u' value="\ue000(\\d+)\ue001"|\ue000(\\d+)\ue001')
+
+
+def get_skeleton_recorder():
+    """
+    Returns the ``SkeletonRecorder`` of the skeleton that is being rendered
+    in the current thread, or ``None``.
+    """
+    return getattr(_local, 'recorder', None)
+
+
+class SkeletonRecorder(object):
+    """
+    Collects the holes while a skeleton is rendered.
+    """
+    def __init__(self, form, prefix_hole=False):
+        self.form = form
+        self.holes = []
+        self.unsafe = False
+        self.names = {}
+        if prefix_hole and form.prefix:
+            # build_skeleton() restores the prefix
+            form.prefix = self.hole('prefix')
+        for name, field in form.fields.items():
+            bound_field = form[name]
+            self.names[bound_field.html_name] = name
+            self.names[bound_field.html_initial_name] = name
+            if field.widget.is_hidden or field.show_hidden_initial:
+                # Rows render these with as_hidden(), Django's widgets
+                # would not tell about their values.
+                if not hasattr(field.hidden_widget, 'value_hole'):
+                    self.unsafe = True
+
+    def hole(self, *spec):
+        self.holes.append(spec)
+        return HOLE % (len(self.holes) - 1)
+
+    def value_hole(self, widget, name):
+        """
+        Returns the placeholder for the value of ``widget``, rendered as
+        ``name``, or ``None`` if the widget's HTML cannot have a value hole.
+        """
+        field_name = self.names.get(name)
+        if not getattr(widget, 'value_hole', False) or field_name is None:
+            self.unsafe = True
+            return None
+        return self.hole('value', field_name, widget)
+
+    def widget_hole(self, bound_field, widget, template_name):
+        """
+        Returns the placeholder for the whole output of ``{% formfield %}``,
+        or ``None`` if the widget can be rendered with a value hole.
+        """
+        if getattr(widget, 'value_hole', False):
+            return None
+        if bound_field.form is not self.form:
+            self.unsafe = True
+            return None
+        return self.hole('widget', bound_field.name, template_name)
+
+    def error_holes(self, errors):
+        """
+        Returns a copy of the form's ``ErrorDict`` with placeholders instead
+        of the error messages.
+        """
+        holes = copy.copy(errors)
+        for key, error_list in errors.items():
+            placeholders = copy.copy(error_list)
+            placeholders.data = [self.hole('error', key, index)
+                                 for index in range(len(error_list))]
+            holes[key] = placeholders
+        return holes
+
+
+def disable_skeleton():
+    """
+    Called by widgets that render instance data without holes: the form that
+    is being rendered cannot use a skeleton.
+    """
+    recorder = get_skeleton_recorder()
+    if recorder is not None:
+        recorder.unsafe = True
+
+
+def widget_hole(bound_field, widget, template_name):
+    """
+    Used by ``{% formfield %}``: returns the placeholder to render instead of
+    the widget while a skeleton is rendered, or ``None``.
+    """
+    recorder = get_skeleton_recorder()
+    if recorder is None:
+        return None
+    return recorder.widget_hole(bound_field, widget, template_name)
+
+
+class Skeleton(object):
+    """
+    The HTML of a form with holes, see ``SkeletonRecorder``.
+    """
+    def __init__(self, parts, holes, escape=conditional_escape):
+        #: Strings and ``(index, attribute)`` tuples for the holes.
+        #: ``attribute`` is ``True`` for a value hole that is rendered as
+        #: the whole ``value`` attribute.
+        self.parts = parts
+        self.holes = holes
+        #: The escaping of the template engine
+        self.escape = escape
+
+    @classmethod
+    def parse(cls, html, holes, escape=conditional_escape):
+        """
+        Splits the ``html`` rendered with placeholders. Returns ``None`` if
+        a placeholder was changed by the templates, e.g. with a filter.
+        """
+        parts = []
+        position = 0
+        for match in HOLE_RE.finditer(html):
+            parts.append(html[position:match.start()])
+            if match.group(1) is not None:
+                index = int(match.group(1))
+                parts.append((index, holes[index][0] == 'value'))
+            else:
+                parts.append((int(match.group(2)), False))
+            position = match.end()
+        parts.append(html[position:])
+        for part in parts:
+            if (isinstance(part, six.string_types) and
+                    (u'\ue000' in part or u'\ue001' in part)):
+                return None
+        return cls(parts, holes, escape)
+
+    def fill_value(self, form, name, widget):
+        value = form[name].value()
+        if value is None or value == '':
+            return u''
+        return self.escape(widget._format_value(value))
+
+    def fill_widget(self, form, name, template_name):
+        from .templatetags.floppyforms import attributes
+
+        bound_field = form[name]
+        widget = bound_field.field.widget
+        with attributes(widget, template_name=template_name) as widget:
+            output = bound_field.as_widget(widget=widget)
+        if bound_field.field.show_hidden_initial:
+            output = output + bound_field.as_hidden(only_initial=True)
+        return output
+
+    def fill_prefix(self, form):
+        return self.escape(form.prefix)
+
+    def fill_error(self, form, key, index):
+        return self.escape(list(form.errors[key])[index])
+
+    def fill(self, form):
+        """
+        Returns the HTML of ``form``, with the values and errors of the form
+        in the holes.
+        """
+        filled = {}
+        bits = []
+        for part in self.parts:
+            if isinstance(part, six.string_types):
+                bits.append(part)
+                continue
+            index, attribute = part
+            if index not in filled:
+                spec = self.holes[index]
+                fill = getattr(self, 'fill_%s' % spec[0])
+                filled[index] = force_text(fill(form, *spec[1:]))
+            if attribute:
+                if filled[index]:
+                    bits.extend((u' value="', filled[index], u'"'))
+            else:
+                bits.append(filled[index])
+        return mark_safe(u''.join(bits))
+
+
+class SkeletonCache(object):
+    """
+    Maps the form class, layout, language and the number of errors of each
+    field to the skeleton, or ``False`` for forms that cannot be rendered
+    from a skeleton.
+    """
+    maxsize = 100
+
+    def __init__(self):
+        self.skeletons = OrderedDict()
+        self.lock = threading.Lock()
+
+    def key(self, form, layout, prefix_hole=False):
+        """
+        Returns the key of the skeleton of ``form`` and ``layout``, or
+        ``None`` if the form has no skeleton.
+        """
+        errors = form.errors
+        prefix = form.prefix
+        if prefix_hole and prefix:
+            prefix = True
+        # Values are holes, the initial values of the fields don't matter,
+        # e.g. those of the ORDER fields of a formset.
+        field_bits = tuple(_field_bits(name, field, initial=False)
+                           for name, field in form.fields.items())
+        if None in field_bits:
+            return None
+        return (
+            get_language(), layout, _form_class_bits(form),
+            prefix, form.auto_id, form.is_bound, field_bits,
+            tuple(sorted((key, len(error_list))
+                         for key, error_list in errors.items())),
+        )
+
+    def get(self, key):
+        return self.skeletons.get(key)
+
+    def set(self, key, skeleton):
+        with self.lock:
+            self.skeletons[key] = skeleton
+            while len(self.skeletons) > self.maxsize:
+                self.skeletons.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.skeletons.clear()
+
+
+skeleton_cache = SkeletonCache()
+
+
+def reset_skeleton_cache(**kwargs):
+    skeleton_cache.clear()
+
+
+setting_changed.connect(reset_skeleton_cache)
+
+
+def _clear_bound_fields(form):
+    # Django 1.9+ keeps the bound fields, with their names
+    bound_fields = getattr(form, '_bound_fields_cache', None)
+    if bound_fields:
+        bound_fields.clear()
+
+
+def build_skeleton(form, render, escape=conditional_escape,
+                   prefix_hole=False):
+    """
+    Renders ``form`` with ``render()`` while the holes are recorded. Returns
+    the ``Skeleton``, or ``None`` if the form cannot be rendered from one.
+    ``escape`` is the escaping function of the template engine. With
+    ``prefix_hole``, the prefix of the form is a hole as well.
+    """
+    errors = form.errors
+    prefix = form.prefix
+    _clear_bound_fields(form)
+    recorder = SkeletonRecorder(form, prefix_hole)
+    form._errors = recorder.error_holes(errors)
+    _local.recorder = recorder
+    try:
+        html = force_text(render())
+    finally:
+        _local.recorder = None
+        form._errors = errors
+        if form.prefix != prefix:
+            form.prefix = prefix
+            _clear_bound_fields(form)
+    if recorder.unsafe:
+        return None
+    return Skeleton.parse(html, recorder.holes, escape)
+
+
+def render_skeleton(form, layout, render, escape=conditional_escape,
+                    prefix_hole=False):
+    """
+    Returns the HTML of ``form`` from the skeleton of its class and
+    ``layout``. ``render()`` renders the form normally, to build the
+    skeleton the first time and for forms without skeleton. ``escape`` is
+    the escaping function of the template engine. With ``prefix_hole``, the
+    skeleton is shared by the forms of any prefix.
+    """
+    if get_skeleton_recorder() is not None:
+        # e.g. a form tag in the layout of a skeleton
+        return render()
+    key = skeleton_cache.key(form, layout, prefix_hole)
+    if key is None:
+        return render()
+    skeleton = skeleton_cache.get(key)
+    if skeleton is None:
+        skeleton = build_skeleton(form, render, escape, prefix_hole) or False
+        skeleton_cache.set(key, skeleton)
+    if skeleton is False:
+        return render()
+    return skeleton.fill(form)
+
+
+def render_forms(forms, layout, render, escape=conditional_escape):
+    """
+    Returns the HTML of each of ``forms``, e.g. the forms of a formset,
+    rendered with ``render(form)``. The layout and rows are rendered once,
+    for the first form of each class and number of errors. The other forms
+    only fill in their prefix, values, errors and widgets.
+    """
+    return [render_skeleton(form, layout, partial(render, form), escape,
+                            prefix_hole=True)
+            for form in forms]
@@ -0,0 +1,125 @@
+(function() {
+/**
+ * Autocomplete widgets: a select with the selected options, and a search
+ * input whose datalist is filled with the results of the lookup view.
+ * Choosing a result adds it to the select.
+ */
+function Autocomplete(input) {
+	this.input = input;
+	this.select = document.getElementById(input.getAttribute('data-autocomplete'));
+	this.list = document.getElementById(input.getAttribute('list'));
+	this.url = input.getAttribute('data-autocomplete-url');
+	this.labels = {};
+	this.results = {};
+	this.timeout = null;
+	this.request = null;
+	var self = this;
+	input.addEventListener('input', function() {
+		self.onInput();
+	});
+}
+
+Autocomplete.prototype.delay = 200;
+
+Autocomplete.prototype.onInput = function() {
+	var term = this.input.value;
+	if (this.labels.hasOwnProperty(term)) {
+		this.choose(this.labels[term], term);
+		return;
+	}
+	clearTimeout(this.timeout);
+	var self = this;
+	this.timeout = setTimeout(function() {
+		self.search(term);
+	}, this.delay);
+};
+
+Autocomplete.prototype.search = function(term) {
+	if (!term) {
+		this.show([]);
+		return;
+	}
+	if (this.results.hasOwnProperty(term)) {
+		this.show(this.results[term]);
+		return;
+	}
+	if (this.request) {
+		this.request.abort();
+	}
+	var self = this;
+	var request = this.request = new XMLHttpRequest();
+	var separator = this.url.indexOf('?') === -1 ? '?' : '&';
+	request.open('GET', this.url + separator + 'term=' + encodeURIComponent(term));
+	request.onload = function() {
+		self.request = null;
+		if (request.status !== 200) {
+			return;
+		}
+		var results = JSON.parse(request.responseText).results;
+		self.results[term] = results;
+		if (self.input.value === term) {
+			self.show(results);
+		}
+	};
+	request.send();
+};
+
+Autocomplete.prototype.show = function(results) {
+	this.labels = {};
+	while (this.list.firstChild) {
+		this.list.removeChild(this.list.firstChild);
+	}
+	for (var i=0; i<results.length; i++) {
+		var option = document.createElement('option');
+		option.value = results[i].label;
+		this.list.appendChild(option);
+		this.labels[results[i].label] = results[i].value;
+	}
+};
+
+Autocomplete.prototype.choose = function(value, label) {
+	var options = this.select.options;
+	var found = null;
+	for (var i=options.length - 1; i>=0; i--) {
+		if (options[i].value === value) {
+			found = options[i];
+		} else if (!this.select.multiple && options[i].value !== '') {
+			this.select.removeChild(options[i]);
+		}
+	}
+	if (!found) {
+		found = document.createElement('option');
+		found.value = value;
+		found.text = label;
+		this.select.appendChild(found);
+	}
+	found.selected = true;
+	this.input.value = '';
+	this.show([]);
+	var event = document.createEvent('Event');
+	event.initEvent('change', true, false);
+	this.select.dispatchEvent(event);
+};
+
+window.floppyforms = window.floppyforms || {};
+window.floppyforms.Autocomplete = Autocomplete;
+
+/**
+ * Sets up the autocomplete widgets that were added to the page since the
+ * last call, e.g. with a new formset form.
+ */
+window.floppyforms.initAutocomplete = function() {
+	var inputs = document.querySelectorAll('input[data-autocomplete-url]');
+	for (var i=0; i<inputs.length; i++) {
+		if (!inputs[i].floppyformsAutocomplete) {
+			inputs[i].floppyformsAutocomplete = new Autocomplete(inputs[i]);
+		}
+	}
+};
+
+if (document.readyState === 'loading') {
+	document.addEventListener('DOMContentLoaded', window.floppyforms.initAutocomplete);
+} else {
+	window.floppyforms.initAutocomplete();
+}
+})();
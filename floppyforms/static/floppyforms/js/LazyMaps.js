@@ -0,0 +1,131 @@
+(function() {
+var floppyforms = window.floppyforms = window.floppyforms || {};
+if (floppyforms.registerMapWidget) {
+	return;
+}
+
+/**
+ * Lazy maps: geometry widgets with lazy_map render a container with
+ * data-map-widget and data-map-options attributes instead of an inline
+ * script. The map is only created once the container scrolls into view or
+ * is clicked, by the factory registered for data-map-widget.
+ */
+var factories = {};
+var observer = null;
+
+function initialize(element) {
+	if (element.getAttribute('data-map-initialized')) {
+		return;
+	}
+	var factory = factories[element.getAttribute('data-map-widget')];
+	if (!factory) {
+		return;
+	}
+	element.setAttribute('data-map-initialized', 'true');
+	if (observer) {
+		observer.unobserve(element);
+	}
+	var previews = element.querySelectorAll('.floppyforms-map-preview');
+	for (var i=0; i<previews.length; i++) {
+		previews[i].parentNode.removeChild(previews[i]);
+	}
+	var options = JSON.parse(element.getAttribute('data-map-options'));
+	// Keep the global the inline scripts define, templates refer to it.
+	window[options.module] = factory(options);
+	// Controls that use the map, like the link that clears it, are hidden
+	// until it exists.
+	var controls = document.querySelectorAll('[data-map-control="' + element.id + '"]');
+	for (var j=0; j<controls.length; j++) {
+		controls[j].style.display = '';
+	}
+}
+
+function onClick() {
+	initialize(this);
+}
+
+/**
+ * Submits form unless a submit handler cancels it, e.g. because another
+ * widget is still loading its full geometry.
+ */
+floppyforms.submitForm = function(form) {
+	var event = document.createEvent('Event');
+	event.initEvent('submit', true, true);
+	if (form.dispatchEvent(event)) {
+		form.submit();
+	}
+};
+
+/**
+ * A lazy map with a simplified geometry loads the full geometry before
+ * the form is submitted, even if it was never shown.
+ */
+function watchSubmit(element) {
+	var options = JSON.parse(element.getAttribute('data-map-options'));
+	var textarea = document.getElementById(options.id);
+	if (!options.geometry_url || !textarea || !textarea.form) {
+		return;
+	}
+	var form = textarea.form;
+	form.addEventListener('submit', function(event) {
+		if (element.getAttribute('data-map-initialized') || !factories[element.getAttribute('data-map-widget')]) {
+			return;
+		}
+		event.preventDefault();
+		initialize(element);
+		window[options.module].loadGeometry(function() {
+			floppyforms.submitForm(form);
+		});
+	});
+}
+
+if (window.IntersectionObserver) {
+	observer = new IntersectionObserver(function(entries) {
+		for (var i=0; i<entries.length; i++) {
+			if (entries[i].isIntersecting) {
+				initialize(entries[i].target);
+			}
+		}
+	}, {rootMargin: '200px'});
+}
+
+/**
+ * Watches the lazy maps that were added to the page since the last call,
+ * e.g. with a new formset form.
+ */
+floppyforms.initMapWidgets = function() {
+	var elements = document.querySelectorAll('[data-map-widget]');
+	for (var i=0; i<elements.length; i++) {
+		var element = elements[i];
+		if (element.getAttribute('data-map-observed')) {
+			continue;
+		}
+		element.setAttribute('data-map-observed', 'true');
+		element.addEventListener('click', onClick);
+		watchSubmit(element);
+		if (observer) {
+			observer.observe(element);
+		}
+	}
+};
+
+/**
+ * Registers factory to create the lazy maps whose data-map-widget is name.
+ */
+floppyforms.registerMapWidget = function(name, factory) {
+	factories[name] = factory;
+	if (document.readyState !== 'loading') {
+		floppyforms.initMapWidgets();
+		// Maps that were already visible before their factory existed.
+		if (observer) {
+			var elements = document.querySelectorAll('[data-map-widget="' + name + '"]');
+			for (var i=0; i<elements.length; i++) {
+				observer.unobserve(elements[i]);
+				observer.observe(elements[i]);
+			}
+		}
+	}
+};
+
+document.addEventListener('DOMContentLoaded', floppyforms.initMapWidgets);
+})();
@@ -10,6 +10,10 @@
       this.options = options;
       this.mapClick = __bind(this.mapClick, this);
 
+      this.formSubmit = __bind(this.formSubmit, this);
+
+      this.loadGeometry = __bind(this.loadGeometry, this);
+
       this.doMultiPoly = __bind(this.doMultiPoly, this);
 
       this.doPoly = __bind(this.doPoly, this);
@@ -96,8 +100,69 @@
       });
       this.map.addControl(new ButtonsControl());
       this.showHideControls();
+      this.reduced = null;
+      this.loading = null;
+      if (this.options.geometry_url) {
+        this.reduced = this.$("#" + this.options.id + "_reduced");
+        if (!this.reduced.length) {
+          this.reduced = null;
+        }
+      }
+      if (this.reduced) {
+        this.textarea.closest('form').bind('submit', this.formSubmit);
+      }
     }
 
+    LeafletWidget.prototype.loadGeometry = function(callback) {
+      var _this = this;
+      if (!this.reduced) {
+        if (callback) {
+          callback();
+        }
+        return;
+      }
+      if (this.loading) {
+        if (callback) {
+          this.loading.push(callback);
+        }
+        return;
+      }
+      this.loading = callback ? [callback] : [];
+      return this.$.ajax(this.options.geometry_url, {
+        dataType: 'text',
+        success: function(data) {
+          var callbacks, _j, _len1;
+          callbacks = _this.loading;
+          _this.loading = null;
+          _this.reduced.remove();
+          _this.reduced = null;
+          _this.textarea.val(data);
+          _this.geojson = _this.getJSON();
+          _this.refreshLayer();
+          for (_j = 0, _len1 = callbacks.length; _j < _len1; _j++) {
+            callbacks[_j]();
+          }
+        },
+        error: function() {
+          _this.loading = null;
+        }
+      });
+    };
+
+    LeafletWidget.prototype.formSubmit = function(e) {
+      var form;
+      if (this.reduced) {
+        form = e.target;
+        this.loadGeometry(function() {
+          if (window.floppyforms.submitForm) {
+            return window.floppyforms.submitForm(form);
+          }
+          return form.submit();
+        });
+        return false;
+      }
+    };
+
     LeafletWidget.prototype.doOnAdd = function(map) {
       var container, controls;
       container = L.DomUtil.create('div', 'buttons-control');
@@ -189,6 +254,10 @@
     };
 
     LeafletWidget.prototype.clearFeatures = function() {
+      if (this.reduced) {
+        this.loadGeometry(this.clearFeatures);
+        return false;
+      }
       this.undo_geojson.push(this.getJSON());
       this.textarea.val('');
       this.geojson = {
@@ -245,6 +314,13 @@
         item = this.$("<li>[" + geoname.countryCode + "] " + geoname.name + "</li>");
         item.data('lat', geoname.lat).data('lng', geoname.lng).addClass('result').attr('title', JSON.stringify(geoname));
         item.click(function() {
+          var clicked = this;
+          if (self.reduced) {
+            self.loadGeometry(function() {
+              return self.$(clicked).click();
+            });
+            return false;
+          }
           item = self.$(this);
           self.undo_geojson.push(self.getJSON());
           if (self.geojson === undefined) {
@@ -350,6 +426,12 @@
     LeafletWidget.prototype.doMultiPoly = function(e, add) {};
 
     LeafletWidget.prototype.mapClick = function(e) {
+      var _this = this;
+      if (this.reduced) {
+        return this.loadGeometry(function() {
+          return _this.mapClick(e);
+        });
+      }
       this.undo_geojson.push(this.getJSON());
       this.showHideControls();
       switch (this.options.geom_type) {
@@ -382,4 +464,10 @@
 
   window.floppyforms.LeafletWidget = LeafletWidget;
 
+  if (window.floppyforms.registerMapWidget) {
+    window.floppyforms.registerMapWidget('floppyforms.LeafletWidget', function(options) {
+      return new LeafletWidget(options);
+    });
+  }
+
 }).call(this);
@@ -160,6 +160,14 @@ OpenLayers.Format.DjangoWKT = OpenLayers.Class(OpenLayers.Format.WKT, {
 	CLASS_NAME: "OpenLayers.Format.DjangoWKT"
 });
 
+function submitForm(form) {
+	if (window.floppyforms && window.floppyforms.submitForm) {
+		window.floppyforms.submitForm(form);
+	} else {
+		form.submit();
+	}
+}
+
 function MapWidget(options) {
 	this.map = null;
 	this.controls = null;
@@ -212,15 +220,7 @@ function MapWidget(options) {
 	this.map.addLayer(this.layers.vector);
 	wkt = document.getElementById(this.options.id).value;
 	if (wkt) {
-		var feat = OpenLayers.Util.properFeatures(this.read_wkt(wkt), this.options.geom_type);
-		this.write_wkt(feat);
-		if (this.options.is_collection) {
-			for (var i=0; i<this.num_geom; i++) {
-				this.layers.vector.addFeatures([new OpenLayers.Feature.Vector(feat.geometry.components[i].clone())]);
-			}
-		} else {
-			this.layers.vector.addFeatures([feat]);
-		}
+		var feat = this.addFeatures(wkt);
 		this.map.zoomToExtent(feat.geometry.getBounds());
 		if (this.options.is_point) {
 			this.map.zoomTo(this.options.point_zoom);
@@ -231,6 +231,27 @@ function MapWidget(options) {
 	this.layers.vector.events.on({'featuremodified': this.modify_wkt, scope: this});
 	this.layers.vector.events.on({'featureadded': this.add_wkt, scope: this});
 
+	// The value is simplified or rounded, the full geometry is loaded from
+	// geometry_url before it is edited or submitted.
+	this.reduced = null;
+	this.loading = null;
+	if (this.options.geometry_url) {
+		this.reduced = document.getElementById(this.options.id + '_reduced');
+	}
+	if (this.reduced) {
+		this.layers.vector.events.on({'beforefeaturemodified': this.loadGeometry, scope: this});
+		var form = document.getElementById(this.options.id).form;
+		var self = this;
+		if (form) {
+			OpenLayers.Event.observe(form, 'submit', function(event) {
+				if (self.reduced) {
+					OpenLayers.Event.stop(event);
+					self.loadGeometry(function() { submitForm(form); });
+				}
+			});
+		}
+	}
+
 	this.getControls(this.layers.vector);
 	this.panel.addControls(this.controls);
 	this.map.addControl(this.panel);
@@ -257,6 +278,77 @@ function MapWidget(options) {
 	}
 }
 
+MapWidget.prototype.addFeatures = function(wkt) {
+	var feat = OpenLayers.Util.properFeatures(this.read_wkt(wkt), this.options.geom_type);
+	this.write_wkt(feat);
+	if (this.options.is_collection) {
+		for (var i=0; i<this.num_geom; i++) {
+			this.layers.vector.addFeatures([new OpenLayers.Feature.Vector(feat.geometry.components[i].clone())]);
+		}
+	} else {
+		this.layers.vector.addFeatures([feat]);
+	}
+	return feat;
+};
+
+/**
+ * Replaces the simplified geometry by the full one from geometry_url and
+ * calls callback once it is loaded.
+ */
+MapWidget.prototype.loadGeometry = function(callback) {
+	if (typeof callback !== 'function') {
+		callback = null;
+	}
+	if (!this.reduced) {
+		if (callback) {
+			callback();
+		}
+		return;
+	}
+	if (this.loading) {
+		if (callback) {
+			this.loading.push(callback);
+		}
+		return;
+	}
+	this.loading = callback ? [callback] : [];
+	var self = this;
+	var request = new XMLHttpRequest();
+	request.open('GET', this.options.geometry_url);
+	request.onload = function() {
+		var callbacks = self.loading;
+		self.loading = null;
+		if (request.status !== 200) {
+			return;
+		}
+		var modify = self.map.getControlsByClass('OpenLayers.Control.ModifyFeature')[0];
+		if (modify && modify.feature) {
+			modify.unselectFeature(modify.feature);
+		}
+		self.dropReduced();
+		self.deleteFeatures();
+		if (request.responseText) {
+			self.addFeatures(request.responseText);
+		} else {
+			document.getElementById(self.options.id).value = '';
+		}
+		for (var i=0; i<callbacks.length; i++) {
+			callbacks[i]();
+		}
+	};
+	request.onerror = function() {
+		self.loading = null;
+	};
+	request.send();
+};
+
+MapWidget.prototype.dropReduced = function() {
+	if (this.reduced) {
+		this.reduced.parentNode.removeChild(this.reduced);
+		this.reduced = null;
+	}
+};
+
 MapWidget.prototype.get_ewkt = function(feat) {
 	return "SRID=" + this.options.map_srid + ";" + this.wkt_f.write(feat);
 };
@@ -280,6 +372,20 @@ MapWidget.prototype.write_wkt = function(feat) {
 };
 
 MapWidget.prototype.add_wkt = function(event) {
+	if (this.reduced && !this.loading) {
+		if (!this.options.is_collection) {
+			// The new feature replaces the simplified one.
+			this.dropReduced();
+		} else {
+			// Add the new feature to the full collection.
+			var self = this;
+			var feature = event.feature.clone();
+			this.loadGeometry(function() {
+				self.layers.vector.addFeatures([feature]);
+			});
+			return;
+		}
+	}
 	if (this.options.is_collection) {
 		var feat = new OpenLayers.Feature.Vector(new this.options.geom_type());
 		for (var i=0; i<this.layers.vector.features.length; i++) {
@@ -319,6 +425,7 @@ MapWidget.prototype.deleteFeatures = function() {
 };
 
 MapWidget.prototype.clearFeatures = function() {
+	this.dropReduced();
 	this.deleteFeatures();
 	document.getElementById(this.options.id).value = '';
 	this.map.setCenter(this.defaultCenter(), this.options.default_zoom);
@@ -373,5 +480,38 @@ MapWidget.prototype.getControls = function(layer) {
 		}
 	}
 };
+/**
+ * Base layers of lazy maps, by the name in their base_layer option.
+ */
+MapWidget.baseLayers = {
+	google: function() {
+		return new OpenLayers.Layer.Google("Google Streets", {numZoomLevels: 20, units: 'm'});
+	},
+	osm: function() {
+		return new OpenLayers.Layer.OSM.Mapnik("OpenStreetMap (Mapnik)");
+	}
+};
+
+/**
+ * Creates a MapWidget from the JSON options of the widget, see
+ * get_map_options() in floppyforms/gis/widgets.py.
+ */
+MapWidget.fromOptions = function(options) {
+	if (typeof options.geom_type === 'string') {
+		options.geom_type = OpenLayers.Geometry[options.geom_type];
+	}
+	if (typeof options.base_layer === 'string') {
+		options.base_layer = MapWidget.baseLayers[options.base_layer]();
+	}
+	var extent = options.map_options.maxExtent;
+	if (extent && extent.constructor == Array) {
+		options.map_options.maxExtent = new OpenLayers.Bounds(extent[0], extent[1], extent[2], extent[3]);
+	}
+	return new MapWidget(options);
+};
+
 window.MapWidget = MapWidget;
+if (window.floppyforms && window.floppyforms.registerMapWidget) {
+	window.floppyforms.registerMapWidget('MapWidget', MapWidget.fromOptions);
+}
 })();
@@ -1,5 +1,8 @@
+import hashlib
 from collections import defaultdict
 from contextlib import contextmanager
+from itertools import count
+from operator import itemgetter
 
 from django.conf import settings
 from django.forms.forms import BoundField
@@ -7,12 +10,93 @@ from django.forms.utils import ErrorList
 from django.template import (Library, Node, Variable,
                              TemplateSyntaxError, VariableDoesNotExist)
 from django.template.base import token_kwargs
-from django.template.loader import get_template
+from django.utils import six
+from django.utils.encoding import force_text
 from django.utils.functional import empty
+from django.utils.safestring import mark_safe
+
+from ..choices import ChoiceCache, choice_cache
+from ..compiled import render_attrs
+from ..datalists import DatalistRegistry, shared_datalists
+from ..formcache import form_cache_key, render_cached
+from ..loader import get_template
+from ..partial import get_partial_render
+from ..profiling import record
+from ..skeleton import render_forms, widget_hole
 
 register = Library()
 
 
+_class_names = {}
+
+
+def class_names(cls):
+    """
+    Returns a set with the names of all classes in the MRO of ``cls``.
+    ``object`` is left out since it would match every field anyway and could
+    clash with a field that is named the same.
+    """
+    try:
+        return _class_names[cls]
+    except KeyError:
+        names = frozenset(class_.__name__ for class_ in cls.__mro__
+                          if class_.__name__ != 'object')
+        _class_names[cls] = names
+        return names
+
+
+def _source_key(tokens, remaining):
+    """
+    Returns a hash of the source of the tokens the parser consumed, from
+    the ``tokens`` before and the ``remaining`` tokens after parsing.
+    """
+    if remaining and remaining[0] is tokens[0]:
+        # the parser takes the tokens from the end of its list
+        consumed = tokens[len(remaining):]
+    else:
+        consumed = tokens[:len(tokens) - len(remaining)]
+    source = u'\n'.join(u'%s:%s' % (token.token_type, token.contents)
+                        for token in consumed)
+    return 'inline:%s' % hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+
+def _template_name(template):
+    """
+    Returns the name of a template returned by ``get_template``, or ``None``
+    for a nodelist.
+    """
+    # Django 1.8 wraps the template of its template engine
+    template = getattr(template, 'template', template)
+    return getattr(template, 'name', None)
+
+
+def is_form_list(var):
+    """
+    Returns ``True`` if ``var`` is a formset or a list of forms rather than a
+    single form.
+    """
+    if not hasattr(var, '__iter__'):
+        return False
+    # we assume it is a formset if the var has these fields
+    significant_attributes = ('forms', 'management_form')
+    if all(hasattr(var, attr) for attr in significant_attributes):
+        return True
+    # we assume it is a form if the var has these fields
+    significant_attributes = ('is_bound', 'data', 'fields')
+    if any(hasattr(var, attr) for attr in significant_attributes):
+        return False
+    # form duck-typing was not successful so it must be a list
+    return True
+
+
+def is_field_list(var):
+    """
+    Returns ``True`` if ``var`` is a list of bound fields rather than a single
+    bound field.
+    """
+    return hasattr(var, '__iter__') and not isinstance(var, BoundField)
+
+
 class ConfigFilter(object):
     """
     Can be used as ``filter`` argument to ``FormConfig.configure()``. This
@@ -38,19 +122,13 @@ class ConfigFilter(object):
                     return True
         if self.var == bound_field.name:
             return True
-        # ignore 'object' in the mro, because it would be a match-all filter
-        # anyway. And 'object' could clash with a field that is named the
-        # same.
-        for class_ in bound_field.field.__class__.__mro__:
-            if class_.__name__ == 'object':
-                continue
-            if self.var == class_.__name__:
-                return True
-        for class_ in bound_field.field.widget.__class__.__mro__:
-            if class_.__name__ == 'object':
-                continue
-            if self.var == class_.__name__:
-                return True
+        try:
+            return (
+                self.var in class_names(bound_field.field.__class__) or
+                self.var in class_names(bound_field.field.widget.__class__))
+        except TypeError:
+            # unhashable values cannot be a class name
+            return False
 
     def __repr__(self):
         return "<%s: %r>" % (self.__class__.__name__, self.var)
@@ -101,19 +179,78 @@ class FormConfig(object):
 
     def __init__(self):
         self.dicts = [self._dict()]
+        self.indexes = [self._index()]
+        self.counter = count()
+        # key -> {(method, form, name): value}
+        self.cache = defaultdict(dict)
+        # key -> {field and class names: matching values}
+        self.structure_cache = defaultdict(dict)
 
     def _dict(self):
         return defaultdict(lambda: [])
 
+    def _index(self):
+        """
+        Returns the lookup index for one level of the stack. Values whose
+        filter matches a field name or class name are stored under that name
+        in ``index['names'][key]``, all other values in
+        ``index['others'][key]``. Every value is stored together with a
+        sequence number that preserves the order of ``configure()`` calls.
+        """
+        return {
+            'names': defaultdict(lambda: defaultdict(list)),
+            'others': defaultdict(list),
+        }
+
+    def _cache_key(self, method, kwargs):
+        """
+        Lookups for a single bound field are cached, keyed on the form and the
+        field name. Returns ``None`` for lookups that cannot be cached.
+        """
+        if len(kwargs) != 1 or 'bound_field' not in kwargs:
+            return None
+        bound_field = kwargs['bound_field']
+        form = getattr(bound_field, 'form', None)
+        name = getattr(bound_field, 'name', None)
+        if form is None or name is None:
+            return None
+        return (method, form, name)
+
+    def _cached(self, method, key, kwargs, lookup):
+        cache_key = self._cache_key(method, kwargs)
+        if cache_key is None:
+            return lookup()
+        cache = self.cache[key]
+        try:
+            return cache[cache_key]
+        except KeyError:
+            pass
+        except TypeError:
+            # the form is not hashable
+            return lookup()
+        value = cache[cache_key] = lookup()
+        return value
+
+    def _invalidate(self, keys):
+        for key in keys:
+            self.cache.pop(key, None)
+            self.structure_cache.pop(key, None)
+
     def push(self):
+        # An empty dict does not change any lookup result, the cache stays
+        # valid.
         d = self._dict()
         self.dicts.append(d)
+        self.indexes.append(self._index())
         return d
 
     def pop(self):
         if len(self.dicts) == 1:
             raise ConfigPopException
-        return self.dicts.pop()
+        d = self.dicts.pop()
+        self.indexes.pop()
+        self._invalidate([key for key, values in d.items() if values])
+        return d
 
     def configure(self, key, value, filter=None):
         """
@@ -121,9 +258,111 @@ class FormConfig(object):
         ``filter``.
 
         """
+        index = self.indexes[-1]
         if filter is None:
+            index['others'][key].append((next(self.counter), value, None))
             filter = lambda **kwargs: True
+        elif (type(filter) is ConfigFilter and
+                isinstance(filter.var, six.string_types)):
+            index['names'][key][filter.var].append(
+                (next(self.counter), value, None))
+        else:
+            index['others'][key].append((next(self.counter), value, filter))
         self.dicts[-1][key].append((value, filter))
+        self._invalidate([key])
+
+    def cache_key(self):
+        """
+        Returns a string that describes the configured values, to cache the
+        output of forms rendered with this configuration. Returns ``None`` if
+        a value was configured with a filter other than a ``ConfigFilter``
+        with a name, which cannot be described.
+        """
+        values = []
+        for index in self.indexes:
+            for key, others in index['others'].items():
+                for number, value, filter in others:
+                    if filter is not None:
+                        return None
+                    values.append((number, key, None, value))
+            for key, named in index['names'].items():
+                for name, entries in named.items():
+                    for number, value, filter in entries:
+                        values.append((number, key, name, value))
+        values.sort(key=itemgetter(0))
+        return repr([value[1:] for value in values])
+
+    def _field_names(self, kwargs):
+        """
+        Returns the names a ``ConfigFilter`` with a string would match for
+        the looked up bound field, or ``None`` if the lookup is not for a
+        single bound field.
+        """
+        if len(kwargs) != 1 or 'bound_field' not in kwargs:
+            return None
+        bound_field = kwargs['bound_field']
+        try:
+            field = bound_field.field
+            return (frozenset((bound_field.name,)) |
+                    class_names(field.__class__) |
+                    class_names(field.widget.__class__))
+        except AttributeError:
+            return None
+
+    def _is_structural(self, key):
+        """
+        Returns ``True`` if the values that apply for ``key`` only depend on
+        the name and the classes of a field, i.e. when no value has been
+        configured with a custom filter.
+        """
+        for index in self.indexes:
+            for number, value, filter in index['others'].get(key, ()):
+                if filter is not None:
+                    return False
+        return True
+
+    def _field_matches(self, key, names, kwargs):
+        """
+        Returns the values for ``key`` that apply to the bound field in
+        ``kwargs``, most recently configured first.
+
+        If they only depend on the field's name and classes, they are shared
+        between all fields with the same ``names``, e.g. the same field in all
+        the forms of a formset.
+        """
+        cache = self.structure_cache[key]
+        try:
+            return cache[names]
+        except KeyError:
+            pass
+        values = list(self._matches(key, names, kwargs))
+        if self._is_structural(key):
+            cache[names] = values
+        return values
+
+    def _matches(self, key, names, kwargs):
+        """
+        Yields the values for ``key`` that apply to the bound field in
+        ``kwargs``, most recently configured first. Only the values indexed
+        under one of ``names`` and the values with other filters are
+        considered.
+        """
+        for index in reversed(self.indexes):
+            candidates = list(index['others'].get(key, ()))
+            named = index['names'].get(key)
+            if named:
+                if len(named) < len(names):
+                    for name, values in named.items():
+                        if name in names:
+                            candidates.extend(values)
+                else:
+                    for name in names:
+                        if name in named:
+                            candidates.extend(named[name])
+            candidates.sort(key=itemgetter(0), reverse=True)
+            for number, value, filter in candidates:
+                if filter is None or filter(**kwargs):
+                    yield value
 
     def retrieve(self, key, **kwargs):
         """
@@ -133,11 +372,23 @@ class FormConfig(object):
         If no value is found and ``key`` has a default value: return
         ``self.defaults[key](**kwargs)``
 
+        Lookups for a ``bound_field`` are cached until the configuration
+        changes.
+
         """
-        for d in reversed(self.dicts):
-            for value, filter in reversed(d[key]):
-                if filter(**kwargs):
-                    return value
+        return self._cached('retrieve', key, kwargs,
+                            lambda: self._retrieve(key, **kwargs))
+
+    def _retrieve(self, key, **kwargs):
+        names = self._field_names(kwargs)
+        if names is not None:
+            for value in self._field_matches(key, names, kwargs):
+                return value
+        else:
+            for d in reversed(self.dicts):
+                for value, filter in reversed(d[key]):
+                    if filter(**kwargs):
+                        return value
 
         if key not in self.defaults:
             return None
@@ -149,6 +400,14 @@ class FormConfig(object):
         most-recently-configured.
 
         """
+        return list(self._cached('retrieve_all', key, kwargs,
+                                 lambda: self._retrieve_all(key, **kwargs)))
+
+    def _retrieve_all(self, key, **kwargs):
+        names = self._field_names(kwargs)
+        if names is not None:
+            return list(self._field_matches(key, names, kwargs))
+
         values = []
         for d in self.dicts:
             for value, filter in d[key]:
@@ -170,6 +429,8 @@ class BaseFormNode(Node):
     accept_only_parameter = True
     accept_for_parameter = False
     optional_for_parameter = False
+    accept_cache_parameter = False
+    accept_bulk_parameter = False
 
     form_config = FormConfig
     single_template_var = None
@@ -191,7 +452,12 @@ class BaseFormNode(Node):
     @classmethod
     def parse_variables(cls, tagname, parser, bits, options):
         variables = []
-        while bits and bits[0] not in ('using', 'with', 'only'):
+        keywords = ('using', 'with', 'only')
+        if cls.accept_bulk_parameter:
+            keywords += ('bulk',)
+        if cls.accept_cache_parameter:
+            keywords += ('cache',)
+        while bits and bits[0] not in keywords:
             variables.append(Variable(bits.pop(0)))
         if not variables:
             raise TemplateSyntaxError(u'%s tag expectes at least one '
@@ -229,7 +495,8 @@ class BaseFormNode(Node):
                                               'least one keyword argument.' %
                                               tagname)
                 options['with'] = arguments
-            elif bits[0] not in ('only',) and not cls.optional_with_parameter:
+            elif (bits[0] not in ('only', 'bulk', 'cache') and
+                    not cls.optional_with_parameter):
                 raise TemplateSyntaxError('Unknown argument for %s tag: %r.' %
                                           (tagname, bits[0]))
 
@@ -252,6 +519,23 @@ class BaseFormNode(Node):
                 raise TemplateSyntaxError('Unknown argument for %s tag: %r.' %
                                           (tagname, bits[0]))
 
+    @classmethod
+    def parse_bulk(cls, tagname, parser, bits, options):
+        if bits and bits[0] == 'bulk':
+            bits.pop(0)
+            options['bulk'] = True
+
+    @classmethod
+    def parse_cache(cls, tagname, parser, bits, options):
+        if bits and bits[0] == 'cache':
+            bits.pop(0)
+            if not bits:
+                raise TemplateSyntaxError('%s: expected a timeout after '
+                                          '"cache".' % tagname)
+            options['cache'] = Variable(bits.pop(0))
+            options['vary_on'] = [Variable(bit) for bit in bits]
+            del bits[:]
+
     @classmethod
     def parse(cls, parser, tokens):
         bits = tokens.split_contents()
@@ -264,6 +548,10 @@ class BaseFormNode(Node):
         variables = cls.parse_variables(tagname, parser, bits, options)
         cls.parse_using(tagname, parser, bits, options)
         cls.parse_with(tagname, parser, bits, options)
+        if cls.accept_bulk_parameter:
+            cls.parse_bulk(tagname, parser, bits, options)
+        if cls.accept_cache_parameter:
+            cls.parse_cache(tagname, parser, bits, options)
 
         if bits:
             raise TemplateSyntaxError('Unknown argument for %s tag: %r.' %
@@ -306,32 +594,33 @@ class ModifierBase(BaseFormNode):
 
     def render(self, context):
         self.enforce_form_tag(context)
-        config = self.get_config(context)
-        filter = None
-        if self.options['for']:
-            try:
-                for_ = self.options['for'].resolve(context)
-            except VariableDoesNotExist:
-                if settings.TEMPLATE_DEBUG:
-                    raise
-                return ''
-            filter = ConfigFilter(for_)
-        if self.options['using']:
-            try:
-                template_name = self.options['using'].resolve(context)
-            except VariableDoesNotExist:
-                if settings.TEMPLATE_DEBUG:
-                    raise
-                return ''
-            config.configure(self.template_config_name,
-                             template_name, filter=filter)
-        if self.options['with']:
-            extra_context = dict([
-                (name, var.resolve(context))
-                for name, var in self.options['with'].items()])
-            config.configure(self.context_config_name,
-                             extra_context, filter=filter)
-        return u''
+        with record(self.tagname, name=self.modifer):
+            config = self.get_config(context)
+            filter = None
+            if self.options['for']:
+                try:
+                    for_ = self.options['for'].resolve(context)
+                except VariableDoesNotExist:
+                    if settings.TEMPLATE_DEBUG:
+                        raise
+                    return ''
+                filter = ConfigFilter(for_)
+            if self.options['using']:
+                try:
+                    template_name = self.options['using'].resolve(context)
+                except VariableDoesNotExist:
+                    if settings.TEMPLATE_DEBUG:
+                        raise
+                    return ''
+                config.configure(self.template_config_name,
+                                 template_name, filter=filter)
+            if self.options['with']:
+                extra_context = dict([
+                    (name, var.resolve(context))
+                    for name, var in self.options['with'].items()])
+                config.configure(self.context_config_name,
+                                 extra_context, filter=filter)
+            return u''
 
     @classmethod
     def parse_bits(cls, tagname, modifier, bits, parser, tokens):
@@ -458,26 +747,31 @@ class BaseFormRenderNode(BaseFormNode):
         return extra_context
 
     def render(self, context):
-        only = self.options['only']
+        return self.render_extra_context(context,
+                                         self.get_extra_context(context))
 
-        config = self.get_config(context)
-        config.push()
+    def render_extra_context(self, context, extra_context):
+        with record(self.tagname) as entry:
+            only = self.options['only']
 
-        extra_context = self.get_extra_context(context)
-        nodelist = self.get_nodelist(context, extra_context)
-        if nodelist is None:
-            return ''
+            config = self.get_config(context)
+            config.push()
 
-        if only:
-            context = context.new(extra_context)
-            output = nodelist.render(context)
-        else:
-            context.update(extra_context)
-            output = nodelist.render(context)
-            context.pop()
+            nodelist = self.get_nodelist(context, extra_context)
+            if nodelist is None:
+                return ''
+            entry.template_name = _template_name(nodelist)
 
-        config.pop()
-        return output
+            if only:
+                context = context.new(extra_context)
+                output = nodelist.render(context)
+            else:
+                context.update(extra_context)
+                output = nodelist.render(context)
+                context.pop()
+
+            config.pop()
+            return output
 
 
 class FormNode(BaseFormRenderNode):
@@ -487,19 +781,136 @@ class FormNode(BaseFormRenderNode):
     single_template_var = 'form'
     list_template_var = 'forms'
 
+    accept_cache_parameter = True
+    accept_bulk_parameter = True
+
     def is_list_variable(self, var):
-        if not hasattr(var, '__iter__'):
-            return False
-        # we assume it is a formset if the var has these fields
-        significant_attributes = ('forms', 'management_form')
-        if all(hasattr(var, attr) for attr in significant_attributes):
-            return True
-        # we assume it is a form if the var has these fields
-        significant_attributes = ('is_bound', 'data', 'fields')
-        if any(hasattr(var, attr) for attr in significant_attributes):
-            return False
-        # form duck-typing was not successful so it must be a list
-        return True
+        return is_form_list(var)
+
+    def render(self, context):
+        extra_context = self.get_extra_context(context)
+        if (self.options.get('cache') is None or
+                get_partial_render() is not None):
+            return self.render_forms(context, extra_context)
+        return self.render_cached(context, extra_context)
+
+    def render_forms(self, context, extra_context):
+        if self.options.get('bulk') and get_partial_render() is None:
+            return self.render_bulk(context, extra_context)
+        return self.render_extra_context(context, extra_context)
+
+    def render_bulk(self, context, extra_context):
+        """
+        Renders the template once for every form, like ``iter_render()``,
+        but from skeletons that the forms share, see
+        ``floppyforms.skeleton.render_forms``.
+        """
+        forms = extra_context[self.list_template_var]
+        layout = self.get_layout_key(context)
+        config_key = self.get_config(context).cache_key()
+        if not forms or layout is None or config_key is None:
+            return self.render_extra_context(context, extra_context)
+        with_context = {}
+        if self.options['with']:
+            with_context = dict((name, extra_context[name])
+                                for name in self.options['with'])
+        layout = 'django:%s:%s:%r' % (layout, config_key,
+                                      sorted(with_context.items()))
+
+        def render(form):
+            form_context = dict(extra_context)
+            form_context[self.single_template_var] = form
+            form_context[self.list_template_var] = [form]
+            return self.render_extra_context(context, form_context)
+
+        with choice_cache(), shared_datalists():
+            return mark_safe(u''.join(
+                force_text(output)
+                for output in render_forms(forms, layout, render)))
+
+    def render_cached(self, context, extra_context):
+        """
+        Renders the forms like ``render()``, but takes the HTML from Django's
+        cache if the forms are unbound, see ``floppyforms.formcache``.
+        """
+        timeout = self.options['cache'].resolve(context)
+        if timeout is not None:
+            try:
+                timeout = int(timeout)
+            except (ValueError, TypeError):
+                raise TemplateSyntaxError(
+                    '%s tag got a non-integer cache timeout value: %r' %
+                    (self.tagname, timeout))
+        vary_on = [var.resolve(context) for var in self.options['vary_on']]
+        with_context = {}
+        if self.options['with']:
+            with_context = dict((name, extra_context[name])
+                                for name in self.options['with'])
+        key = form_cache_key(extra_context[self.list_template_var],
+                             self.get_layout_key(context),
+                             self.get_config(context), with_context, vary_on)
+        if key is None:
+            return self.render_forms(context, extra_context)
+
+        def render(csrf_placeholder):
+            if csrf_placeholder is None:
+                return self.render_forms(context, extra_context)
+            context.update({'csrf_token': csrf_placeholder})
+            try:
+                return self.render_forms(context, extra_context)
+            finally:
+                context.pop()
+
+        return render_cached(key, timeout, render, context.get('csrf_token'))
+
+    def get_layout_key(self, context):
+        """
+        Returns the name of the layout template, or a hash of the layout
+        between ``{% form ... using %}`` and ``{% endform %}``.
+        """
+        if 'nodelist' in self.options:
+            return self.options.get('source_key')
+        if 'using' in self.options:
+            template = self.options['using'].resolve(context)
+            if isinstance(template, six.string_types):
+                return template
+            return _template_name(template)
+        return self.get_template_name(context)
+
+    def iter_render(self, context):
+        """
+        Renders the template once for every form and yields the output as
+        soon as a form is rendered. Each form is passed to the template as
+        ``form`` and as the only item of ``forms``.
+
+        Joined together, the chunks are the same as the output of
+        ``render()``, except for the whitespace around each form that the
+        template repeats.
+        """
+        extra_context = self.get_extra_context(context)
+        forms = extra_context[self.list_template_var]
+        if not forms:
+            yield self.render_extra_context(context, extra_context)
+            return
+        cache = ChoiceCache()
+        registry = DatalistRegistry()
+        for form in forms:
+            form_context = dict(extra_context)
+            form_context[self.single_template_var] = form
+            form_context[self.list_template_var] = [form]
+            with choice_cache(cache), shared_datalists(registry):
+                output = self.render_extra_context(context, form_context)
+            yield output
+
+    def render_extra_context(self, context, extra_context):
+        # The forms of a formset share the choices of their model choice
+        # fields and the datalists of their inputs.
+        if len(extra_context[self.list_template_var]) > 1:
+            with choice_cache(), shared_datalists():
+                return super(FormNode, self).render_extra_context(
+                    context, extra_context)
+        return super(FormNode, self).render_extra_context(context,
+                                                          extra_context)
 
     def get_template_name(self, context):
         config = self.get_config(context)
@@ -519,17 +930,21 @@ class FormNode(BaseFormRenderNode):
         if bits:
             if bits[0] == 'using':
                 bits.pop(0)
-                if len(bits):
+                if len(bits) and bits[0] not in ('bulk', 'cache'):
                     if bits[0] in ('with', 'only'):
                         raise TemplateSyntaxError(
                             '%s: you must provide one template after "using" '
                             'and before "with" or "only".')
                     options['using'] = Variable(bits.pop(0))
                 else:
+                    tokens = list(parser.tokens) if bits else None
                     nodelist = parser.parse(('end%s' % tagname,))
                     parser.delete_first_token()
                     options['nodelist'] = nodelist
-            else:
+                    if tokens is not None:
+                        options['source_key'] = _source_key(tokens,
+                                                            parser.tokens)
+            elif bits[0] not in ('bulk', 'cache'):
                 raise TemplateSyntaxError('Unknown argument for %s tag: %r.' %
                                           (tagname, bits[0]))
 
@@ -544,14 +959,21 @@ class FormRowNode(BaseFormRenderNode):
     optional_using_parameter = True
 
     def is_list_variable(self, var):
-        if hasattr(var, '__iter__') and not isinstance(var, BoundField):
-            return True
-        return False
+        return is_field_list(var)
 
     def get_template_name(self, context):
         config = self.get_config(context)
         return config.retrieve('row_template')
 
+    def render(self, context):
+        extra_context = self.get_extra_context(context)
+        partial = get_partial_render()
+        if partial is not None:
+            return partial.row(
+                extra_context[self.list_template_var],
+                lambda: self.render_extra_context(context, extra_context))
+        return self.render_extra_context(context, extra_context)
+
     def get_extra_context(self, context):
         extra_context = super(FormRowNode, self).get_extra_context(context)
         config = self.get_config(context)
@@ -606,40 +1028,55 @@ class FormFieldNode(BaseFormRenderNode):
                 raise
             return u''
 
-        widget = config.retrieve('widget', bound_field=bound_field)
-        extra_context = self.get_extra_context(context)
-        template_name = config.retrieve('widget_template',
-                                        bound_field=bound_field)
-        if 'using' in self.options:
-            try:
-                template_name = self.options['using'].resolve(context)
-            except VariableDoesNotExist:
-                if settings.DEBUG:
-                    raise
-                return u''
-
-        if self.options['only']:
-            context_instance = context.new(extra_context)
-        else:
-            context.update(extra_context)
-            context_instance = context
+        partial = get_partial_render()
+        if partial is not None:
+            return partial.field(
+                bound_field,
+                lambda: self.render_field(context, config, bound_field))
+        return self.render_field(context, config, bound_field)
+
+    def render_field(self, context, config, bound_field):
+        with record(self.tagname,
+                    name=getattr(bound_field, 'name', None)) as entry:
+            widget = config.retrieve('widget', bound_field=bound_field)
+            extra_context = self.get_extra_context(context)
+            template_name = config.retrieve('widget_template',
+                                            bound_field=bound_field)
+            if 'using' in self.options:
+                try:
+                    template_name = self.options['using'].resolve(context)
+                except VariableDoesNotExist:
+                    if settings.DEBUG:
+                        raise
+                    return u''
+            entry.template_name = template_name
+
+            hole = widget_hole(bound_field, widget, template_name)
+            if hole is not None:
+                return hole
+
+            if self.options['only']:
+                context_instance = context.new(extra_context)
+            else:
+                context.update(extra_context)
+                context_instance = context
 
-        config.push()
+            config.push()
 
-        # Using a context manager here until Django's BoundField takes
-        # template name and context instance parameters
-        with attributes(widget, template_name=template_name,
-                        context_instance=context_instance) as widget:
-            output = bound_field.as_widget(widget=widget)
+            # Using a context manager here until Django's BoundField takes
+            # template name and context instance parameters
+            with attributes(widget, template_name=template_name,
+                            context_instance=context_instance) as widget:
+                output = bound_field.as_widget(widget=widget)
 
-        config.pop()
+            config.pop()
 
-        if not self.options['only']:
-            context.pop()
+            if not self.options['only']:
+                context.pop()
 
-        if bound_field.field.show_hidden_initial:
-            return output + bound_field.as_hidden(only_initial=True)
-        return output
+            if bound_field.field.show_hidden_initial:
+                return output + bound_field.as_hidden(only_initial=True)
+            return output
 
     @classmethod
     def parse_variables(cls, tagname, parser, bits, options):
@@ -675,10 +1112,11 @@ class WidgetNode(Node):
             widget_ctx = {'field': field}
             template = 'floppyforms/dummy.html'
 
-        template = get_template(template)
-        context.update(widget_ctx)
-        rendered = template.render(context)
-        context.pop()
+        with record('widget', name=field.name, template_name=template):
+            template = get_template(template)
+            context.update(widget_ctx)
+            rendered = template.render(context)
+            context.pop()
         return rendered
 
     @classmethod
@@ -707,6 +1145,8 @@ def id(bound_field):
     return for_id
 
 
+register.filter('render_attrs', render_attrs)
+
 register.tag('formconfig', FormConfigNode.parse)
 register.tag('form', FormNode.parse)
 register.tag('formrow', FormRowNode.parse)
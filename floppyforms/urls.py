@@ -0,0 +1,8 @@
+from django.conf.urls import url
+
+from . import autocomplete
+
+urlpatterns = [
+    url(r'^autocomplete/(?P<name>[-\w.]+)/$', autocomplete.lookup,
+        name='floppyforms_autocomplete'),
+]
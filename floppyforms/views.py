@@ -0,0 +1,65 @@
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.utils.encoding import force_text
+from django.views.generic import View
+from django.views.generic.edit import FormMixin
+
+from .forms import DEFAULT_LAYOUT
+from .partial import clean_fields
+
+__all__ = ('FieldValidationView',)
+
+
+class FieldValidationView(FormMixin, View):
+    """
+    Validates the fields of a POSTed form that are named in the ``field``
+    parameter, or in the ``HX-Trigger-Name`` header of htmx requests, and
+    returns their rows rendered with ``layout``. Only these fields are
+    cleaned, see ``floppyforms.partial.clean_fields()``.
+
+    The rows are returned as HTML, one after the other, or with ``as_json``
+    as ``{"fields": {name: html}, "errors": {name: [message, ...]}}``. Set
+    ``widgets`` to return the widgets instead of the rows. ``form_class``
+    must be a floppyforms form.
+    """
+    layout = DEFAULT_LAYOUT
+    widgets = False
+    as_json = False
+    field_parameter = 'field'
+
+    def get_field_names(self, form):
+        """
+        Returns the names of the fields to validate, or ``None`` if the
+        request names no field or a field that the form doesn't have. The
+        request may use the names of the inputs, with the form's prefix.
+        """
+        names = self.request.POST.getlist(self.field_parameter)
+        if not names and 'HTTP_HX_TRIGGER_NAME' in self.request.META:
+            names = [self.request.META['HTTP_HX_TRIGGER_NAME']]
+        html_names = dict((form.add_prefix(name), name)
+                          for name in form.fields)
+        field_names = []
+        for name in names:
+            if name in html_names:
+                name = html_names[name]
+            elif name not in form.fields:
+                return None
+            if name not in field_names:
+                field_names.append(name)
+        return field_names or None
+
+    def post(self, request, *args, **kwargs):
+        form = self.get_form()
+        names = self.get_field_names(form)
+        if names is None:
+            return HttpResponseBadRequest()
+        errors = clean_fields(form, names)
+        fragments = form.render_fields(names, self.layout, self.widgets)
+        if self.as_json:
+            return JsonResponse({
+                'fields': dict((name, force_text(html))
+                               for name, html in fragments.items()),
+                'errors': dict((name, [force_text(error)
+                                       for error in errors.get(name, [])])
+                               for name in names),
+            })
+        return HttpResponse(u''.join(fragments.values()))
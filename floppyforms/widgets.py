@@ -1,6 +1,8 @@
+from collections import OrderedDict
 from itertools import chain
 import re
 import datetime
+import threading
 
 import django
 from django import forms
@@ -11,14 +13,22 @@ except ImportError:
     from django.forms.util import to_current_timezone
 from django.forms.widgets import FILE_INPUT_CONTRADICTION
 from django.conf import settings
-from django.template import loader
+from django.core.signals import setting_changed
+try:
+    from django.core.urlresolvers import reverse
+except ImportError:
+    from django.urls import reverse
 from django.utils.datastructures import MultiValueDict
 from django.utils.html import conditional_escape
-from django.utils.translation import ugettext_lazy as _
+from django.utils.translation import get_language, ugettext_lazy as _
 from django.utils import datetime_safe, formats, six
 from django.utils.dates import MONTHS
 from django.utils.encoding import force_text
 
+from . import compiled, loader
+from .datalists import get_datalist_registry
+from .skeleton import disable_skeleton, get_skeleton_recorder
+from .profiling import record
 
 RE_DATE = re.compile(r'(\d{4})-(\d\d?)-(\d\d?)$')
 
@@ -31,7 +41,7 @@ __all__ = (
     'ColorInput', 'EmailInput', 'URLInput', 'PhoneNumberInput', 'NumberInput',
     'IPAddressInput', 'MultiWidget', 'Widget', 'SplitDateTimeWidget',
     'SplitHiddenDateTimeWidget', 'MultipleHiddenInput', 'SelectDateWidget',
-    'SlugInput',
+    'SlugInput', 'AutocompleteSelect', 'AutocompleteSelectMultiple',
 )
 
 
@@ -43,6 +53,9 @@ class Input(Widget):
     template_name = 'floppyforms/input.html'
     input_type = None
     datalist = None
+    #: Whether the value is the only part of the HTML that depends on the
+    #: form instance and is rendered as is, see ``floppyforms.skeleton``.
+    value_hole = False
 
     def __init__(self, *args, **kwargs):
         datalist = kwargs.pop('datalist', None)
@@ -78,6 +91,14 @@ class Input(Widget):
         if value is None:
             value = ''
 
+        recorder = get_skeleton_recorder()
+        if recorder is not None:
+            # Rendering a skeleton, the value is filled in later
+            hole = recorder.value_hole(self, name)
+            if hole is not None:
+                context['value'] = hole
+                value = ''
+
         if value != '':
             # Only add the value if it is non-empty
             context['value'] = self._format_value(value)
@@ -95,18 +116,46 @@ class Input(Widget):
 
         if self.datalist is not None:
             context['datalist'] = self.datalist
+            if self.datalist:
+                context['datalist_id'] = self.get_datalist_id(context)
         return context
 
+    def get_datalist_id(self, context):
+        """
+        Returns the id of the datalist. Inside a ``shared_datalists()`` block,
+        the datalist is only left in the context the first time it is used,
+        later inputs only refer to it.
+        """
+        registry = get_datalist_registry()
+        if registry is None:
+            return '%s_list' % context['attrs'].get('id', '')
+        if get_skeleton_recorder() is not None:
+            # Only the first input renders the datalist, which a skeleton
+            # can't tell. The form is rendered again without skeleton.
+            disable_skeleton()
+            return ''
+        datalist_id, new = registry.get(self.datalist)
+        if not new:
+            context['datalist'] = None
+        return datalist_id
+
     def render(self, name, value, attrs=None, **kwargs):
         template_name = kwargs.pop('template_name', None)
         if template_name is None:
             template_name = self.template_name
-        context = self.get_context(name, value, attrs=attrs or {}, **kwargs)
-        return loader.render_to_string(template_name, context)
+        with record('widget', name=name, template_name=template_name):
+            context = self.get_context(name, value, attrs=attrs or {},
+                                       **kwargs)
+            renderer = compiled.get_renderer(template_name)
+            if renderer is not None:
+                return renderer(context)
+            return loader.render(loader.get_widget_template(template_name),
+                                 context)
 
 
 class TextInput(Input):
     input_type = 'text'
+    value_hole = True
 
     def __init__(self, *args, **kwargs):
         if kwargs.get('attrs', None) is not None:
@@ -116,6 +165,7 @@ class TextInput(Input):
 
 class PasswordInput(TextInput):
     input_type = 'password'
+    value_hole = False
 
     def __init__(self, attrs=None, render_value=False):
         super(PasswordInput, self).__init__(attrs)
@@ -130,29 +180,47 @@ class PasswordInput(TextInput):
 class HiddenInput(Input):
     input_type = 'hidden'
     is_hidden = True
+    value_hole = True
 
 
 class MultipleHiddenInput(HiddenInput):
     """<input type="hidden"> for fields that have a list of values"""
+    value_hole = False
+
     def __init__(self, attrs=None, choices=()):
         super(MultipleHiddenInput, self).__init__(attrs)
         self.choices = choices
 
     def render(self, name, value, attrs=None, choices=()):
+        disable_skeleton()
         if value is None:
             value = []
 
         final_attrs = self.build_attrs(attrs)
         id_ = final_attrs.get('id', None)
-        inputs = []
-        for i, v in enumerate(value):
-            input_attrs = final_attrs.copy()
-            if id_:
-                input_attrs['id'] = '%s_%s' % (id_, i)
-            input_ = HiddenInput()
-            input_.is_required = self.is_required
-            inputs.append(input_.render(name, force_text(v), input_attrs))
-        return "\n".join(inputs)
+        input_ = HiddenInput()
+        input_.is_required = self.is_required
+        template_name = input_.template_name
+        with record('widget', name=name, template_name=template_name):
+            if compiled.get_renderer(template_name) is compiled.render_input:
+                # Built like the attrs of the template below, so that the
+                # attributes come in the same order on Python 2 as well.
+                input_attrs = input_.build_attrs(final_attrs.copy())
+                return compiled.render_hidden_inputs(
+                    name, [force_text(v) for v in value], input_attrs,
+                    self.is_required)
+
+            # The template is looked up once for all the values.
+            template = loader.get_widget_template(template_name)
+            inputs = []
+            for i, v in enumerate(value):
+                input_attrs = final_attrs.copy()
+                if id_:
+                    input_attrs['id'] = '%s_%s' % (id_, i)
+                context = input_.get_context(name, force_text(v),
+                                             input_attrs)
+                inputs.append(loader.render(template, context))
+            return "\n".join(inputs)
 
     def value_from_datadict(self, data, files, name):
         if isinstance(data, MultiValueDict):
@@ -238,6 +306,7 @@ class ClearableFileInput(FileInput):
 
 class Textarea(Input):
     template_name = 'floppyforms/textarea.html'
+    value_hole = True
     rows = 10
     cols = 40
 
@@ -253,6 +322,7 @@ class Textarea(Input):
 
 class DateInput(Input):
     input_type = 'date'
+    value_hole = True
 
     def __init__(self, attrs=None, format=None):
         super(DateInput, self).__init__(attrs)
@@ -283,6 +353,7 @@ class DateInput(Input):
 
 class DateTimeInput(Input):
     input_type = 'datetime'
+    value_hole = True
 
     def __init__(self, attrs=None, format=None):
         super(DateTimeInput, self).__init__(attrs)
@@ -313,6 +384,7 @@ class DateTimeInput(Input):
 
 class TimeInput(Input):
     input_type = 'time'
+    value_hole = True
 
     def __init__(self, attrs=None, format=None):
         super(TimeInput, self).__init__(attrs)
@@ -342,6 +414,7 @@ class TimeInput(Input):
 
 class SearchInput(Input):
     input_type = 'search'
+    value_hole = True
 
 
 class EmailInput(TextInput):
@@ -354,6 +427,7 @@ class URLInput(TextInput):
 
 class ColorInput(Input):
     input_type = 'color'
+    value_hole = True
 
 
 class NumberInput(TextInput):
@@ -379,6 +453,7 @@ class RangeInput(NumberInput):
 
 class PhoneNumberInput(Input):
     input_type = 'tel'
+    value_hole = True
 
 
 def boolean_check(v):
@@ -423,6 +498,34 @@ class CheckboxInput(Input, forms.CheckboxInput):
             return bool(initial) != bool(data)
 
 
+class OptGroups(list):
+    """
+    The choices of a select widget, grouped by optgroup. Renderers can store
+    data that only depends on the choices in ``cache``, it is kept as long as
+    the widget's choices don't change.
+    """
+    def __init__(self, *args):
+        super(OptGroups, self).__init__(*args)
+        self.cache = {}
+
+
+class SelectedValues(list):
+    """
+    The selected values of a ``SelectMultiple``. Testing whether an option is
+    selected (``option.0 in value``) is a set lookup instead of a search
+    through the list.
+    """
+    def __init__(self, *args):
+        super(SelectedValues, self).__init__(*args)
+        self.lookup = frozenset(self)
+
+    def __contains__(self, value):
+        try:
+            return value in self.lookup
+        except TypeError:
+            return super(SelectedValues, self).__contains__(value)
+
+
 class Select(Input):
     allow_multiple_selected = False
     template_name = 'floppyforms/select.html'
@@ -430,6 +533,9 @@ class Select(Input):
     def __init__(self, attrs=None, choices=()):
         super(Select, self).__init__(attrs)
         self.choices = list(choices)
+        # The copies of the widget that every form instance makes share
+        # this dictionary and with it the cached optgroups.
+        self._optgroups = {}
 
     def get_context(self, name, value, attrs=None, choices=()):
         if not hasattr(value, '__iter__') or isinstance(value,
@@ -440,6 +546,41 @@ class Select(Input):
         if self.allow_multiple_selected:
             context['attrs']['multiple'] = "multiple"
 
+        context["optgroups"] = self.get_optgroups(choices)
+        return context
+
+    def get_optgroups(self, choices=()):
+        """
+        Returns the widget's choices and the extra ``choices`` grouped by
+        optgroup, with the option values converted to text.
+
+        The result is cached as long as the widget's ``choices`` is the same
+        list or tuple with the same length and no extra choices are given.
+        Assign a new list to ``choices`` instead of changing it in place.
+        Other iterables can provide a ``get_optgroups(build_optgroups)``
+        method that returns cached optgroups.
+        """
+        if choices:
+            return self.build_optgroups(chain(self.choices, choices))
+        if not isinstance(self.choices, (list, tuple)):
+            # e.g. the choices of a model choice field
+            get_optgroups = getattr(self.choices, 'get_optgroups', None)
+            if get_optgroups is not None:
+                return get_optgroups(self.build_optgroups)
+            return self.build_optgroups(self.choices)
+        cache = getattr(self, '_optgroups', None)
+        cached = cache.get('optgroups') if cache is not None else None
+        if cached is not None and cached[0] is self.choices:
+            if cached[1] == len(self.choices):
+                return cached[2]
+        elif cached is not None or cache is None:
+            # the choices of this copy have been replaced, stop sharing
+            cache = self._optgroups = {}
+        groups = self.build_optgroups(self.choices)
+        cache['optgroups'] = (self.choices, len(self.choices), groups)
+        return groups
+
+    def build_optgroups(self, choices):
         # 'groups' look like this:
         # (
         #   ("Optgroup name", (
@@ -451,8 +592,8 @@ class Select(Input):
         #       (value4, label4),
         #   ]),
         # )
-        groups = []
-        for option_value, option_label in chain(self.choices, choices):
+        groups = OptGroups()
+        for option_value, option_label in choices:
             if isinstance(option_label, (list, tuple)):
                 group = []
                 for val, lab in option_label:
@@ -464,8 +605,7 @@ class Select(Input):
                     groups[-1][1].append((option_value, option_label))
                 else:
                     groups.append((None, [(option_value, option_label)]))
-        context["optgroups"] = groups
-        return context
+        return groups
 
     def _format_value(self, value):
         if len(value) == 1 and value[0] is None:
@@ -512,7 +652,7 @@ class SelectMultiple(Select):
     def _format_value(self, value):
         if len(value) == 1 and value[0] is None:
             value = []
-        return [force_text(v) for v in value]
+        return SelectedValues(force_text(v) for v in value)
 
     def value_from_datadict(self, data, files, name):
         if isinstance(data, MultiValueDict):
@@ -540,6 +680,66 @@ class CheckboxSelectMultiple(SelectMultiple):
     template_name = 'floppyforms/checkbox_select.html'
 
 
+class AutocompleteSelect(Select):
+    """
+    A select with only the selected options and a search input that looks up
+    the other choices with the autocomplete lookup view, for choices that
+    are too many to render. See ``floppyforms.autocomplete``.
+    """
+    template_name = 'floppyforms/autocomplete.html'
+    lookup = None
+    url = None
+
+    class Media:
+        js = ('floppyforms/js/Autocomplete.js',)
+
+    def __init__(self, attrs=None, choices=(), lookup=None, url=None):
+        super(AutocompleteSelect, self).__init__(attrs, choices)
+        if lookup is not None:
+            self.lookup = lookup
+        if url is not None:
+            self.url = url
+
+    def get_url(self):
+        if self.url is not None:
+            return self.url
+        return reverse('floppyforms_autocomplete',
+                       kwargs={'name': self.lookup})
+
+    def get_optgroups(self, choices=()):
+        # The selected options are added by get_context().
+        return OptGroups()
+
+    def get_selected(self, values):
+        """
+        Returns the ``(value, label)`` pairs of the selected choices, with a
+        single query for the choices of model choice fields.
+        """
+        if hasattr(self.choices, 'queryset'):
+            from .autocomplete import get_selected
+            return get_selected(self.choices, values)
+        return [(force_text(option_value), option_label)
+                for option_value, option_label in self.choices
+                if force_text(option_value) in values]
+
+    def get_context(self, name, value, attrs=None, choices=()):
+        context = super(AutocompleteSelect, self).get_context(
+            name, value, attrs, choices)
+        options = []
+        empty_label = getattr(getattr(self.choices, 'field', None),
+                              'empty_label', None)
+        if not self.allow_multiple_selected and empty_label is not None:
+            options.append(('', empty_label))
+        options.extend(self.get_selected(context.get('value') or ()))
+        context['optgroups'] = self.build_optgroups(options)
+        context['autocomplete_url'] = self.get_url()
+        return context
+
+
+class AutocompleteSelectMultiple(AutocompleteSelect, SelectMultiple):
+    pass
+
+
 class MultiWidget(forms.MultiWidget):
     pass
 
@@ -565,7 +765,73 @@ class SplitHiddenDateTimeWidget(SplitDateTimeWidget):
                                                         time_format)
         for widget in self.widgets:
             widget.input_type = 'hidden'
-            widget.is_hidden = True
+            # Since Django 1.7, is_hidden is a property for the input type
+            if not isinstance(getattr(type(widget), 'is_hidden', None),
+                              property):
+                widget.is_hidden = True
+
+
+class ChoiceTable(tuple):
+    """
+    An immutable sequence of ``(value, label)`` choices. Like ``OptGroups``,
+    it has a ``cache`` for data that only depends on the choices.
+    """
+    def __new__(cls, *args):
+        table = super(ChoiceTable, cls).__new__(cls, *args)
+        table.cache = {}
+        return table
+
+
+class DateChoiceCache(object):
+    """
+    A bounded cache for the choice tables of ``SelectDateWidget``, keyed on
+    the widget configuration and the active language. The input format for
+    dates is cached per language as well.
+    """
+    maxsize = 100
+
+    def __init__(self):
+        self.tables = OrderedDict()
+        self.input_formats = {}
+        self.lock = threading.Lock()
+
+    def get_tables(self, widget):
+        key = (tuple(widget.years), widget.none_value, widget.required,
+               get_language())
+        try:
+            return self.tables[key]
+        except KeyError:
+            pass
+        tables = widget.build_choice_tables()
+        with self.lock:
+            self.tables[key] = tables
+            while len(self.tables) > self.maxsize:
+                self.tables.popitem(last=False)
+        return tables
+
+    def get_input_format(self):
+        language = get_language()
+        try:
+            return self.input_formats[language]
+        except KeyError:
+            input_format = formats.get_format('DATE_INPUT_FORMATS')[0]
+            self.input_formats[language] = input_format
+            return input_format
+
+    def clear(self):
+        with self.lock:
+            self.tables.clear()
+            self.input_formats.clear()
+
+
+date_choice_cache = DateChoiceCache()
+
+
+def reset_date_choice_cache(**kwargs):
+    date_choice_cache.clear()
+
+
+setting_changed.connect(reset_date_choice_cache)
 
 
 class SelectDateWidget(forms.Widget):
@@ -623,6 +889,7 @@ class SelectDateWidget(forms.Widget):
         return context
 
     def render(self, name, value, attrs=None, extra_context={}):
+        disable_skeleton()
         try:
             year_val, month_val, day_val = value.year, value.month, value.day
         except AttributeError:
@@ -630,9 +897,7 @@ class SelectDateWidget(forms.Widget):
             if isinstance(value, six.text_type):
                 if settings.USE_L10N:
                     try:
-                        input_format = formats.get_format(
-                            'DATE_INPUT_FORMATS'
-                        )[0]
+                        input_format = date_choice_cache.get_input_format()
                         v = datetime.datetime.strptime(value, input_format)
                         year_val, month_val, day_val = v.year, v.month, v.day
                     except ValueError:
@@ -645,15 +910,30 @@ class SelectDateWidget(forms.Widget):
         context = self.get_context(name, value, attrs=attrs,
                                    extra_context=extra_context)
 
-        context['year_choices'] = [(i, i) for i in self.years]
+        context.update(date_choice_cache.get_tables(self))
         context['year_val'] = year_val
-
-        context['month_choices'] = list(MONTHS.items())
         context['month_val'] = month_val
-
-        context['day_choices'] = [(i, i) for i in range(1, 32)]
         context['day_val'] = day_val
 
+        with record('widget', name=name, template_name=self.template_name):
+            renderer = compiled.get_renderer(self.template_name)
+            if renderer is not None:
+                return renderer(context)
+            return loader.render(
+                loader.get_widget_template(self.template_name), context)
+
+    def build_choice_tables(self):
+        """
+        Returns a dictionary with the ``year_choices``, ``month_choices`` and
+        ``day_choices`` for the active language. The result is cached by
+        ``date_choice_cache``.
+        """
+        years = [(i, i) for i in self.years]
+        # The month names are lazy translations, they are translated once
+        # for every language.
+        months = [(i, force_text(month)) for i, month in MONTHS.items()]
+        days = [(i, i) for i in range(1, 32)]
+
         # Theoretically the widget should use self.is_required to determine
         # whether the field is required. For some reason this widget gets a
         # required parameter. The Django behaviour is preferred in this
@@ -663,11 +943,15 @@ class SelectDateWidget(forms.Widget):
         # here is to treat the Django behaviour as a bug: if the value isn't
         # required, then it can be unset.
         if self.required is False:
-            context['year_choices'].insert(0, self.none_value)
-            context['month_choices'].insert(0, self.none_value)
-            context['day_choices'].insert(0, self.none_value)
-
-        return loader.render_to_string(self.template_name, context)
+            years.insert(0, self.none_value)
+            months.insert(0, self.none_value)
+            days.insert(0, self.none_value)
+
+        return {
+            'year_choices': ChoiceTable(years),
+            'month_choices': ChoiceTable(months),
+            'day_choices': ChoiceTable(days),
+        }
 
     def value_from_datadict(self, data, files, name):
         y = data.get(self.year_field % name)
@@ -677,7 +961,7 @@ class SelectDateWidget(forms.Widget):
             return None
         if y and m and d:
             if settings.USE_L10N:
-                input_format = formats.get_format('DATE_INPUT_FORMATS')[0]
+                input_format = date_choice_cache.get_input_format()
                 try:
                     date_value = datetime.date(int(y), int(m), int(d))
                 except ValueError:
@@ -2,8 +2,7 @@
 import codecs
 import re
 from os import path
-from distutils.core import setup
-from setuptools import find_packages
+from setuptools import find_packages, setup
 
 
 def read(*parts):
@@ -25,8 +24,9 @@ setup(
     version=find_version('floppyforms', '__init__.py'),
     author=u'Bruno Renié',
     author_email='bruno@renie.fr',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks']),
     include_package_data=True,
+    install_requires=['Django>=1.8'],
     url='https://github.com/gregmuellegger/django-floppyforms',
     license='BSD licence, see LICENSE file',
     description='Full control of form rendering in the templates',
@@ -37,6 +37,7 @@ setup(
         'Development Status :: 5 - Production/Stable',
         'Environment :: Web Environment',
         'Framework :: Django',
+        'Framework :: Django :: 1.8',
         'Intended Audience :: Developers',
         'License :: OSI Approved :: BSD License',
         'Natural Language :: English',
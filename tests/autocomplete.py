@@ -0,0 +1,204 @@
+import json
+
+from django.core.exceptions import PermissionDenied
+from django.http import Http404
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+
+import floppyforms as forms
+from floppyforms import autocomplete
+
+from .models import Membership, Registration
+
+
+class User(object):
+    def __init__(self, authenticated=True, lastname=None):
+        self.authenticated = authenticated
+        self.lastname = lastname
+
+    def is_authenticated(self):
+        return self.authenticated
+
+
+class NameLookup(autocomplete.Lookup):
+    def get_label(self, obj):
+        return obj.firstname
+
+
+class FamilyLookup(NameLookup):
+    def get_queryset(self, request):
+        return self.queryset.filter(lastname=request.user.lastname)
+
+
+class NameChoiceField(forms.ModelChoiceField):
+    def label_from_instance(self, obj):
+        return obj.firstname
+
+
+class NameMultipleChoiceField(forms.ModelMultipleChoiceField):
+    def label_from_instance(self, obj):
+        return obj.firstname
+
+
+class RegistrationForm(forms.Form):
+    registration = NameChoiceField(
+        queryset=Registration.objects.all(), autocomplete='registrations')
+    registrations = NameMultipleChoiceField(
+        queryset=Registration.objects.all(), autocomplete='registrations',
+        required=False)
+
+
+@override_settings(ROOT_URLCONF='floppyforms.urls')
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        for name in ('Alice', 'Alan', 'Albert', 'Bob', 'bea'):
+            Registration.objects.create(firstname=name, lastname='Doe',
+                                        username=name.lower(), age=30)
+        autocomplete.result_cache.clear()
+        self.lookup = autocomplete.register(
+            'registrations', Registration.objects.all(),
+            search_fields=('firstname',), page_size=2,
+            lookup_class=NameLookup)
+        self.addCleanup(autocomplete.unregister, 'registrations')
+
+    def get(self, name='registrations', user=None, **params):
+        request = RequestFactory().get('/', params)
+        request.user = user or User()
+        response = autocomplete.lookup(request, name)
+        return json.loads(response.content.decode('utf-8'))
+
+    def test_lookup(self):
+        data = self.get(term='Al')
+        self.assertEqual([r['label'] for r in data['results']],
+                         ['Alan', 'Albert'])
+        self.assertTrue(data['more'])
+        alan = Registration.objects.get(firstname='Alan')
+        self.assertEqual(data['results'][0]['value'], str(alan.pk))
+
+        data = self.get(term='Al', page=2)
+        self.assertEqual([r['label'] for r in data['results']], ['Alice'])
+        self.assertFalse(data['more'])
+
+        self.assertEqual(self.get(term='')['results'], [])
+        with self.assertRaises(Http404):
+            self.get(name='unknown', term='Al')
+
+    def test_permission(self):
+        with self.assertRaises(PermissionDenied):
+            self.get(term='Al', user=User(authenticated=False))
+        request = RequestFactory().get('/', {'term': 'Al'})
+        with self.assertRaises(PermissionDenied):
+            autocomplete.lookup(request, 'registrations')
+
+        autocomplete.register('public', Registration.objects.all(),
+                              search_fields=('firstname',),
+                              login_required=False)
+        self.addCleanup(autocomplete.unregister, 'public')
+        data = self.get('public', term='Bob', user=User(authenticated=False))
+        self.assertEqual(len(data['results']), 1)
+
+    def test_cache_per_queryset(self):
+        Registration.objects.create(firstname='Alfred', lastname='Roe',
+                                    username='alfred', age=30)
+        autocomplete.register('family', Registration.objects.all(),
+                              search_fields=('firstname',),
+                              lookup_class=FamilyLookup)
+        self.addCleanup(autocomplete.unregister, 'family')
+        labels = [r['label'] for r in self.get(
+            'family', term='Alf', user=User(lastname='Roe'))['results']]
+        self.assertEqual(labels, ['Alfred'])
+        # Another user's queryset doesn't use these results.
+        self.assertEqual(self.get('family', term='Alf',
+                                  user=User(lastname='Doe'))['results'], [])
+        with self.assertNumQueries(0):
+            labels = [r['label'] for r in self.get(
+                'family', term='Alfr', user=User(lastname='Roe'))['results']]
+        self.assertEqual(labels, ['Alfred'])
+
+    def test_prefix_cache(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.get(term='Ali')['results']), 1)
+            # Served from the complete results for 'Ali'.
+            self.assertEqual(len(self.get(term='Alic')['results']), 1)
+            self.assertEqual(self.get(term='Alix')['results'], [])
+        # 'Al' has more than one page, it is not cached.
+        with self.assertNumQueries(2):
+            self.get(term='Al')
+            self.get(term='Al')
+
+    def test_related_search_fields(self):
+        alice = Registration.objects.get(firstname='Alice')
+        albert = Registration.objects.get(firstname='Albert')
+        Membership.objects.create(registration=alice, club='Chess')
+        Membership.objects.create(registration=albert, club='Alpine')
+        lookup = autocomplete.register(
+            'members', Membership.objects.all(),
+            search_fields=('registration__firstname__startswith',))
+        self.addCleanup(autocomplete.unregister, 'members')
+        self.assertFalse(lookup.can_filter_cached(Membership))
+        self.assertTrue(autocomplete.Lookup(
+            Membership.objects.all(), search_fields=('club',)
+        ).can_filter_cached(Membership))
+        for search_fields in (('registration',), ('registration_id',),
+                              ('club', 'pk')):
+            self.assertFalse(autocomplete.Lookup(
+                Membership.objects.all(), search_fields=search_fields
+            ).can_filter_cached(Membership), search_fields)
+
+        self.assertEqual(len(self.get('members', term='Al')['results']), 2)
+        # Not filtered from the results for 'Al'.
+        with self.assertNumQueries(1):
+            results = self.get('members', term='Ali')['results']
+        self.assertEqual(len(results), 1)
+
+    def test_case_insensitive(self):
+        autocomplete.register('names', Registration.objects.all(),
+                              search_fields=('firstname__istartswith',),
+                              page_size=10, lookup_class=NameLookup)
+        self.addCleanup(autocomplete.unregister, 'names')
+        labels = [r['label'] for r in self.get('names', term='b')['results']]
+        self.assertEqual(sorted(labels), ['Bob', 'bea'])
+        with self.assertNumQueries(0):
+            labels = [r['label']
+                      for r in self.get('names', term='BE')['results']]
+        self.assertEqual(labels, ['bea'])
+
+    def test_render_only_selected(self):
+        alice = Registration.objects.get(firstname='Alice')
+        bob = Registration.objects.get(firstname='Bob')
+        form = RegistrationForm(initial={'registration': alice.pk,
+                                         'registrations': [alice.pk, bob.pk]})
+        with self.assertNumQueries(1):
+            rendered = form['registration'].as_widget()
+        self.assertTrue('Alice' in rendered, rendered)
+        self.assertFalse('Albert' in rendered, rendered)
+        self.assertTrue('data-autocomplete-url="/autocomplete/registrations/"'
+                        in rendered, rendered)
+        self.assertTrue('<datalist id="id_registration_list">' in rendered)
+        self.assertTrue('<option value="">---------</option>' in rendered)
+
+        rendered = form['registrations'].as_widget()
+        self.assertTrue('multiple' in rendered, rendered)
+        self.assertEqual(rendered.count('selected="selected"'), 2)
+        self.assertFalse('Albert' in rendered, rendered)
+
+        with self.assertNumQueries(0):
+            rendered = RegistrationForm()['registration'].as_widget()
+        self.assertEqual(rendered.count('<option'), 1)
+
+    def test_invalid_values_are_not_rendered(self):
+        form = RegistrationForm({'registration': 'foo'})
+        rendered = form['registration'].as_widget()
+        self.assertEqual(rendered.count('<option'), 1)
+
+    def test_validation(self):
+        alice = Registration.objects.get(firstname='Alice')
+        form = RegistrationForm({'registration': alice.pk})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['registration'], alice)
+        form = RegistrationForm({'registration': '12345'})
+        self.assertFalse(form.is_valid())
+
+    def test_media(self):
+        self.assertTrue('floppyforms/js/Autocomplete.js' in
+                        str(RegistrationForm().media))
@@ -0,0 +1,120 @@
+from django.core.signals import request_finished
+from django.forms.formsets import formset_factory
+from django.template import Context, Template
+from django.test import TestCase
+
+import floppyforms as forms
+from floppyforms.choices import ChoiceCacheMiddleware, get_choice_cache
+
+from .models import Registration
+
+
+class RegistrationChoiceForm(forms.Form):
+    registration = forms.ModelChoiceField(
+        queryset=Registration.objects.order_by('pk'))
+    registrations = forms.ModelMultipleChoiceField(
+        queryset=Registration.objects.order_by('pk'), required=False)
+
+
+class ChoiceCacheTests(TestCase):
+    def setUp(self):
+        for name in ('Alice', 'Bob', 'Carol'):
+            Registration.objects.create(firstname=name, lastname='Doe',
+                                        username=name.lower(), age=30)
+
+    def render(self, form):
+        return (form['registration'].as_widget() +
+                form['registrations'].as_widget())
+
+    def test_without_cache_every_widget_queries(self):
+        with self.assertNumQueries(4):
+            self.render(RegistrationChoiceForm())
+            self.render(RegistrationChoiceForm())
+
+    def test_querysets_are_evaluated_once(self):
+        with forms.choice_cache() as cache:
+            with self.assertNumQueries(2):
+                first = self.render(RegistrationChoiceForm())
+                second = self.render(RegistrationChoiceForm())
+        self.assertEqual(first, second)
+        self.assertTrue(cache.hits > 0)
+        self.assertEqual(self.render(RegistrationChoiceForm()), first)
+        self.assertEqual(get_choice_cache(), None)
+
+    def test_optgroups_are_shared(self):
+        with forms.choice_cache():
+            first = RegistrationChoiceForm().fields['registration'].widget
+            second = RegistrationChoiceForm().fields['registration'].widget
+            self.assertTrue(first.get_optgroups() is second.get_optgroups())
+            self.assertEqual(len(first.get_optgroups()[0][1]), 4)
+
+    def test_different_querysets_are_not_shared(self):
+        with forms.choice_cache():
+            form = RegistrationChoiceForm()
+            form.fields['registration'].queryset = (
+                Registration.objects.filter(firstname='Alice'))
+            with self.assertNumQueries(2):
+                rendered = form['registration'].as_widget()
+                RegistrationChoiceForm()['registration'].as_widget()
+        self.assertEqual(rendered.count('<option'), 2)
+
+    def test_copied_querysets_are_shared(self):
+        with forms.choice_cache():
+            first = RegistrationChoiceForm()
+            second = RegistrationChoiceForm()
+            second.fields['registration'].queryset = (
+                first.fields['registration'].queryset.all())
+            with self.assertNumQueries(1):
+                first['registration'].as_widget()
+                second['registration'].as_widget()
+
+    def test_empty_querysets(self):
+        with forms.choice_cache():
+            form = RegistrationChoiceForm()
+            form.fields['registration'].queryset = (
+                Registration.objects.none())
+            rendered = form['registration'].as_widget()
+            other = RegistrationChoiceForm()['registration'].as_widget()
+        self.assertEqual(rendered.count('<option'), 1)
+        self.assertEqual(other.count('<option'), 4)
+
+    def test_formsets_share_choices(self):
+        RegistrationFormSet = formset_factory(RegistrationChoiceForm,
+                                              extra=5)
+        template = Template('{% load floppyforms %}'
+                            '{% form formset using "floppyforms/layouts/p.html" %}')
+        with self.assertNumQueries(2):
+            template.render(Context({'formset': RegistrationFormSet()}))
+        with self.assertNumQueries(2):
+            list(forms.iter_render(RegistrationFormSet()))
+
+    def test_middleware(self):
+        middleware = ChoiceCacheMiddleware()
+        request = object.__new__(type('Request', (object,), {}))
+        middleware.process_request(request)
+        self.assertNotEqual(get_choice_cache(), None)
+        response = object()
+        self.assertTrue(middleware.process_response(request, response) is
+                        response)
+        self.assertEqual(get_choice_cache(), None)
+
+    def test_new_style_middleware(self):
+        def get_response(request):
+            self.assertNotEqual(get_choice_cache(), None)
+            raise ValueError
+
+        middleware = ChoiceCacheMiddleware(get_response)
+        with self.assertRaises(ValueError):
+            middleware(object())
+        self.assertEqual(get_choice_cache(), None)
+
+    def test_middleware_cleared_when_request_finishes(self):
+        ChoiceCacheMiddleware().process_request(object())
+        self.assertNotEqual(get_choice_cache(), None)
+        request_finished.send(sender=self.__class__)
+        self.assertEqual(get_choice_cache(), None)
+
+        # Blocks opened outside of the middleware are left alone.
+        with forms.choice_cache():
+            request_finished.send(sender=self.__class__)
+            self.assertNotEqual(get_choice_cache(), None)
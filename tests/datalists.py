@@ -0,0 +1,89 @@
+from django.forms.formsets import formset_factory
+from django.template import Context, Template
+from django.test import TestCase
+
+import floppyforms as forms
+from floppyforms.datalists import get_datalist_registry
+
+
+COLORS = ['Red', 'Green', '<Blue>']
+
+
+class ColorForm(forms.Form):
+    color = forms.CharField(widget=forms.TextInput(datalist=COLORS))
+
+
+class DatalistTests(TestCase):
+    def test_without_block_every_input_has_its_datalist(self):
+        first = ColorForm(prefix='a')['color'].as_widget()
+        second = ColorForm(prefix='b')['color'].as_widget()
+        self.assertTrue('list="id_a-color_list"' in first)
+        self.assertTrue('<datalist id="id_a-color_list">' in first)
+        self.assertTrue('<datalist id="id_b-color_list">' in second)
+
+    def test_identical_datalists_are_rendered_once(self):
+        with forms.shared_datalists():
+            first = ColorForm(prefix='a')['color'].as_widget()
+            second = ColorForm(prefix='b')['color'].as_widget()
+        self.assertEqual(get_datalist_registry(), None)
+        self.assertEqual(first.count('<datalist'), 1)
+        self.assertEqual(second.count('<datalist'), 0)
+        self.assertTrue('&lt;Blue&gt;' in first)
+        list_id = first.split('list="')[1].split('"')[0]
+        self.assertTrue(list_id.startswith('datalist_'))
+        self.assertTrue('<datalist id="%s">' % list_id in first)
+        self.assertTrue('list="%s"' % list_id in second)
+
+    def test_ids_are_stable(self):
+        with forms.shared_datalists() as registry:
+            first = registry.get(['Red', 'Green'])
+        with forms.shared_datalists() as registry:
+            # An equal list that is a different object
+            second = registry.get(('Red', 'Green'))
+            other = registry.get(['Green', 'Red'])
+        self.assertEqual(first, second)
+        self.assertNotEqual(first[0], other[0])
+
+    def test_nested_blocks_share_the_registry(self):
+        with forms.shared_datalists() as outer:
+            with forms.shared_datalists() as inner:
+                self.assertTrue(inner is outer)
+            self.assertTrue(get_datalist_registry() is outer)
+
+    def test_empty_datalist(self):
+        with forms.shared_datalists():
+            rendered = forms.TextInput(datalist=[]).render(
+                'color', '', {'id': 'id_color'})
+        self.assertFalse('list=' in rendered)
+        self.assertFalse('<datalist' in rendered)
+
+    def test_formsets_share_datalists(self):
+        ColorFormSet = formset_factory(ColorForm, extra=5)
+        template = Template('{% load floppyforms %}{% form formset using '
+                            '"floppyforms/layouts/p.html" %}')
+        rendered = template.render(Context({'formset': ColorFormSet()}))
+        self.assertEqual(rendered.count('<datalist'), 1)
+        self.assertEqual(rendered.count('<option'), 3)
+        self.assertEqual(rendered.count(' list="datalist_'), 5)
+
+        rendered = ''.join(forms.iter_render(ColorFormSet()))
+        self.assertEqual(rendered.count('<datalist'), 1)
+        self.assertEqual(rendered.count(' list="datalist_'), 5)
+
+    def test_single_form_keeps_its_datalist(self):
+        template = Template('{% load floppyforms %}{% form form using '
+                            '"floppyforms/layouts/p.html" %}')
+        rendered = template.render(Context({'form': ColorForm()}))
+        self.assertTrue('<datalist id="id_color_list">' in rendered)
+
+    def test_compiled_widgets(self):
+        widget = forms.TextInput(datalist=COLORS)
+        rendered = {}
+        for compiled in (False, True):
+            with self.settings(FLOPPYFORMS_COMPILED_WIDGETS=compiled):
+                with forms.shared_datalists():
+                    rendered[compiled] = (
+                        widget.render('a', '', {'id': 'id_a'}) +
+                        widget.render('b', '', {'id': 'id_b'}))
+        self.assertEqual(rendered[True], rendered[False])
+        self.assertEqual(rendered[True].count('<datalist'), 1)
@@ -0,0 +1,222 @@
+from django.core.cache import caches
+from django.template import Context, Template, TemplateSyntaxError
+from django.test import TestCase
+from django.utils import translation
+from django.utils.translation import ugettext_lazy as _
+
+import floppyforms as forms
+from floppyforms.formcache import CSRF_PLACEHOLDER, form_cache_key
+from floppyforms.templatetags.floppyforms import FormConfig
+
+from .models import Registration
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Search')
+    scope = forms.ChoiceField(choices=(('all', 'All'), ('docs', 'Docs')))
+
+
+class FamilyForm(forms.Form):
+    member = forms.ModelChoiceField(queryset=Registration.objects.none())
+
+    def __init__(self, lastname, *args, **kwargs):
+        super(FamilyForm, self).__init__(*args, **kwargs)
+        self.fields['member'].queryset = Registration.objects.filter(
+            lastname=lastname)
+
+
+def render(source, context=None):
+    return Template('{% load floppyforms %}' + source).render(
+        Context(context or {}))
+
+
+class FormCacheTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_unbound_forms_are_cached(self):
+        source = '{% form form using "floppyforms/layouts/p.html" cache 60 %}'
+        first = render(source, {'form': SearchForm()})
+        with self.assertTemplateNotUsed('floppyforms/layouts/p.html'):
+            with self.assertTemplateNotUsed('floppyforms/input.html'):
+                second = render(source, {'form': SearchForm()})
+        self.assertEqual(first, second)
+        self.assertTrue('name="q"' in second)
+
+    def test_bound_forms_are_rendered(self):
+        source = '{% form form using "floppyforms/layouts/p.html" cache 60 %}'
+        render(source, {'form': SearchForm()})
+        with self.assertTemplateUsed('floppyforms/layouts/p.html'):
+            rendered = render(source, {'form': SearchForm({'q': 'foo'})})
+        self.assertTrue('value="foo"' in rendered)
+        with self.assertTemplateUsed('floppyforms/layouts/p.html'):
+            rendered = render(source, {'form': SearchForm({})})
+        self.assertTrue('errorlist' in rendered)
+
+    def test_csrf_token_is_not_cached(self):
+        source = ('{% form form using cache 60 %}{% csrf_token %}'
+                  '{% formrow form.q %}{% endform %}')
+        first = render(source, {'form': SearchForm(), 'csrf_token': 'abc'})
+        second = render(source, {'form': SearchForm(), 'csrf_token': 'xyz'})
+        self.assertTrue("value='abc'" in first or 'value="abc"' in first)
+        self.assertTrue("value='xyz'" in second or 'value="xyz"' in second)
+        self.assertEqual(first.replace('abc', 'xyz'), second)
+        self.assertFalse(CSRF_PLACEHOLDER in second)
+        # The page without token gets no placeholder
+        third = render(source, {'form': SearchForm()})
+        self.assertFalse('csrfmiddlewaretoken' in third)
+
+    def test_inline_layouts_are_told_apart(self):
+        first = render('{% form form using cache 60 %}first'
+                       '{% endform %}', {'form': SearchForm()})
+        second = render('{% form form using cache 60 %}second'
+                        '{% endform %}', {'form': SearchForm()})
+        self.assertEqual((first, second), ('first', 'second'))
+
+    def test_key_varies(self):
+        source = ('{% form form using "floppyforms/layouts/p.html" '
+                  'cache 60 user %}')
+        self.assertTrue('"a-q"' in render(source, {
+            'form': SearchForm(prefix='a'), 'user': 1}))
+        self.assertTrue('"b-q"' in render(source, {
+            'form': SearchForm(prefix='b'), 'user': 1}))
+        self.assertTrue('value="x"' in render(source, {
+            'form': SearchForm(initial={'q': 'x'}), 'user': 1}))
+        form = SearchForm()
+        form.fields['q'].label = 'Find'
+        self.assertTrue('Find' in render(source, {'form': form, 'user': 2}))
+
+        source = ('{% form form using "floppyforms/layouts/p.html" '
+                  'cache 60 user %}{{ user }}')
+        self.assertTrue(render(source, {'form': SearchForm(), 'user': 3})
+                        .endswith('3'))
+
+    def test_key_varies_on_queryset_and_attrs(self):
+        alice, bob = [
+            'value="%s"' % Registration.objects.create(
+                firstname=firstname, lastname=lastname,
+                username=firstname.lower(), age=30).pk
+            for firstname, lastname in (('Alice', 'Doe'), ('Bob', 'Roe'))]
+        source = ('{% form form using "floppyforms/layouts/p.html" '
+                  'cache 60 %}')
+        doe = render(source, {'form': FamilyForm('Doe')})
+        roe = render(source, {'form': FamilyForm('Roe')})
+        self.assertTrue(alice in doe and bob not in doe, doe)
+        self.assertTrue(bob in roe and alice not in roe, roe)
+        with self.assertTemplateNotUsed('floppyforms/layouts/p.html'):
+            self.assertEqual(render(source, {'form': FamilyForm('Doe')}),
+                             doe)
+
+        form = FamilyForm('Doe')
+        form.fields['member'].widget.attrs['data-family'] = 'doe'
+        self.assertTrue('data-family="doe"' in render(source, {'form': form}))
+
+        form = SearchForm()
+        form.fields['scope'].widget.choices = [('mine', 'Mine')]
+        rendered = render(source, {'form': form})
+        self.assertTrue('Mine' in rendered and 'Docs' not in rendered)
+
+    def test_key_varies_on_widget_and_form_attributes(self):
+        source = ('{% form form using "floppyforms/layouts/p.html" '
+                  'cache 60 %}')
+        render(source, {'form': SearchForm()})
+
+        form = SearchForm()
+        form.fields['q'].widget.input_type = 'search'
+        self.assertTrue('type="search"' in render(source, {'form': form}))
+        form = SearchForm()
+        form.fields['q'].widget.datalist = ['django']
+        self.assertTrue('<datalist' in render(source, {'form': form}))
+        form = SearchForm()
+        form.fields['q'].widget.template_name = 'custom.html'
+        self.assertTrue('type="custom"' in render(source, {'form': form}))
+        # Custom layouts may show the label suffix.
+        layout = 'floppyforms/layouts/p.html'
+        self.assertNotEqual(form_cache_key([SearchForm()], layout),
+                            form_cache_key([SearchForm(label_suffix='?')],
+                                           layout))
+        form = SearchForm()
+        form.required_css_class = 'needed'
+        self.assertTrue('class="needed"' in render(source, {'form': form}))
+
+        # Widget classes of the same name are told apart by their module.
+        class TextInput(forms.TextInput):
+            def get_context(self, *args, **kwargs):
+                context = super(TextInput, self).get_context(*args, **kwargs)
+                context['attrs']['data-local'] = 'yes'
+                return context
+
+        form = SearchForm()
+        form.fields['q'].widget = TextInput()
+        self.assertTrue('data-local="yes"' in render(source, {'form': form}))
+
+    def test_unstable_initial_values_are_not_cached(self):
+        class Value(object):
+            pass
+
+        source = ('{% form form using "floppyforms/layouts/p.html" '
+                  'cache 60 %}')
+        for initial in (lambda: 'now', Value()):
+            render(source, {'form': SearchForm(initial={'q': initial})})
+            form = SearchForm()
+            form.fields['q'].initial = initial
+            render(source, {'form': form})
+            with self.assertTemplateUsed('floppyforms/layouts/p.html'):
+                render(source, {'form': SearchForm(initial={'q': initial})})
+            with self.assertTemplateUsed('floppyforms/layouts/p.html'):
+                render(source, {'form': form})
+
+        # Lazy translations and model instances are fine.
+        alice = Registration.objects.create(firstname='Alice', lastname='Doe',
+                                            username='alice', age=30)
+        form = SearchForm(initial={'q': _('Search'), 'scope': alice})
+        render(source, {'form': form})
+        with self.assertTemplateNotUsed('floppyforms/layouts/p.html'):
+            render(source, {'form': form})
+
+    def test_key_varies_on_language(self):
+        source = ('{% form form using "floppyforms/layouts/p.html" '
+                  'cache 60 %}')
+        with translation.override('en'):
+            render(source, {'form': SearchForm()})
+        with translation.override('de'):
+            with self.assertTemplateUsed('floppyforms/layouts/p.html'):
+                render(source, {'form': SearchForm()})
+
+    def test_key_varies_on_formconfig(self):
+        inner = '{% form form using "floppyforms/layouts/p.html" cache 60 %}'
+        source = ('{% form form using %}'
+                  '{% formconfig field using "custom.html" %}' + inner +
+                  '{% endform %}')
+        self.assertFalse('type="custom"' in render(inner, {
+            'form': SearchForm()}))
+        self.assertTrue('type="custom"' in render(source, {
+            'form': SearchForm()}))
+
+    def test_config_cache_key(self):
+        config = FormConfig()
+        empty = config.cache_key()
+        config.configure('row_template', 'row.html')
+        self.assertNotEqual(config.cache_key(), empty)
+        config.configure('row_template', 'row.html',
+                         filter=lambda **kwargs: True)
+        self.assertEqual(config.cache_key(), None)
+
+    def test_timeout_must_be_an_integer(self):
+        with self.assertRaises(TemplateSyntaxError):
+            render('{% form form cache %}')
+        with self.assertRaises(TemplateSyntaxError):
+            render('{% form form cache timeout %}',
+                   {'form': SearchForm(), 'timeout': 'soon'})
+
+    def test_render_as(self):
+        form = SearchForm()
+        first = form._render_as('floppyforms/layouts/ul.html', cache=60)
+        with self.assertTemplateNotUsed('floppyforms/layouts/ul.html'):
+            second = SearchForm()._render_as('floppyforms/layouts/ul.html',
+                                             cache=60)
+        self.assertEqual(first, second)
+        self.assertEqual(first, SearchForm().as_ul())
+        with self.assertTemplateUsed('floppyforms/layouts/ul.html'):
+            SearchForm()._render_as('floppyforms/layouts/ul.html', cache=60,
+                                    vary_on=['other'])
@@ -104,7 +104,8 @@ class GisTests(TestCase):
         """Makes sure the MapWidget js is passed in the form media
         and a MapWidget is actually created"""
         rendered = form_instance.as_p()
-        self.assertTrue('new MapWidget(options);' in rendered, rendered)
+        self.assertTrue('MapWidget.fromOptions(options);' in rendered,
+                        rendered)
         js_path = 'floppyforms/js/MapWidget.js'
         self.assertTrue(js_path in str(form_instance.media))
 
@@ -312,3 +313,248 @@ class GisTests(TestCase):
         for invalid in invalid_geoms:
             data = {'g': GEOMETRIES()[invalid].wkt}
             self.assertFalse(GeometryForm(data=data).is_valid())
+
+    @skipUnlessInstalled('django.contrib.gis')
+    @skipUnlessGisAvailable()
+    def test_serialization_cache(self):
+        from floppyforms.gis.widgets import geometry_cache
+
+        geometry_cache.clear()
+        widget = forms.gis.PointWidget()
+        geom = GEOMETRIES()['point']
+        rendered = widget.render('p', geom)
+        self.assertTrue(geom.wkt in rendered, rendered)
+        self.assertEqual(len(geometry_cache.values), 1)
+
+        # The same geometry in another object is only serialized once.
+        widget.render('p', GEOSGeometry(geom.ewkt))
+        self.assertEqual(len(geometry_cache.values), 1)
+
+        # Only the format that the widget uses is computed.
+        self.assertEqual(list(geometry_cache.values.values()), [geom.wkt])
+
+        # Other formats, geometries and strings are cached separately.
+        widget.as_geojson = True
+        rendered = widget.render('p', geom)
+        self.assertTrue(geom.geojson in rendered, rendered)
+        widget.as_geojson = False
+        widget.render('p', GEOSGeometry('SRID=4326;POINT(1 2)'))
+        widget.render('p', geom.wkt)
+        self.assertEqual(len(geometry_cache.values), 4)
+
+        # Values of the wrong type are not rendered.
+        rendered = widget.render('p', GEOMETRIES()['linestring'])
+        self.assertFalse('LINESTRING' in rendered, rendered)
+
+    @skipUnlessInstalled('django.contrib.gis')
+    @skipUnlessGisAvailable()
+    def test_serialization_cache_is_bounded(self):
+        from floppyforms.gis.widgets import GeometryCache
+
+        cache = GeometryCache()
+        cache.maxsize = 2
+        widget = forms.gis.PointWidget()
+        for x in range(4):
+            cache.get(widget, GEOSGeometry('SRID=4326;POINT(%d 0)' % x))
+        self.assertEqual(len(cache.values), 2)
+        cache.clear()
+        self.assertEqual(len(cache.values), 0)
+
+    def test_round_coordinates(self):
+        from floppyforms.gis.widgets import round_coordinates
+
+        self.assertEqual(
+            round_coordinates('SRID=4326;LINESTRING(1.123456 -0.0001, '
+                              '2 3.5e-3, 10.10 4)', 2),
+            'SRID=4326;LINESTRING(1.12 0, 2 0, 10.1 4)')
+        self.assertEqual(
+            round_coordinates('{"type": "Point", '
+                              '"coordinates": [9.052734375, 42.45117]}', 3),
+            '{"type": "Point", "coordinates": [9.053, 42.451]}')
+
+    def test_reduced_value_from_datadict(self):
+        from floppyforms.gis.widgets import PointWidget, ReducedGeometry
+
+        widget = PointWidget()
+        data = {'p': 'POINT(1 2)'}
+        self.assertFalse(isinstance(widget.value_from_datadict(data, {}, 'p'),
+                                    ReducedGeometry))
+        data['p_reduced'] = '1'
+        value = widget.value_from_datadict(data, {}, 'p')
+        self.assertTrue(isinstance(value, ReducedGeometry))
+        self.assertEqual(value, 'POINT(1 2)')
+
+    def test_reduced_only_for_rejecting_fields(self):
+        from floppyforms.gis.fields import GeometryField
+        from floppyforms.gis.widgets import GeometryWidget
+
+        widget = GeometryWidget(attrs={'coordinate_precision': 1})
+        self.assertTrue(widget.is_reduced)
+        self.assertTrue(forms.CharField(widget=widget).widget.is_reduced)
+
+        # With a geometry_url, fields that would save a reduced value
+        # get the full geometry.
+        widget = GeometryWidget(attrs={'coordinate_precision': 1,
+                                       'geometry_url': '/geometry/1/'})
+        self.assertFalse(widget.is_reduced)
+        self.assertFalse(forms.CharField(widget=widget).widget.is_reduced)
+        field = GeometryField(widget=widget)
+        self.assertTrue(field.widget.is_reduced)
+
+        class GeometryForm(forms.Form):
+            g = GeometryField(widget=widget)
+
+        self.assertTrue(GeometryForm().fields['g'].widget.is_reduced)
+
+    @skipUnlessInstalled('django.contrib.gis')
+    @skipUnlessGisAvailable()
+    def test_reduced_geometry(self):
+        class PolygonWidget(forms.gis.PolygonWidget):
+            coordinate_precision = 1
+            simplify_tolerance = 0.5
+
+        polygon = GEOSGeometry(
+            'SRID=4326;POLYGON((0 0, 0.1234 0.01, 10 0, 10 10, 0 10, 0 0))')
+        widget = PolygonWidget()
+        rendered = widget.render('p', polygon)
+        self.assertFalse('0.1234' in rendered, rendered)
+        self.assertTrue('POLYGON ((0 0, 10 0, 10 10, 0 10, 0 0))' in rendered,
+                        rendered)
+        # Without a geometry_url, the reduced value is submitted.
+        self.assertFalse('p_reduced' in rendered, rendered)
+        self.assertTrue('"geometry_url": null' in rendered, rendered)
+
+        widget = PolygonWidget(attrs={'geometry_url': '/geometry/1/'})
+        self.assertTrue('0.1234' in widget.render('p', polygon))
+        widget = forms.gis.PolygonField(widget=widget).widget
+        rendered = widget.render('p', polygon)
+        self.assertTrue('name="p_reduced"' in rendered, rendered)
+        self.assertTrue('"geometry_url": "/geometry/1/"' in rendered,
+                        rendered)
+        self.assertFalse('p_reduced' in widget.render('p', None))
+
+        class PolygonForm(forms.Form):
+            p = forms.gis.PolygonField(widget=PolygonWidget)
+
+        form = PolygonForm({'p': polygon.wkt, 'p_reduced': '1'})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['p'][0],
+                         'The full geometry could not be loaded, please '
+                         'try again.')
+        self.assertTrue(PolygonForm({'p': polygon.wkt}).is_valid())
+
+    @skipUnlessInstalled('django.contrib.gis')
+    @skipUnlessGisAvailable()
+    def test_geometry_view(self):
+        from django.test import RequestFactory
+        from floppyforms.gis.views import GeometryView
+
+        class Country(object):
+            boundary = GEOSGeometry(
+                'SRID=4326;POLYGON((0 0, 0.1234 0.01, 10 0, 10 10, 0 0))')
+
+        class CountryGeometryView(GeometryView):
+            geometry_field = 'boundary'
+
+            def get_object(self):
+                return Country()
+
+        view = CountryGeometryView.as_view()
+        response = view(RequestFactory().get('/'))
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertEqual(response.content.decode('utf-8'),
+                         Country.boundary.wkt)
+
+        view = CountryGeometryView.as_view(as_geojson=True)
+        response = view(RequestFactory().get('/'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content.decode('utf-8'),
+                         Country.boundary.geojson)
+
+    def test_lazy_map_media(self):
+        class OsmPointWidget(forms.gis.PointWidget, forms.gis.BaseOsmWidget):
+            pass
+
+        media = str(OsmPointWidget().media)
+        self.assertTrue(media.index('floppyforms/js/LazyMaps.js') <
+                        media.index('floppyforms/js/MapWidget.js'), media)
+
+    def test_map_options(self):
+        from django.template.loader import render_to_string
+        from floppyforms.gis.widgets import BaseOsmWidget
+
+        widget = BaseOsmWidget()
+        options = widget.get_map_options({
+            'attrs': {'id': 'id_p'}, 'geom_type': 'Point',
+            'geometry_url': None, 'module': 'map_p', 'name': 'p',
+            'reduced': False})
+        self.assertEqual(options['map_options']['maxExtent'],
+                         [-20037508, -20037508, 20037508, 20037508])
+        self.assertEqual(options['base_layer'], 'osm')
+        self.assertEqual(options['map_srid'], 900913)
+
+        # Eager maps are created from the same options as lazy ones.
+        context = {'attrs': {'id': 'id_p'}, 'module': 'map_p', 'name': 'p',
+                   'map_options_json': '{"id": "id_p"}'}
+        rendered = render_to_string('floppyforms/gis/osm.html', context)
+        self.assertTrue('var options = {"id": "id_p"};' in rendered,
+                        rendered)
+        self.assertTrue('MapWidget.fromOptions(options);' in rendered,
+                        rendered)
+        self.assertFalse('maxExtend' in rendered, rendered)
+        self.assertFalse('data-map-control' in rendered, rendered)
+
+        # Templates extending osm.html can still add to the options.
+        rendered = render_to_string('gis/custom_osm.html', context)
+        self.assertTrue('var options = {"id": "id_p"};' in rendered,
+                        rendered)
+        self.assertTrue("options['point_zoom'] = 10;" in rendered, rendered)
+        self.assertTrue(rendered.index("options['point_zoom']") <
+                        rendered.index('MapWidget.fromOptions'), rendered)
+
+        # The clear link of lazy maps is hidden until the map exists.
+        context['lazy_map'] = True
+        rendered = render_to_string('floppyforms/gis/osm.html', context)
+        self.assertFalse('<script' in rendered, rendered)
+        self.assertTrue('data-map-control="id_p_map" style="display: none"'
+                        in rendered, rendered)
+
+    @skipUnlessInstalled('django.contrib.gis')
+    @skipUnlessGisAvailable()
+    def test_lazy_map(self):
+        import json
+        from django.utils.html import escape
+
+        class OsmPointWidget(forms.gis.PointWidget, forms.gis.BaseOsmWidget):
+            pass
+
+        geom = GEOMETRIES()['point']
+        widget = OsmPointWidget()
+        context = widget.get_context('p', geom, {'id': 'id_p'})
+        rendered = widget.render('p', geom, {'id': 'id_p'})
+        self.assertTrue('MapWidget.fromOptions(options);' in rendered,
+                        rendered)
+        self.assertTrue(context['map_options_json'] in rendered, rendered)
+        self.assertFalse('data-map-widget' in rendered, rendered)
+
+        widget = OsmPointWidget(attrs={'lazy_map': True})
+        context = widget.get_context('p', geom, {'id': 'id_p'})
+        options = json.loads(context['map_options_json'])
+        self.assertEqual(options['geom_type'], 'Point')
+        self.assertEqual(options['id'], 'id_p')
+        self.assertEqual(options['map_id'], 'id_p_map')
+        self.assertEqual(options['module'], 'map_p')
+        self.assertEqual(options['base_layer'], 'osm')
+        self.assertEqual(options['map_srid'], 900913)
+        self.assertTrue(options['is_point'])
+
+        rendered = widget.render('p', geom, {'id': 'id_p'})
+        self.assertFalse('MapWidget.fromOptions' in rendered, rendered)
+        self.assertTrue('data-map-widget="MapWidget"' in rendered, rendered)
+        self.assertTrue(
+            'data-map-options="%s"' % escape(context['map_options_json'])
+            in rendered, rendered)
+        self.assertTrue('floppyforms-map-preview' in rendered, rendered)
+        self.assertTrue('data-map-control="id_p_map"' in rendered, rendered)
+        # The value is still submitted without the map.
+        self.assertTrue('<textarea' in rendered, rendered)
@@ -0,0 +1,260 @@
+from django.forms.formsets import formset_factory
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import unittest
+
+try:
+    import jinja2
+    from jinja2.exceptions import TemplateRuntimeError, TemplateSyntaxError
+except ImportError:
+    jinja2 = None
+
+try:
+    from django.template import engines
+except ImportError:
+    # Django < 1.8 has no multiple template engines.
+    engines = None
+
+import floppyforms as forms
+from floppyforms import loader
+
+
+JINJA2_TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'environment': 'floppyforms.jinja.environment',
+        },
+    },
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'APP_DIRS': True,
+    },
+]
+
+
+class RegistrationForm(forms.Form):
+    firstname = forms.CharField(help_text='Your first name.')
+    email = forms.EmailField()
+    country = forms.ChoiceField(choices=(('de', 'Germany'),
+                                         ('fr', 'France')))
+    gender = forms.ChoiceField(choices=(('f', 'female'), ('m', 'male')),
+                               widget=forms.RadioSelect)
+    birthday = forms.DateField(widget=forms.SelectDateWidget,
+                               required=False)
+    comment = forms.CharField(widget=forms.Textarea, required=False,
+                              label='Comment?')
+    token = forms.CharField(widget=forms.HiddenInput)
+
+
+def render_all(render):
+    """
+    Returns the output of ``render()`` with the Django template engine and
+    with the Jinja2 engine.
+    """
+    django_output = render()
+    with override_settings(TEMPLATES=JINJA2_TEMPLATES,
+                           FLOPPYFORMS_TEMPLATE_ENGINE='jinja2'):
+        jinja2_output = render()
+    return django_output, jinja2_output
+
+
+@unittest.skipIf(jinja2 is None or engines is None,
+                 'Jinja2 or Django 1.8 is not available')
+@override_settings(TEMPLATES=JINJA2_TEMPLATES,
+                   FLOPPYFORMS_TEMPLATE_ENGINE='jinja2')
+class Jinja2Tests(TestCase):
+    def render(self, source, context=None):
+        return engines['jinja2'].from_string(source).render(context or {})
+
+    def test_widget_templates(self):
+        template = loader.get_widget_template('floppyforms/input.html')
+        self.assertTrue(template.template.filename.endswith(
+            'jinja2/floppyforms/input.html'))
+
+        # Templates that only exist for the Django engine are found there.
+        template = loader.get_widget_template('custom.html')
+        self.assertFalse(hasattr(template.template, 'filename'))
+
+    def test_render_marks_autoescaped_output_safe(self):
+        from django.template.backends.jinja2 import Jinja2
+        from django.utils.safestring import SafeData
+
+        template = engines['jinja2'].from_string('<b>{{ value }}</b>')
+        rendered = loader.render(template, {'value': '<i>'})
+        self.assertEqual(rendered, '<b>&lt;i&gt;</b>')
+        self.assertTrue(isinstance(rendered, SafeData))
+
+        engine = Jinja2({'NAME': 'raw', 'DIRS': [], 'APP_DIRS': False,
+                         'OPTIONS': {'autoescape': False}})
+        template = engine.from_string('<b>{{ value }}</b>')
+        rendered = loader.render(template, {'value': '<i>'})
+        self.assertEqual(rendered, '<b><i></b>')
+        self.assertFalse(isinstance(rendered, SafeData))
+
+    def test_render_form_marks_autoescaped_output_safe(self):
+        from floppyforms.jinja import environment, render_form
+        from jinja2 import PackageLoader
+        from markupsafe import Markup
+
+        for autoescape in (True, False):
+            env = environment(autoescape=autoescape, loader=PackageLoader(
+                'floppyforms', 'jinja2'))
+            rendered = render_form(env, RegistrationForm(),
+                                   'floppyforms/layouts/p.html')
+            self.assertTrue('name="firstname"' in rendered)
+            self.assertEqual(isinstance(rendered, Markup), autoescape)
+
+            template = env.from_string('{% widget form.email %}')
+            rendered = template.render(form=RegistrationForm())
+            self.assertTrue('name="email"' in rendered)
+
+    def test_formconfig_popped_on_errors(self):
+        from django.template import TemplateDoesNotExist
+        from floppyforms.jinja import CONFIG_CONTEXT_VAR
+        from floppyforms.templatetags.floppyforms import FormConfig
+        from jinja2 import TemplateNotFound
+
+        config = FormConfig()
+        for source in ('{% form form using "missing.html" %}',
+                       '{% formrow form.email using "missing.html" %}',
+                       '{% formfield form.email using "missing.html" %}'):
+            with self.assertRaises((TemplateNotFound, TemplateDoesNotExist)):
+                self.render(source, {'form': RegistrationForm(),
+                                     CONFIG_CONTEXT_VAR: config})
+            self.assertEqual(len(config.dicts), 1)
+
+    def test_layout_renderer(self):
+        with self.assertTemplateNotUsed('floppyforms/layouts/p.html'):
+            RegistrationForm().as_p()
+
+    def test_form_tag(self):
+        form = RegistrationForm()
+        rendered = self.render(
+            '{% form form using "floppyforms/layouts/ul.html" %}',
+            {'form': form})
+        self.assertHTMLEqual(rendered, form.as_ul())
+
+    def test_form_block(self):
+        form = RegistrationForm()
+        rendered = self.render('''
+            {% form form using %}
+                {% formconfig row using "floppyforms/rows/li.html" %}
+                {% formconfig field using "floppyforms/textarea.html" for "email" %}
+                {% formrow form.firstname %}
+                {% formfield form.email %}
+                {% formrow form.firstname using "floppyforms/rows/p.html" with label="Name" %}
+            {% endform %}''', {'form': form})
+        self.assertHTMLEqual(rendered, '''
+            <li><label for="id_firstname">Firstname:</label>
+            <input type="text" name="firstname" id="id_firstname" required>
+            <span class="helptext">Your first name.</span></li>
+            <textarea name="email" id="id_email" required></textarea>
+            <p><label for="id_firstname">Name:</label>
+            <input type="text" name="firstname" id="id_firstname" required>
+            <span class="helptext">Your first name.</span></p>''')
+
+    def test_formconfig_field_for(self):
+        form = RegistrationForm()
+        rendered = self.render('''
+            {% form form using %}
+                {% formconfig field using "floppyforms/textarea.html" for form.firstname %}
+                {% formfield form.firstname %}
+                {% formfield form.email %}
+            {% endform %}''', {'form': form})
+        self.assertHTMLEqual(rendered, '''
+            <textarea name="firstname" id="id_firstname" required></textarea>
+            <input type="email" name="email" id="id_email" required>''')
+
+    def test_formconfig_is_scoped(self):
+        form = RegistrationForm()
+        rendered = self.render('''
+            {% form form using %}
+                {% form form using %}
+                    {% formconfig field using "floppyforms/textarea.html" %}
+                {% endform %}
+                {% formfield form.firstname %}
+            {% endform %}''', {'form': form})
+        self.assertHTMLEqual(rendered, '''
+            <input type="text" name="firstname" id="id_firstname" required>''')
+
+    def test_formconfig_outside_form(self):
+        with self.assertRaises(TemplateRuntimeError):
+            self.render('{% formconfig row using "floppyforms/rows/p.html" %}')
+
+    def test_syntax_errors(self):
+        for source in ('{% formconfig foo using "row.html" %}',
+                       '{% formconfig row %}',
+                       '{% form form with a=1 %}',
+                       '{% formfield %}',
+                       '{% formrow field with %}',
+                       '{% widget a b %}'):
+            with self.assertRaises(TemplateSyntaxError):
+                self.render(source)
+
+    def test_widget_tag(self):
+        form = RegistrationForm()
+        rendered = self.render('{% widget form.email %}', {'form': form})
+        self.assertHTMLEqual(rendered, '''
+            <input type="email" name="email" id="id_email" required>''')
+
+    def test_formset(self):
+        FormSet = formset_factory(RegistrationForm, extra=2)
+        formset = FormSet()
+        rendered = self.render(
+            '{% form formset using "floppyforms/layouts/p.html" %}',
+            {'formset': formset})
+        self.assertEqual(rendered.count('<p'), 12)
+        self.assertTrue('name="form-1-email"' in rendered)
+
+    def test_formset_shares_datalists(self):
+        class ColorForm(forms.Form):
+            color = forms.CharField(widget=forms.TextInput(
+                datalist=['Red', 'Green']))
+
+        FormSet = formset_factory(ColorForm, extra=3)
+        rendered = self.render(
+            '{% form formset using "floppyforms/layouts/p.html" %}',
+            {'formset': FormSet()})
+        self.assertEqual(rendered.count('<datalist'), 1)
+        self.assertEqual(rendered.count(' list="datalist_'), 3)
+
+
+@unittest.skipIf(jinja2 is None or engines is None,
+                 'Jinja2 or Django 1.8 is not available')
+class Jinja2OutputTests(TestCase):
+    """
+    The Jinja2 templates render the same HTML as the Django templates.
+    """
+    def test_layouts(self):
+        for bound in (False, True):
+            if bound:
+                form = RegistrationForm({'email': 'invalid', 'token': ''})
+            else:
+                form = RegistrationForm()
+            for method in ('as_p', 'as_ul', 'as_table', '__str__'):
+                django_output, jinja2_output = render_all(
+                    getattr(form, method))
+                self.assertHTMLEqual(django_output, jinja2_output)
+
+    def test_widgets(self):
+        widgets = [
+            (forms.TextInput(), 'text'),
+            (forms.TextInput(datalist=['a', 'b']), 'a'),
+            (forms.Textarea(), 'some <text>'),
+            (forms.Select(choices=(('a', 'A'), ('Group', (('b', 'B'),)))),
+             'b'),
+            (forms.SelectMultiple(choices=(('a', 'A'), ('b', 'B'))),
+             ['a', 'b']),
+            (forms.RadioSelect(choices=(('a', 'A'), ('b', 'B'))), 'a'),
+            (forms.CheckboxSelectMultiple(choices=(('a', 'A'), ('b', 'B'))),
+             ['b']),
+            (forms.ClearableFileInput(), None),
+            (forms.SelectDateWidget(years=(2014, 2015)), '2014-06-05'),
+            (forms.MultipleHiddenInput(), ['1', '2']),
+        ]
+        for widget, value in widgets:
+            django_output, jinja2_output = render_all(
+                lambda: widget.render('field', value, attrs={'id': 'id_f'}))
+            self.assertHTMLEqual(django_output, jinja2_output)
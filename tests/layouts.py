@@ -423,6 +423,40 @@ class UlLayoutTests(TestCase):
         """)
 
 
+class IterRenderTests(TestCase):
+    def test_form_is_rendered_in_one_chunk(self):
+        form = ShortForm()
+        chunks = list(form.iter_render('floppyforms/layouts/p.html'))
+        self.assertEqual(len(chunks), 1)
+        self.assertHTMLEqual(chunks[0], form.as_p())
+
+    def test_formset_yields_one_chunk_per_form(self):
+        ShortFormset = formset_factory(form=ShortForm, extra=3)
+        formset = ShortFormset()
+        chunks = list(forms.iter_render(formset,
+                                        'floppyforms/layouts/table.html'))
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue('name="form-0-name"' in chunks[0])
+        self.assertFalse('name="form-1-name"' in chunks[0])
+        self.assertTrue('name="form-2-name"' in chunks[2])
+        rendered = render(
+            """{% form formset using "floppyforms/layouts/table.html" %}""",
+            {'formset': formset})
+        self.assertHTMLEqual(''.join(chunks), rendered)
+
+    def test_chunks_are_rendered_lazily(self):
+        ShortFormset = formset_factory(form=ShortForm, extra=2)
+        formset = ShortFormset()
+        chunks = forms.iter_render(formset)
+        self.assertTrue('name="form-0-name"' in next(chunks))
+        self.assertTrue('name="form-1-name"' in next(chunks))
+        self.assertRaises(StopIteration, next, chunks)
+
+    def test_empty_list(self):
+        self.assertEqual(
+            ''.join(forms.iter_render([])).strip(), '')
+
+
 class TemplateStringIfInvalidTests(TestCase):
     '''
     Regression tests for issue #37.
@@ -0,0 +1,188 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from importlib import import_module
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import unittest
+from django.utils.six import StringIO
+from django.utils.six.moves import reload_module
+
+try:
+    from django.template import engines
+except ImportError:
+    # Django < 1.8 has no multiple template engines.
+    engines = None
+
+import floppyforms as forms
+from floppyforms.choices import choice_cache
+from floppyforms.loader import TemplateCache, template_cache
+from floppyforms.precompiled import (collect_template_names,
+                                     preload_templates, warm_templates)
+
+
+class TemplateCacheTests(TestCase):
+    def setUp(self):
+        template_cache.clear()
+
+    def test_hits_and_misses(self):
+        cache = TemplateCache()
+        template = cache.get_template('floppyforms/input.html')
+        self.assertEqual(cache.info().misses, 1)
+        self.assertEqual(cache.info().hits, 0)
+
+        self.assertTrue(cache.get_template('floppyforms/input.html') is
+                        template)
+        self.assertEqual(cache.info().misses, 1)
+        self.assertEqual(cache.info().hits, 1)
+        self.assertEqual(cache.info().currsize, 1)
+
+        cache.clear()
+        self.assertEqual(cache.info(), (0, 0, cache.maxsize, 0))
+
+    def test_cache_is_bounded(self):
+        cache = TemplateCache(maxsize=2)
+        cache.get_template('floppyforms/input.html')
+        cache.get_template('floppyforms/select.html')
+        # Makes input.html the most recently used template.
+        cache.get_template('floppyforms/input.html')
+        cache.get_template('floppyforms/textarea.html')
+        self.assertEqual(cache.info().currsize, 2)
+        self.assertEqual(
+            sorted(name for name, using in cache.templates),
+            ['floppyforms/input.html', 'floppyforms/textarea.html'])
+
+    def test_widget_rendering_uses_cache(self):
+        widget = forms.TextInput()
+        widget.render('text', 'value')
+        misses = template_cache.info().misses
+        widget.render('text', 'value')
+        forms.TextInput().render('other', '')
+        self.assertEqual(template_cache.info().misses, misses)
+        self.assertTrue(template_cache.info().hits >= 2)
+
+    def test_template_changes_are_picked_up_in_debug_mode(self):
+        template_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, template_dir)
+        path = os.path.join(template_dir, 'changing.html')
+        with open(path, 'w') as template_file:
+            template_file.write('first')
+
+        cache = TemplateCache()
+        with self.settings(TEMPLATE_DIRS=(template_dir,), DEBUG=True):
+            template = cache.get_template('changing.html')
+            self.assertEqual(template.render({}), 'first')
+
+            with open(path, 'w') as template_file:
+                template_file.write('second')
+            mtime = time.time() + 10
+            os.utime(path, (mtime, mtime))
+            template = cache.get_template('changing.html')
+            self.assertEqual(template.render({}), 'second')
+            self.assertEqual(cache.info().misses, 2)
+
+
+@unittest.skipIf(engines is None, 'Django 1.8 is required')
+class PrecompiledTemplatesTests(TestCase):
+    def setUp(self):
+        template_cache.clear()
+        self.addCleanup(template_cache.clear)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def compile(self, *args):
+        path = os.path.join(self.directory, 'compiled_templates.py')
+        call_command('floppyforms_compile', path, *args, stdout=StringIO())
+        sys.path.insert(0, self.directory)
+        self.addCleanup(sys.path.remove, self.directory)
+        self.addCleanup(sys.modules.pop, 'compiled_templates', None)
+        return import_module('compiled_templates')
+
+    def test_collect_template_names(self):
+        names = collect_template_names(extra=['custom.html'])
+        for name in ('floppyforms/input.html', 'floppyforms/select.html',
+                     'floppyforms/rows/tr.html', 'floppyforms/layouts/p.html',
+                     'floppyforms/gis/osm.html', 'custom.html'):
+            self.assertTrue(name in names, name)
+
+    def test_preload(self):
+        module = self.compile('--template', 'custom.html')
+        self.assertTrue(('custom.html', 'django') in module.TEMPLATES)
+        self.assertEqual(preload_templates(module), len(module.TEMPLATES))
+
+        class RegistrationForm(forms.Form):
+            name = forms.CharField()
+            comment = forms.CharField(widget=forms.Textarea)
+
+        self.assertHTMLEqual(RegistrationForm().as_p(), """
+            <p><label for="id_name">Name:</label>
+            <input type="text" name="name" id="id_name" required></p>
+            <p><label for="id_comment">Comment:</label>
+            <textarea name="comment" id="id_comment" cols="40" rows="10"
+            required></textarea></p>
+        """)
+        self.assertEqual(template_cache.info().misses, 0)
+
+    def test_changed_templates_are_skipped(self):
+        module = self.compile()
+        entry = module.TEMPLATES[('floppyforms/input.html', 'django')]
+        entry['sha1'] = '0' * 40
+        self.assertEqual(preload_templates(module),
+                         len(module.TEMPLATES) - 1)
+        forms.TextInput().render('name', '')
+        self.assertEqual(template_cache.info().misses, 1)
+
+    def test_setting(self):
+        self.assertEqual(preload_templates(), 0)
+        module = self.compile()
+        with self.settings(
+                FLOPPYFORMS_PRECOMPILED_TEMPLATES='compiled_templates'):
+            self.assertEqual(preload_templates(), len(module.TEMPLATES))
+
+    def test_warm_templates(self):
+        self.assertTrue(warm_templates() >= 20)
+        self.assertTrue(('floppyforms/layouts/table.html', None) in
+                        template_cache.templates)
+        forms.TextInput().render('name', '')
+        self.assertEqual(template_cache.info().misses,
+                         template_cache.info().currsize)
+
+    def test_preload_on_startup(self):
+        from django.apps import apps
+        with self.settings(FLOPPYFORMS_PRELOAD_TEMPLATES=True):
+            apps.get_app_config('floppyforms').ready()
+        for thread in threading.enumerate():
+            if thread.name == 'floppyforms-preload':
+                thread.join()
+        self.assertTrue(('floppyforms/input.html', None) in
+                        template_cache.templates)
+
+
+class ImportTests(TestCase):
+    def test_optional_modules_are_imported_lazily(self):
+        import subprocess
+
+        modules = ['jinja2', 'django.core.cache']
+        if sys.version_info >= (3, 7):
+            # Older versions have no module __getattr__ and import gis.
+            modules.append('floppyforms.gis')
+        code = ('import sys, floppyforms; print(sorted(name for name in '
+                '%r if name in sys.modules))' % (modules,))
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         env=dict(os.environ,
+                                                  PYTHONPATH=os.pathsep.join(
+                                                      sys.path)))
+        self.assertEqual(output.decode('ascii').strip(), '[]')
+
+    def test_reload(self):
+        module = sys.modules['floppyforms']
+        reloaded = reload_module(forms)
+        self.assertTrue(sys.modules['floppyforms'] is module)
+        self.assertTrue(reloaded is module)
+        self.assertTrue(reloaded.choice_cache is choice_cache)
+        with self.assertRaises(AttributeError):
+            reloaded.missing
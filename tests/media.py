@@ -0,0 +1,128 @@
+from django.forms.formsets import formset_factory
+from django.test import TestCase
+from django.test.utils import override_settings
+
+import floppyforms as forms
+from floppyforms.media import CollectedMedia, form_media_cache
+
+
+class MapInput(forms.TextInput):
+    class Media:
+        js = ('map.js', 'shared.js')
+        css = {'all': ('map.css',)}
+
+
+class ColorInput(forms.TextInput):
+    class Media:
+        js = ('shared.js', 'color.js')
+        css = {'all': ('map.css', 'color.css'), 'print': ('print.css',)}
+
+
+class MapForm(forms.Form):
+    first = forms.CharField(widget=MapInput)
+    second = forms.CharField(widget=MapInput)
+    color = forms.CharField(widget=ColorInput)
+    name = forms.CharField()
+
+
+class MediaForm(MapForm):
+    class Media:
+        js = ('form.js',)
+
+
+class MediaTests(TestCase):
+    def setUp(self):
+        form_media_cache.clear()
+
+    def test_form_media(self):
+        media = MapForm().media
+        self.assertTrue(isinstance(media, CollectedMedia))
+        self.assertEqual(media._js, ['map.js', 'shared.js', 'color.js'])
+        self.assertEqual(media._css, {'all': ['map.css', 'color.css'],
+                                      'print': ['print.css']})
+
+        # The rendered tags are the ones Django renders.
+        expected = (MapInput().media + ColorInput().media).render()
+        self.assertHTMLEqual(media.render(), expected)
+
+    def test_cached_per_form_class(self):
+        media = MapForm().media
+        self.assertEqual(len(form_media_cache.media), 1)
+        self.assertEqual(media.render(), str(MapForm().media))
+        self.assertEqual(len(form_media_cache.media), 1)
+
+        # Every form gets its own copy.
+        self.assertFalse(MapForm().media is media)
+        media.add_js(['added.js'])
+        self.assertTrue('added.js' in str(media))
+        self.assertEqual(MapForm().media._js,
+                         ['map.js', 'shared.js', 'color.js'])
+
+        # Forms that change their widgets get their own media.
+        form = MapForm()
+        form.fields['name'].widget = ColorInput()
+        self.assertFalse(form.media is media)
+
+        with override_settings(STATIC_URL='/other/'):
+            self.assertTrue('/other/map.js' in str(MapForm().media))
+
+    def test_instance_media(self):
+        class WrapperInput(forms.TextInput):
+            def __init__(self, widget):
+                super(WrapperInput, self).__init__()
+                self.widget = widget
+
+            @property
+            def media(self):
+                return self.widget.media
+
+        class WrapperForm(forms.Form):
+            wrapped = forms.CharField(widget=WrapperInput(MapInput()))
+
+        form = WrapperForm()
+        self.assertEqual(form.media._js, ['map.js', 'shared.js'])
+        form = WrapperForm()
+        form.fields['wrapped'].widget = WrapperInput(ColorInput())
+        self.assertEqual(form.media._js, ['shared.js', 'color.js'])
+        self.assertEqual(len(form_media_cache.media), 0)
+
+        # Subclasses with a Media class depend on the instance as well.
+        class SubWrapperInput(WrapperInput):
+            class Media:
+                js = ('sub.js',)
+
+        form = WrapperForm()
+        form.fields['wrapped'].widget = SubWrapperInput(ColorInput())
+        self.assertEqual(form.media._js, ['shared.js', 'color.js', 'sub.js'])
+        self.assertEqual(len(form_media_cache.media), 0)
+
+    def test_multiwidget_media(self):
+        class MapColorWidget(forms.MultiWidget):
+            def __init__(self):
+                super(MapColorWidget, self).__init__([MapInput(),
+                                                      ColorInput()])
+
+        class MultiForm(forms.Form):
+            both = forms.CharField(widget=MapColorWidget)
+
+        self.assertEqual(MultiForm().media._js,
+                         ['map.js', 'shared.js', 'color.js'])
+        self.assertEqual(len(form_media_cache.media), 1)
+
+    def test_form_class_media(self):
+        media = MediaForm().media
+        self.assertEqual(media._js,
+                         ['map.js', 'shared.js', 'color.js', 'form.js'])
+
+    def test_collect_media(self):
+        FormSet = formset_factory(MapForm, extra=20)
+        media = forms.collect_media(FormSet(), MediaForm(), ColorInput(),
+                                    forms.Media(js=('extra.js',)))
+        self.assertEqual(media._js, ['map.js', 'shared.js', 'color.js',
+                                     'form.js', 'extra.js'])
+        self.assertEqual(media._css['all'], ['map.css', 'color.css'])
+
+        # Formsets without forms use the empty form.
+        FormSet = formset_factory(MapForm, extra=0)
+        media = forms.collect_media(FormSet())
+        self.assertEqual(media._js, ['map.js', 'shared.js', 'color.js'])
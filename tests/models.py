@@ -8,6 +8,11 @@ class Registration(models.Model):
     age = models.IntegerField()
 
 
+class Membership(models.Model):
+    registration = models.ForeignKey(Registration)
+    club = models.CharField(max_length=50)
+
+
 class AllFields(models.Model):
     boolean = models.BooleanField(default=False)
     char = models.CharField(max_length=50)
@@ -0,0 +1,177 @@
+import json
+
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from django.utils import unittest
+
+import floppyforms as forms
+from floppyforms.partial import clean_fields
+from floppyforms.views import FieldValidationView
+
+from .jinja import JINJA2_TEMPLATES, jinja2
+
+
+class SignupForm(forms.Form):
+    username = forms.CharField(max_length=5)
+    email = forms.EmailField(help_text='Your <email>')
+    color = forms.ChoiceField(choices=(('r', 'Red'), ('g', 'Green')))
+    token = forms.CharField(widget=forms.HiddenInput, required=False)
+
+    def clean_username(self):
+        if self.cleaned_data['username'] == 'admin':
+            raise forms.ValidationError('Taken')
+        return self.cleaned_data['username'].upper()
+
+    def clean(self):
+        raise forms.ValidationError('Form clean called')
+
+
+class SignupView(FieldValidationView):
+    form_class = SignupForm
+
+
+class RenderFieldsTests(TestCase):
+    layouts = ('floppyforms/layouts/p.html', 'floppyforms/layouts/ul.html',
+               'floppyforms/layouts/table.html')
+
+    def test_rows_from_layout(self):
+        data = {'username': 'toolong', 'email': 'invalid', 'color': 'r'}
+        for layout in self.layouts:
+            html = SignupForm(data)._render_as(layout)
+            fragments = SignupForm(data).render_fields(['email', 'username'],
+                                                       layout)
+            self.assertEqual(list(fragments), ['email', 'username'])
+            for name, row in fragments.items():
+                self.assertTrue(row.strip())
+                self.assertTrue(row in html, (layout, name, row))
+            self.assertTrue('name="email"' in fragments['email'])
+            self.assertFalse('name="username"' in fragments['email'])
+            self.assertTrue('Your &lt;email&gt;' in fragments['email'])
+
+        fragments = SignupForm().render_fields(['email'],
+                                               'floppyforms/layouts/p.html')
+        self.assertTrue(fragments['email'].strip().startswith('<p>'))
+        fragments = SignupForm().render_fields(['email'],
+                                               'floppyforms/layouts/ul.html')
+        self.assertTrue(fragments['email'].strip().startswith('<li>'))
+
+    def test_other_rows_not_rendered(self):
+        form = SignupForm()
+        with self.assertTemplateNotUsed('floppyforms/select.html'):
+            form.render_fields(['username'])
+        with self.assertTemplateUsed('floppyforms/select.html'):
+            form.render_fields(['color'])
+
+    def test_last_row_has_hidden_fields(self):
+        form = SignupForm(initial={'token': 'abc'})
+        row = form.render_fields(['color'])['color']
+        self.assertTrue('name="token"' in row)
+        self.assertTrue('value="abc"' in row)
+        self.assertEqual(form.render_fields(['token'])['token'],
+                         form['token'].as_hidden())
+
+    def test_widgets(self):
+        form = SignupForm({'username': 'bob'})
+        fragments = form.render_fields(['username', 'color'], widgets=True)
+        self.assertHTMLEqual(
+            fragments['username'],
+            '<input type="text" name="username" id="id_username" '
+            'value="bob" maxlength="5" required>')
+        self.assertTrue(fragments['color'].startswith('<select'))
+
+    def test_formconfig_of_layout(self):
+        form = SignupForm()
+        fragments = form.render_fields(['email'], 'partial_layout.html')
+        self.assertHTMLEqual(fragments['email'], '<div>email</div>')
+
+    def test_unknown_field(self):
+        self.assertRaises(KeyError, SignupForm().render_fields, ['nope'])
+
+    def test_full_render_afterwards(self):
+        form = SignupForm()
+        form.render_fields(['username'])
+        self.assertTrue('name="email"' in form.as_p())
+
+
+@unittest.skipIf(jinja2 is None, 'jinja2 is not installed')
+@override_settings(TEMPLATES=JINJA2_TEMPLATES,
+                   FLOPPYFORMS_TEMPLATE_ENGINE='jinja2')
+class Jinja2RenderFieldsTests(TestCase):
+    def test_rows_from_layout(self):
+        data = {'username': 'toolong', 'email': 'invalid'}
+        for layout in RenderFieldsTests.layouts:
+            html = SignupForm(data)._render_as(layout)
+            fragments = SignupForm(data).render_fields(['email'], layout)
+            self.assertTrue('name="email"' in fragments['email'])
+            self.assertTrue(fragments['email'] in html)
+
+    def test_widgets(self):
+        fragments = SignupForm().render_fields(['username'], widgets=True)
+        self.assertTrue(fragments['username'].startswith('<input'))
+
+
+class CleanFieldsTests(TestCase):
+    def test_only_named_fields(self):
+        form = SignupForm({'username': 'bob', 'email': 'invalid'})
+        errors = clean_fields(form, ['username'])
+        self.assertEqual(dict(errors), {})
+        self.assertEqual(form.cleaned_data, {'username': 'BOB'})
+
+        errors = clean_fields(form, ['email', 'color'])
+        self.assertEqual(sorted(errors), ['color', 'email'])
+        self.assertEqual(form.errors, errors)
+
+    def test_clean_method(self):
+        form = SignupForm({'username': 'admin'})
+        errors = clean_fields(form, ['username'])
+        self.assertEqual(list(errors['username']), ['Taken'])
+        self.assertEqual(form.cleaned_data, {})
+
+    def test_unbound(self):
+        form = SignupForm()
+        self.assertEqual(dict(clean_fields(form, ['username'])), {})
+
+
+class FieldValidationViewTests(TestCase):
+    def post(self, data, view_class=SignupView, **kwargs):
+        request = RequestFactory().post('/', data, **kwargs)
+        return view_class.as_view()(request)
+
+    def test_row(self):
+        response = self.post({'field': 'email', 'email': 'invalid'})
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode('utf-8')
+        self.assertTrue('name="email"' in content)
+        self.assertTrue('errorlist' in content)
+        self.assertFalse('name="username"' in content)
+        self.assertFalse('Form clean called' in content)
+
+        response = self.post({'field': 'email', 'email': 'a@example.com'})
+        self.assertFalse('errorlist' in response.content.decode('utf-8'))
+
+    def test_htmx_trigger_name(self):
+        class PrefixView(SignupView):
+            prefix = 'signup'
+
+        response = self.post({'signup-username': 'toolong'}, PrefixView,
+                             HTTP_HX_TRIGGER_NAME='signup-username')
+        content = response.content.decode('utf-8')
+        self.assertTrue('name="signup-username"' in content)
+        self.assertTrue('errorlist' in content)
+
+    def test_json(self):
+        class JsonView(SignupView):
+            as_json = True
+
+        response = self.post({'field': ['username', 'email'],
+                              'username': 'admin',
+                              'email': 'a@example.com'}, JsonView)
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(content['errors'], {'username': ['Taken'],
+                                             'email': []})
+        self.assertEqual(sorted(content['fields']), ['email', 'username'])
+        self.assertTrue('name="username"' in content['fields']['username'])
+
+    def test_bad_request(self):
+        self.assertEqual(self.post({}).status_code, 400)
+        self.assertEqual(self.post({'field': 'nope'}).status_code, 400)
@@ -0,0 +1,74 @@
+from django.test import TestCase
+
+import floppyforms as forms
+from floppyforms.profiling import (RenderRecord, render_finished,
+                                   record)
+
+
+class ProfileForm(forms.Form):
+    name = forms.CharField()
+    comment = forms.CharField(widget=forms.Textarea)
+
+
+class ProfileRenderTests(TestCase):
+    def test_records_render_tree(self):
+        with forms.profile_render() as profile:
+            ProfileForm().as_p()
+
+        kinds = [(depth, entry.kind) for depth, entry in profile.walk()]
+        self.assertEqual(kinds[0], (0, 'profile'))
+        self.assertEqual(kinds[1], (1, 'form'))
+        self.assertTrue((2, 'formconfig') in kinds)
+        self.assertTrue((2, 'form') in kinds)
+        self.assertTrue((3, 'formrow') in kinds)
+        self.assertTrue((4, 'formfield') in kinds)
+        self.assertTrue((5, 'widget') in kinds)
+
+        form = profile.children[0]
+        self.assertEqual(form.template_name, 'floppyforms/layouts/p.html')
+        self.assertTrue(form.duration >= form.own_duration >= 0)
+
+        widgets = [entry for depth, entry in profile.walk()
+                   if entry.kind == 'widget']
+        self.assertEqual([(w.name, w.template_name) for w in widgets], [
+            ('name', 'floppyforms/input.html'),
+            ('comment', 'floppyforms/textarea.html'),
+        ])
+
+    def test_stats(self):
+        with forms.profile_render() as profile:
+            ProfileForm().as_p()
+            ProfileForm().as_p()
+
+        stats = dict(((stat.kind, stat.template_name), stat)
+                     for stat in profile.stats())
+        self.assertEqual(stats[('form', 'floppyforms/layouts/p.html')].calls,
+                         2)
+        self.assertEqual(stats[('widget', 'floppyforms/input.html')].calls, 2)
+        self.assertEqual(stats[('formrow', 'floppyforms/rows/p.html')].calls,
+                         4)
+        self.assertTrue('floppyforms/textarea.html' in profile.format_stats())
+        self.assertTrue('\n  formconfig row' in profile.format_tree())
+
+    def test_not_recorded_by_default(self):
+        entry = record('widget', template_name='floppyforms/input.html')
+        self.assertFalse(isinstance(entry, RenderRecord))
+        with entry:
+            entry.template_name = 'other.html'
+
+    def test_signals(self):
+        records = []
+
+        def receiver(sender, record, **kwargs):
+            records.append(record)
+
+        render_finished.connect(receiver)
+        try:
+            ProfileForm()['name'].as_widget()
+        finally:
+            render_finished.disconnect(receiver)
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0].kind, 'widget')
+        self.assertEqual(records[0].template_name, 'floppyforms/input.html')
+        self.assertTrue(records[0].duration is not None)
+        self.assertFalse(isinstance(record('widget'), RenderRecord))
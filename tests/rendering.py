@@ -3,7 +3,8 @@ from django.test import TestCase
 import floppyforms as forms
 
 from floppyforms import widgets
-from floppyforms.templatetags.floppyforms import ConfigFilter, FormConfig
+from floppyforms.templatetags.floppyforms import (ConfigFilter, FormConfig,
+                                                  class_names)
 
 
 class AgeField(forms.IntegerField):
@@ -225,3 +226,150 @@ class FormConfigTests(TestCase):
         self.assertEqual(list(config.retrieve_all('number')), [2, 1])
         self.assertEqual(list(config.retrieve_all('number', nr='four')), [4, 2, 1])
         self.assertEqual(list(config.retrieve_all('number', nr='five')), [2, 1])
+
+    def test_retrieve_is_cached_per_bound_field(self):
+        form = RegistrationForm()
+        config = FormConfig()
+        calls = []
+
+        def filter(bound_field):
+            calls.append(bound_field.name)
+            return bound_field.name == 'comment'
+
+        config.configure('widget', widgets.HiddenInput(), filter=filter)
+        widget = config.retrieve('widget', bound_field=form['comment'])
+        self.assertEqual(widget.__class__, widgets.HiddenInput)
+        self.assertEqual(config.retrieve('widget', bound_field=form['comment']),
+                         widget)
+        self.assertEqual(config.retrieve_all('widget', bound_field=form['comment']),
+                         [widget])
+        self.assertEqual(calls, ['comment', 'comment'])
+
+        # Other forms don't share the cached values.
+        other_form = RegistrationForm()
+        config.retrieve('widget', bound_field=other_form['comment'])
+        self.assertEqual(len(calls), 3)
+
+    def test_cache_is_invalidated_on_configuration_changes(self):
+        form = RegistrationForm()
+        config = FormConfig()
+
+        widget = config.retrieve('widget', bound_field=form['name'])
+        self.assertEqual(widget.__class__, widgets.TextInput)
+
+        config.push()
+        widget = config.retrieve('widget', bound_field=form['name'])
+        self.assertEqual(widget.__class__, widgets.TextInput)
+
+        config.configure('widget', widgets.Textarea(), filter=ConfigFilter('name'))
+        widget = config.retrieve('widget', bound_field=form['name'])
+        self.assertEqual(widget.__class__, widgets.Textarea)
+
+        config.pop()
+        widget = config.retrieve('widget', bound_field=form['name'])
+        self.assertEqual(widget.__class__, widgets.TextInput)
+
+    def test_class_names(self):
+        names = class_names(AgeField)
+        self.assertTrue('AgeField' in names)
+        self.assertTrue('IntegerField' in names)
+        self.assertTrue('Field' in names)
+        self.assertFalse('object' in names)
+        self.assertTrue(class_names(AgeField) is names)
+
+    def test_filter_with_unhashable_value(self):
+        form = RegistrationForm()
+        self.assertFalse(ConfigFilter(['name'])(form['name']))
+
+    def test_indexed_and_custom_filters_keep_precedence(self):
+        form = RegistrationForm()
+        config = FormConfig()
+        config.configure('widget_template', 'name.html',
+                         filter=ConfigFilter('name'))
+        config.configure('widget_template', 'custom.html',
+                         filter=lambda bound_field: bound_field.name != 'age')
+        config.configure('widget_template', 'integer.html',
+                         filter=ConfigFilter('IntegerField'))
+
+        self.assertEqual(
+            config.retrieve('widget_template', bound_field=form['name']),
+            'custom.html')
+        self.assertEqual(
+            config.retrieve('widget_template', bound_field=form['age']),
+            'integer.html')
+        self.assertEqual(
+            config.retrieve_all('widget_template', bound_field=form['name']),
+            ['custom.html', 'name.html'])
+
+        config.push()
+        config.configure('widget_template', 'textinput.html',
+                         filter=ConfigFilter('TextInput'))
+        self.assertEqual(
+            config.retrieve_all('widget_template', bound_field=form['name']),
+            ['textinput.html', 'custom.html', 'name.html'])
+        self.assertEqual(
+            config.retrieve('widget_template', bound_field=form['comment']),
+            'custom.html')
+        config.pop()
+        self.assertEqual(
+            config.retrieve('widget_template', bound_field=form['name']),
+            'custom.html')
+
+    def test_string_filters_are_indexed_by_name(self):
+        config = FormConfig()
+        config.configure('label', 'Name', filter=ConfigFilter('name'))
+        config.configure('label', 'Any')
+        index = config.indexes[-1]
+        self.assertEqual(list(index['names']['label']), ['name'])
+        self.assertEqual(len(index['others']['label']), 1)
+
+    def test_lookups_are_shared_between_forms_with_the_same_fields(self):
+        config = FormConfig()
+        config.configure('widget_template', 'text.html')
+        config.configure('widget_template', 'name.html',
+                         filter=ConfigFilter('name'))
+        first, second = RegistrationForm(), RegistrationForm(prefix='second')
+
+        self.assertEqual(
+            config.retrieve('widget_template', bound_field=first['name']),
+            'name.html')
+        self.assertEqual(len(config.structure_cache['widget_template']), 1)
+        self.assertEqual(
+            config.retrieve('widget_template', bound_field=second['name']),
+            'name.html')
+        self.assertEqual(len(config.structure_cache['widget_template']), 1)
+        self.assertEqual(
+            config.retrieve('widget_template', bound_field=second['email']),
+            'text.html')
+        self.assertEqual(len(config.structure_cache['widget_template']), 2)
+
+        # Defaults are still computed for every field.
+        self.assertEqual(config.retrieve('widget', bound_field=second['name']),
+                         second.fields['name'].widget)
+
+    def test_custom_filters_are_not_shared(self):
+        config = FormConfig()
+        first, second = RegistrationForm(), RegistrationForm(prefix='second')
+        config.configure('label', 'First',
+                         filter=lambda bound_field: bound_field.form is first)
+        self.assertEqual(config.retrieve('label', bound_field=first['name']),
+                         'First')
+        self.assertEqual(config.retrieve('label', bound_field=second['name']),
+                         'First- and Lastname')
+        self.assertEqual(dict(config.structure_cache['label']), {})
+
+    def test_configuring_a_key_keeps_the_lookups_for_other_keys(self):
+        form = RegistrationForm()
+        config = FormConfig()
+        config.retrieve('widget_template', bound_field=form['name'])
+        config.push()
+        config.configure('row_context', {'hidden_fields': []})
+        self.assertTrue(config.cache['widget_template'])
+        self.assertTrue(config.structure_cache['widget_template'])
+        config.pop()
+        self.assertTrue(config.cache['widget_template'])
+        config.configure('widget_template', 'other.html')
+        self.assertFalse(config.cache['widget_template'])
+        self.assertEqual(
+            config.retrieve('widget_template', bound_field=form['name']),
+            'other.html')
@@ -0,0 +1,217 @@
+from django.forms.formsets import formset_factory
+from django.template import Context, Template
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import unittest
+
+import floppyforms as forms
+from floppyforms.skeleton import skeleton_cache
+
+from .jinja import JINJA2_TEMPLATES, engines, jinja2
+
+
+class ProfileForm(forms.Form):
+    name = forms.CharField(max_length=5, help_text='Your <name>')
+    email = forms.EmailField()
+    notes = forms.CharField(widget=forms.Textarea, required=False)
+    color = forms.ChoiceField(choices=(('r', 'Red'), ('g', 'Green')))
+    agree = forms.BooleanField(required=False)
+    token = forms.CharField(widget=forms.HiddenInput, required=False)
+    day = forms.DateField(required=False, show_hidden_initial=True)
+
+
+VALID = {'name': 'a"b<', 'email': 'a@example.com', 'color': 'g',
+         'agree': 'on', 'token': 'x&y', 'day': '2014-01-02'}
+OTHER = {'name': 'bob', 'email': 'b@example.com', 'color': 'r',
+         'token': '', 'notes': '<p>Hello</p>'}
+INVALID = {'name': 'toolong', 'email': 'invalid'}
+OTHER_INVALID = {'name': 'longer', 'email': 'also invalid'}
+
+
+class SkeletonTests(TestCase):
+    layouts = ('floppyforms/layouts/p.html', 'floppyforms/layouts/ul.html',
+               'floppyforms/layouts/table.html')
+
+    def setUp(self):
+        skeleton_cache.clear()
+
+    def assertSameAsNormal(self, data=None, **kwargs):
+        for layout in self.layouts:
+            expected = ProfileForm(data, **kwargs)._render_as(layout)
+            rendered = ProfileForm(data, **kwargs)._render_as(layout,
+                                                              skeleton=True)
+            self.assertEqual(rendered, expected)
+
+    def test_same_output(self):
+        for data in (None, VALID, OTHER, INVALID, OTHER_INVALID):
+            self.assertSameAsNormal(data)
+        self.assertSameAsNormal(initial={'name': 'ann', 'agree': True})
+        self.assertSameAsNormal(VALID, prefix='profile')
+        self.assertFalse(False in skeleton_cache.skeletons.values())
+
+    def test_skeleton_is_reused(self):
+        layout = 'floppyforms/layouts/p.html'
+        ProfileForm(VALID)._render_as(layout, skeleton=True)
+        ProfileForm(INVALID)._render_as(layout, skeleton=True)
+        self.assertEqual(len(skeleton_cache.skeletons), 2)
+        with self.assertTemplateNotUsed(layout):
+            with self.assertTemplateNotUsed('floppyforms/textarea.html'):
+                rendered = ProfileForm(OTHER)._render_as(layout,
+                                                         skeleton=True)
+        self.assertEqual(rendered, ProfileForm(OTHER)._render_as(layout))
+        with self.assertTemplateNotUsed(layout):
+            rendered = ProfileForm(OTHER_INVALID)._render_as(layout,
+                                                             skeleton=True)
+        self.assertEqual(rendered,
+                         ProfileForm(OTHER_INVALID)._render_as(layout))
+        self.assertEqual(len(skeleton_cache.skeletons), 2)
+
+    def test_key_varies_on_form_attributes(self):
+        layout = 'floppyforms/layouts/p.html'
+        ProfileForm(VALID)._render_as(layout, skeleton=True)
+        form = ProfileForm(VALID)
+        form.required_css_class = 'needed'
+        rendered = form._render_as(layout, skeleton=True)
+        self.assertTrue('class="needed"' in rendered, rendered)
+        form = ProfileForm(VALID)
+        form.fields['name'].widget.input_type = 'search'
+        rendered = form._render_as(layout, skeleton=True)
+        self.assertTrue('type="search"' in rendered, rendered)
+
+    def test_selects_are_rendered_for_every_form(self):
+        layout = 'floppyforms/layouts/p.html'
+        ProfileForm(VALID)._render_as(layout, skeleton=True)
+        with self.assertTemplateUsed('floppyforms/select.html'):
+            rendered = ProfileForm(OTHER)._render_as(layout, skeleton=True)
+        self.assertTrue('<option value="r" selected="selected">' in rendered)
+
+    def test_unsuitable_forms_are_rendered_normally(self):
+        class TagsField(forms.MultipleChoiceField):
+            widget = forms.MultipleHiddenInput
+            hidden_widget = forms.MultipleHiddenInput
+
+        class TagsForm(forms.Form):
+            # rendered with {{ field.as_hidden }}, i.e. without formfield
+            tags = TagsField(choices=(('a', 'A'), ('b', 'B')))
+            name = forms.CharField()
+
+        layout = 'floppyforms/layouts/p.html'
+        for tags in (['a'], ['b']):
+            data = {'tags': tags, 'name': 'x'}
+            rendered = TagsForm(data)._render_as(layout, skeleton=True)
+            self.assertEqual(rendered, TagsForm(data).as_p())
+        self.assertEqual(list(skeleton_cache.skeletons.values()), [False])
+
+    def test_django_hidden_widgets_are_not_trusted(self):
+        from django import forms as django_forms
+
+        class TokenForm(forms.Form):
+            token = django_forms.CharField(widget=forms.HiddenInput)
+            name = forms.CharField()
+
+        layout = 'floppyforms/layouts/p.html'
+        for token in ('a', 'b'):
+            data = {'token': token, 'name': 'x'}
+            rendered = TokenForm(data)._render_as(layout, skeleton=True)
+            self.assertTrue('value="%s"' % token in rendered)
+        self.assertEqual(list(skeleton_cache.skeletons.values()), [False])
+
+    @override_settings(FLOPPYFORMS_COMPILED_WIDGETS=True)
+    def test_compiled_widgets(self):
+        for data in (None, VALID, INVALID):
+            self.assertSameAsNormal(data)
+
+    @unittest.skipIf(jinja2 is None or engines is None,
+                     'Jinja2 or Django 1.8 is not available')
+    def test_jinja2(self):
+        with override_settings(TEMPLATES=JINJA2_TEMPLATES,
+                               FLOPPYFORMS_TEMPLATE_ENGINE='jinja2'):
+            for data in (None, VALID, OTHER, INVALID):
+                self.assertSameAsNormal(data)
+        self.assertFalse(False in skeleton_cache.skeletons.values())
+
+
+ProfileFormSet = formset_factory(ProfileForm, extra=2, can_order=True,
+                                 can_delete=True)
+
+FORMSET_DATA = {
+    'form-TOTAL_FORMS': '3', 'form-INITIAL_FORMS': '0',
+    'form-0-name': 'bob', 'form-0-email': 'b@example.com',
+    'form-0-color': 'r', 'form-1-name': 'a"b<', 'form-1-email': 'invalid',
+    'form-1-color': 'g', 'form-1-token': 'x&y', 'form-2-name': 'ann',
+    'form-2-email': 'a@example.com', 'form-2-color': 'g',
+    'form-2-notes': '<p>Hi</p>',
+}
+
+
+class BulkRenderingTests(TestCase):
+    layouts = SkeletonTests.layouts
+
+    def setUp(self):
+        skeleton_cache.clear()
+
+    def render_tag(self, formset, layout):
+        template = Template('{%% load floppyforms %%}{%% form formset using '
+                            '"%s" bulk %%}' % layout)
+        return template.render(Context({'formset': formset}))
+
+    def test_same_output_as_iter_render(self):
+        for data in (None, FORMSET_DATA):
+            for layout in self.layouts:
+                formset = ProfileFormSet(data)
+                expected = u''.join(forms.iter_render(formset, layout))
+                self.assertEqual(forms.render_formset(formset, layout),
+                                 expected)
+                self.assertEqual(self.render_tag(formset, layout), expected)
+        self.assertFalse(False in skeleton_cache.skeletons.values())
+
+    def test_forms_share_skeleton(self):
+        formset = ProfileFormSet()
+        layout = 'floppyforms/layouts/table.html'
+        with self.assertTemplateUsed(layout, count=1):
+            rendered = self.render_tag(formset, layout)
+        self.assertEqual(len(skeleton_cache.skeletons), 1)
+        self.assertTrue('name="form-1-name"' in rendered)
+        self.assertTrue('id="id_form-1-ORDER"' in rendered)
+
+    def test_prefix_is_escaped(self):
+        formset = ProfileFormSet(prefix='a"b')
+        layout = 'floppyforms/layouts/p.html'
+        self.assertEqual(forms.render_formset(formset, layout),
+                         u''.join(forms.iter_render(formset, layout)))
+        self.assertEqual(formset.forms[0].prefix, 'a"b-0')
+
+    def test_inline_layout(self):
+        template = Template("""{% load floppyforms %}
+            {% form formset using bulk %}<div>{% formrow form.name %}</div>
+            {% endform %}""")
+        rendered = template.render(Context({'formset': ProfileFormSet()}))
+        self.assertEqual(rendered.count('<div>'), 2)
+        self.assertTrue('name="form-1-name"' in rendered)
+        self.assertEqual(len(skeleton_cache.skeletons), 1)
+
+    def test_shared_datalists(self):
+        class SearchForm(forms.Form):
+            query = forms.CharField(widget=forms.TextInput(
+                datalist=['apple', 'banana']))
+
+        formset = formset_factory(SearchForm, extra=3)()
+        layout = 'floppyforms/layouts/p.html'
+        rendered = forms.render_formset(formset, layout)
+        self.assertEqual(rendered.count('<datalist'), 1)
+        self.assertEqual(rendered,
+                         u''.join(forms.iter_render(formset, layout)))
+
+    @unittest.skipIf(jinja2 is None or engines is None,
+                     'Jinja2 or Django 1.8 is not available')
+    def test_jinja2(self):
+        with override_settings(TEMPLATES=JINJA2_TEMPLATES,
+                               FLOPPYFORMS_TEMPLATE_ENGINE='jinja2'):
+            for data in (None, FORMSET_DATA):
+                formset = ProfileFormSet(data)
+                layout = 'floppyforms/layouts/p.html'
+                expected = u''.join(
+                    form._render_as(layout) for form in formset)
+                self.assertEqual(forms.render_formset(formset, layout),
+                                 expected)
+        self.assertFalse(False in skeleton_cache.skeletons.values())
@@ -1,10 +1,20 @@
 # flake8: noqa
+from .autocomplete import *
+from .choices import *
+from .datalists import *
 from .deprecations import *
+from .formcache import *
 from .forms import *
 from .gis import GisTests
+from .jinja import *
 from .modelforms import *
+from .profiling import *
 from .layouts import *
+from .loader import *
+from .media import *
 from .rendering import *
+from .partial import *
+from .skeleton import *
 from .templatetags import *
 from .widgets import *
 from .fields import *
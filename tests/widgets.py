@@ -9,9 +9,13 @@ from django.test import TestCase
 from django.test.utils import override_settings
 from django.utils.dates import MONTHS
 from django.utils.encoding import python_2_unicode_compatible
+from django.utils import translation
 from django.utils.timezone import now
+from django.utils.translation import ugettext_lazy as _
 
 import floppyforms as forms
+from floppyforms import compiled
+from floppyforms.widgets import date_choice_cache
 
 from .base import InvalidVariable
 
@@ -1202,6 +1206,240 @@ class WidgetRenderingTestWithTemplateStringIfInvalidSet(WidgetRenderingTest):
 WidgetRenderingTestWithTemplateStringIfInvalidSet = override_settings(TEMPLATE_STRING_IF_INVALID=InvalidVariable(u'INVALID'))(WidgetRenderingTestWithTemplateStringIfInvalidSet)
 
 
+class WidgetRenderingTestWithCompiledWidgets(WidgetRenderingTest):
+    def test_generic_ip_address(self):
+        """<input type=text> is rendered without a template"""
+        class GenericIPForm(forms.Form):
+            ip = forms.GenericIPAddressField()
+
+        with self.assertTemplateNotUsed('floppyforms/input.html'):
+            rendered = GenericIPForm().as_p()
+        self.assertHTMLEqual(rendered, """
+        <p>
+            <label for="id_ip">Ip:</label>
+            <input type="text" name="ip" id="id_ip" required>
+        </p>""")
+
+
+WidgetRenderingTestWithCompiledWidgets = override_settings(FLOPPYFORMS_COMPILED_WIDGETS=True)(WidgetRenderingTestWithCompiledWidgets)
+
+
+class CompiledWidgetTests(TestCase):
+    def render_both(self, widget, name, value, attrs=None):
+        # some widgets change the attrs they get
+        with self.settings(FLOPPYFORMS_COMPILED_WIDGETS=False):
+            expected = widget.render(name, value, attrs and dict(attrs))
+        with self.settings(FLOPPYFORMS_COMPILED_WIDGETS=True):
+            rendered = widget.render(name, value, attrs and dict(attrs))
+        return expected, rendered
+
+    def assertSameOutput(self, widget, name, value, attrs=None):
+        expected, rendered = self.render_both(widget, name, value, attrs)
+        self.assertEqual(rendered, expected)
+
+    def test_input(self):
+        self.assertSameOutput(forms.TextInput(), 'text', '')
+        self.assertSameOutput(forms.TextInput(attrs={
+            'placeholder': '<"Quoted">',
+            'autofocus': True,
+            'disabled': False,
+            'size': 1,
+        }), 'text', 'some & value', {'id': 'id_text'})
+        self.assertSameOutput(forms.NumberInput(attrs={'step': 0.5}),
+                              'number', 12)
+        self.assertSameOutput(forms.CheckboxInput(), 'check', True)
+        self.assertSameOutput(forms.TextInput(datalist=['Foo', '<Bar>']),
+                              'text', 'Foo', {'id': 'id_text'})
+
+    def test_textarea(self):
+        self.assertSameOutput(forms.Textarea(), 'text', '')
+        self.assertSameOutput(forms.Textarea(attrs={'rows': 3}), 'text',
+                              '<p>Some & text</p>', {'id': 'id_text'})
+
+    def test_select(self):
+        choices = (
+            ('a', 'A'),
+            ('b', '<B>'),
+            ('Group', (
+                (1, 'One'),
+                (2, 'Two'),
+            )),
+            ('c', 'C'),
+        )
+        self.assertSameOutput(forms.Select(choices=choices), 'select', 'b')
+        self.assertSameOutput(forms.Select(choices=choices), 'select', None)
+        self.assertSameOutput(forms.SelectMultiple(choices=choices), 'select',
+                              ['a', 2], {'id': 'id_select'})
+        self.assertSameOutput(forms.NullBooleanSelect(), 'select', True)
+        self.assertSameOutput(forms.RadioSelect(choices=choices), 'radio',
+                              'c', {'id': 'id_radio'})
+        self.assertSameOutput(forms.CheckboxSelectMultiple(choices=choices),
+                              'cb', ['a', 1], {'id': 'id_cb'})
+
+    def test_select_date(self):
+        self.assertSameOutput(forms.SelectDateWidget(years=[2013, 2014]),
+                              'date', datetime.date(2014, 6, 5),
+                              {'id': 'id_date'})
+        self.assertSameOutput(
+            forms.SelectDateWidget(years=[2013], required=False,
+                                   attrs={'class': '<date>'}),
+            'date', None, {'id': 'id_date'})
+        with translation.override('de'):
+            self.assertSameOutput(forms.SelectDateWidget(years=[1999]),
+                                  'date', '1999-03-01', {'id': 'id_date'})
+
+    def test_multiple_hidden_input(self):
+        self.assertSameOutput(forms.MultipleHiddenInput(), 'multi',
+                              ['a', '<b>', '', 3], {'id': 'id_<multi>'})
+        self.assertSameOutput(forms.MultipleHiddenInput(attrs={
+            'class': 'hidden', 'data-x': 1, 'disabled': True,
+        }), 'multi', ['a', 'b'], {'id': 'id_multi', 'title': 'Multi'})
+        self.assertSameOutput(forms.MultipleHiddenInput(), 'multi', ['a'])
+        self.assertSameOutput(forms.MultipleHiddenInput(), 'multi', None)
+        widget = forms.MultipleHiddenInput()
+        widget.is_required = True
+        self.assertSameOutput(widget, 'multi', list(range(100)),
+                              {'id': 'id_multi'})
+
+    def test_compiled_renderer_is_used(self):
+        with self.settings(FLOPPYFORMS_COMPILED_WIDGETS=True):
+            self.assertTrue(
+                compiled.get_renderer('floppyforms/input.html') is
+                compiled.render_input)
+            self.assertEqual(compiled.get_renderer('custom.html'), None)
+        with self.settings(FLOPPYFORMS_COMPILED_WIDGETS=False):
+            self.assertEqual(
+                compiled.get_renderer('floppyforms/input.html'), None)
+
+    def test_overridden_template_is_not_compiled(self):
+        loaders = (
+            ('django.template.loaders.locmem.Loader', {
+                'floppyforms/input.html': '<input overridden name="{{ name }}">',
+            }),
+            'django.template.loaders.app_directories.Loader',
+        )
+        with self.settings(FLOPPYFORMS_COMPILED_WIDGETS=True,
+                           TEMPLATE_LOADERS=loaders):
+            self.assertEqual(
+                compiled.get_renderer('floppyforms/input.html'), None)
+            rendered = forms.TextInput().render('text', 'value')
+            self.assertEqual(rendered, '<input overridden name="text">')
+
+    @override_settings(TEMPLATE_STRING_IF_INVALID=InvalidVariable(u'INVALID'))
+    def test_template_string_if_invalid_is_not_compiled(self):
+        with self.settings(FLOPPYFORMS_COMPILED_WIDGETS=True):
+            self.assertEqual(
+                compiled.get_renderer('floppyforms/input.html'), None)
+
+
+class SelectChoicesTests(TestCase):
+    def test_optgroups_are_cached_per_choices(self):
+        widget = forms.Select(choices=[(1, 'One'), (2, 'Two')])
+        groups = widget.get_optgroups()
+        self.assertEqual(groups, [(None, [('1', 'One'), ('2', 'Two')])])
+        self.assertTrue(widget.get_optgroups() is groups)
+
+        # extra choices are not cached
+        extra = widget.get_optgroups([(3, 'Three')])
+        self.assertEqual(extra, [(None, [('1', 'One'), ('2', 'Two'),
+                                         ('3', 'Three')])])
+        self.assertTrue(widget.get_optgroups() is groups)
+
+        widget.choices = [(1, 'One')]
+        self.assertEqual(widget.get_optgroups(), [(None, [('1', 'One')])])
+        widget.choices.append((2, 'Two'))
+        self.assertEqual(widget.get_optgroups(),
+                         [(None, [('1', 'One'), ('2', 'Two')])])
+
+    def test_optgroups_are_shared_with_form_instances(self):
+        class SelectForm(forms.Form):
+            select = forms.ChoiceField(choices=[(1, 'One'), (2, 'Two')])
+
+        first = SelectForm().fields['select'].widget.get_optgroups()
+        second = SelectForm().fields['select'].widget.get_optgroups()
+        self.assertTrue(first is second)
+
+    def test_iterators_are_not_cached(self):
+        widget = forms.Select(choices=[(1, 'One')])
+        widget.choices = iter([(1, 'One')])
+        self.assertEqual(widget.get_optgroups(), [(None, [('1', 'One')])])
+        self.assertEqual(widget.get_optgroups(), [])
+
+    def test_selected_values_use_set_lookups(self):
+        widget = forms.SelectMultiple(choices=[(1, 'One'), (2, 'Two')])
+        value = widget.get_context('select', [2, '3'])['value']
+        self.assertTrue(isinstance(value, list))
+        self.assertEqual(value, ['2', '3'])
+        self.assertTrue(isinstance(value.lookup, frozenset))
+        self.assertTrue('2' in value)
+        self.assertFalse('1' in value)
+        self.assertFalse(['2'] in value)
+
+    def test_compiled_select_is_rendered_per_language(self):
+        choices = [('de', 'German'), ('x', _('Yes'))]
+        widget = forms.Select(choices=choices)
+        with self.settings(FLOPPYFORMS_COMPILED_WIDGETS=True):
+            with translation.override('de'):
+                german = widget.render('select', 'x')
+            with translation.override('en'):
+                english = widget.render('select', 'x')
+        self.assertTrue('>Ja</option>' in german)
+        self.assertTrue('>Yes</option>' in english)
+        self.assertEqual(len(widget.get_optgroups().cache), 2)
+
+    def test_large_select(self):
+        choices = [(i, 'Choice %s' % i) for i in range(2000)]
+        widget = forms.SelectMultiple(choices=choices)
+        value = list(range(0, 2000, 7))
+        with self.settings(FLOPPYFORMS_COMPILED_WIDGETS=False):
+            expected = widget.render('select', value)
+        with self.settings(FLOPPYFORMS_COMPILED_WIDGETS=True):
+            self.assertEqual(widget.render('select', value), expected)
+            self.assertEqual(widget.render('select', value), expected)
+        self.assertEqual(expected.count('selected="selected"'), 286)
+
+
+class SelectDateChoicesTests(TestCase):
+    def test_choice_tables_are_cached(self):
+        widget = forms.SelectDateWidget(years=[2013, 2014])
+        with translation.override('en'):
+            tables = date_choice_cache.get_tables(widget)
+            self.assertTrue(date_choice_cache.get_tables(
+                forms.SelectDateWidget(years=(2013, 2014))) is tables)
+            self.assertEqual(tables['month_choices'][0], (1, 'January'))
+            self.assertEqual(tables['year_choices'], ((2013, 2013),
+                                                      (2014, 2014)))
+            self.assertEqual(len(tables['day_choices']), 31)
+        with translation.override('de'):
+            german = date_choice_cache.get_tables(widget)
+        self.assertEqual(german['month_choices'][0], (1, 'Januar'))
+
+        optional = date_choice_cache.get_tables(
+            forms.SelectDateWidget(years=[2013, 2014], required=False))
+        self.assertEqual(optional['year_choices'][0], (0, '---'))
+        self.assertEqual(optional['month_choices'][0], (0, '---'))
+
+    def test_cache_is_bounded(self):
+        for year in range(date_choice_cache.maxsize + 10):
+            date_choice_cache.get_tables(forms.SelectDateWidget(years=[year]))
+        self.assertEqual(len(date_choice_cache.tables),
+                         date_choice_cache.maxsize)
+
+    def test_input_format_is_cached_per_language(self):
+        with self.settings(USE_L10N=True):
+            with translation.override('de'):
+                self.assertEqual(date_choice_cache.get_input_format(),
+                                 '%d.%m.%Y')
+            with translation.override('en'):
+                self.assertEqual(date_choice_cache.get_input_format(),
+                                 '%Y-%m-%d')
+            self.assertEqual(
+                forms.SelectDateWidget().value_from_datadict(
+                    {'d_year': '2014', 'd_month': '6', 'd_day': '5'}, {},
+                    'd'),
+                '2014-06-05')
+
+
 class WidgetContextTests(TestCase):
     def test_widget_render_method_should_not_clutter_the_context(self):
         '''
@@ -1247,11 +1485,15 @@ class WidgetContextTests(TestCase):
         ''')
 
 
+def render_attrs_template(attrs):
+    return render_to_string('floppyforms/attrs.html', {
+        'attrs': attrs,
+    })
+
+
 class AttrsTemplateTests(TestCase):
     def render_attrs(self, attrs):
-        return render_to_string('floppyforms/attrs.html', {
-            'attrs': attrs,
-        })
+        return render_attrs_template(attrs)
 
     def test_attrs_with_one_item(self):
         rendered = self.render_attrs({
@@ -1306,3 +1548,37 @@ class AttrsTemplateTests(TestCase):
         # disabled shouldn't have a value
         self.assertTrue(' disabled' in rendered)
         self.assertTrue(' disabled=' not in rendered)
+
+
+class RenderAttrsFilterTests(TestCase):
+    def render_attrs(self, attrs):
+        return Template('{% load floppyforms %}{{ attrs|render_attrs }}').render(
+            Context({'attrs': attrs}))
+
+    def test_render_attrs(self):
+        self.assertEqual(self.render_attrs({}), '')
+        self.assertEqual(self.render_attrs({'name': 'fieldname'}),
+                         ' name="fieldname"')
+        self.assertEqual(self.render_attrs({'required': True}), ' required')
+        self.assertEqual(self.render_attrs({'value': 1}), ' value="1"')
+        self.assertEqual(self.render_attrs({'value': False}),
+                         ' value="False"')
+
+    def test_values_are_escaped(self):
+        self.assertEqual(self.render_attrs({'title': '"Hello" & <bye>'}),
+                         ' title="&quot;Hello&quot; &amp; &lt;bye&gt;"')
+
+    def test_same_output_as_attrs_template(self):
+        attrs = {
+            'value': 'Hello World',
+            'id': 'id_name',
+            'disabled': True,
+            'maxlength': 10,
+            'step': 0.5,
+        }
+        self.assertEqual(
+            self.render_attrs(attrs),
+            render_attrs_template(attrs))
+
+    def test_missing_attrs(self):
+        self.assertEqual(self.render_attrs(None), '')